@@ -1,36 +1,35 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
 import copy
 import os
 import time
 import json
 import re
+import io
 import base64
-import importlib
+import hashlib
 
-# Imports for Reloading
-import tools.run_forecast
-import tools.ingest_data
-import tools.regressor_logic
-import tools.report_generator
-from tools import scenario_analysis
+# Heavy optional dependencies load on first use (see tools/lazy_imports.py).
+# tools.* modules are imported once and cached by Python across reruns;
+# prophet/openai are imported inside the functions that need them.
+from tools.lazy_imports import lazy_module
+go = lazy_module("plotly.graph_objects")
 
-# Imports for Usage
-from tools.ingest_data import validate_gsc_data
+import tools.project_manager
+import tools.export_utils
+from tools import scenario_analysis
+from tools.chart_utils import point_budget, downsample_frame
+from tools.ingest_data import load_gsc_csv
 from tools.regressor_logic import apply_regressors, parse_regressors
-from tools.run_forecast import execute_forecast
+from tools.run_forecast import execute_forecast, complete_intervals, merge_intervals, sweep_override_grid
+from tools.backtest import run_backtest
 from tools.report_generator import generate_marketing_report, check_openai_credits, analyze_parameters_with_ai, analyze_regressors_with_ai
 from tools.chat_actions import handle_chat_actions
-from tools.param_advisor import analyze_gsc_data_heuristics
-from tools.preset_generator import generate_prospecting_events
+from tools.param_advisor import analyze_gsc_data_heuristics, auto_tune
+from tools.preset_generator import generate_prospecting_events, expand_form_variants, evaluate_packages
 from tools.chatbot import chat_with_assistant, prepare_context_data
 
-importlib.reload(tools.run_forecast)
-import tools.project_manager
-importlib.reload(tools.project_manager)
-
 
 # --- HELPER FUNCTIONS ---
 def render_smart_report(report_text):
@@ -78,14 +77,596 @@ def render_smart_report(report_text):
                 ev = st.session_state.get('events', [])
                 if ev: st.dataframe(pd.DataFrame(ev)[['name', 'date', 'type', 'impact']], use_container_width=True)
             else: st.markdown(f"**{{ {tag} }}**")
-importlib.reload(tools.ingest_data)
-importlib.reload(tools.regressor_logic)
-importlib.reload(tools.report_generator)
-importlib.reload(tools.param_advisor)
-importlib.reload(tools.preset_generator)
-importlib.reload(tools.chatbot)
-importlib.reload(tools.chat_actions)
-importlib.reload(scenario_analysis)
+
+# --- CACHED DATA LAYER ---
+# Streamlit reruns the whole script on every widget interaction. Parsing and derived
+# tables are memoized on content keys (upload hash, forecast_id, events hash); the
+# underscore-prefixed arguments are the payloads, which st.cache_data does not hash.
+# The stores are process-wide (shared by all sessions): a new forecast gets a new key
+# and old entries age out through max_entries, nothing is cleared explicitly.
+def content_digest(payload):
+    """sha256 of raw bytes or of a JSON-serializable object (events, config)."""
+    if not isinstance(payload, (bytes, bytearray)):
+        payload = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+def current_forecast_id(forecast):
+    """Cache key of the displayed forecast (engine id, or a content hash for older session results)."""
+    return st.session_state.get('last_forecast_id') or content_digest(forecast[['ds', 'yhat']].to_json().encode())
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_gsc_history(file_digest, _raw_bytes):
+    """Reads + validates a GSC export once per distinct upload."""
+    return load_gsc_csv(io.BytesIO(_raw_bytes))
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_project_history(project_name, mtime):
+    """Project history store, re-read only when the file changes on disk."""
+    return tools.project_manager.load_history(project_name)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_chart_frames(forecast_id, history_digest, agg_mode, _forecast, _history_df):
+    """History/forecast frames resampled to the chart granularity."""
+    plot_df_hist = _history_df.copy()
+    plot_df_forecast = _forecast.copy()
+
+    if agg_mode == "Settimanale":
+        plot_df_hist = plot_df_hist.resample('W', on='date').sum().reset_index()
+        plot_df_forecast = plot_df_forecast.resample('W', on='ds').sum().reset_index()
+    elif agg_mode == "Mensile":
+        plot_df_hist = plot_df_hist.resample('ME', on='date').sum().reset_index()
+        plot_df_forecast = plot_df_forecast.resample('ME', on='ds').sum().reset_index()
+
+    return plot_df_hist, plot_df_forecast
+
+
+# Above this many event dates the chart keeps lines + hover markers but drops the text labels
+EVENT_LABELS_MAX = 30
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_forecast_figure(forecast_id, history_digest, agg_mode, events_digest, _forecast, _history_df, _events,
+                          max_points=None, window=None):
+    """
+    Main trend chart (history + forecast + event markers).
+    max_points: per-trace budget (LTTB downsampling, None = full resolution).
+    window: optional (start, end) dates; the budget is spent on that range only,
+    so narrow windows come back at full resolution.
+    """
+    plot_df_hist, plot_df_forecast = build_chart_frames(forecast_id, history_digest, agg_mode, _forecast, _history_df)
+    last_hist_date = plot_df_hist['date'].max()
+    future_only = plot_df_forecast[plot_df_forecast['ds'] > last_hist_date]
+
+    if window is not None:
+        w_start, w_end = pd.Timestamp(window[0]), pd.Timestamp(window[1])
+        plot_df_hist = plot_df_hist[plot_df_hist['date'].between(w_start, w_end)]
+        future_only = future_only[future_only['ds'].between(w_start, w_end)]
+        _events = [e for e in (_events or []) if w_start <= pd.Timestamp(e['date']) <= w_end]
+
+    plot_df_hist = downsample_frame(plot_df_hist, 'date', 'clicks', max_points)
+    future_only = downsample_frame(future_only, 'ds', 'yhat', max_points)
+
+    fig = go.Figure()
+
+    # Historical
+    fig.add_trace(go.Scatter(
+        x=plot_df_hist['date'],
+        y=plot_df_hist['clicks'],
+        mode='lines',
+        name='Storico',
+        line=dict(color='#333333', width=1)
+    ))
+
+    # Forecast
+    fig.add_trace(go.Scatter(
+        x=future_only['ds'],
+        y=future_only['yhat'],
+        mode='lines',
+        name='Previsione',
+        line=dict(color='#4CAF50', width=2)
+    ))
+
+    # Events Markers (one line layer + one hover layer, whatever the number of events)
+    if _events:
+        evt_df = pd.DataFrame({
+            'date': pd.to_datetime([e['date'] for e in _events]).normalize(),
+            'name': [str(e['name']) for e in _events]
+        }).sort_values('date', kind='stable')
+        dates, first_idx = np.unique(evt_df['date'].to_numpy(), return_index=True)
+        dates = pd.DatetimeIndex(dates)
+        names_by_date = np.split(evt_df['name'].to_numpy(), first_idx[1:])
+
+        # Marker height: history value on that day, else forecast value (single indexed join)
+        y_lookup = pd.concat([
+            _history_df.set_index('date')['clicks'],
+            _forecast.set_index('ds')['yhat']
+        ])
+        y_lookup = y_lookup[~y_lookup.index.duplicated(keep='first')]
+        evt_y = y_lookup.reindex(dates).fillna(0).to_numpy()
+
+        # Typed NumPy arrays (unicode / float) take plotly's fast validation path; ISO dates keep the JSON small
+        date_strs = dates.strftime("%Y-%m-%d").to_numpy(dtype=str)
+        evt_text = np.array([
+            f"<b>{d}</b><br>" + "<br>".join(f"• {n}" for n in names)
+            for d, names in zip(date_strs, names_by_date)
+        ])
+
+        # Vertical dotted lines as a single trace on a hidden 0-1 overlay axis:
+        # each date contributes (0, 1, NaN) and the NaN breaks the path between lines
+        n_dates = len(dates)
+        line_x = np.repeat(date_strs, 3)
+        line_y = np.tile([0.0, 1.0, np.nan], n_dates)
+        fig.add_trace(go.Scatter(
+            x=line_x,
+            y=line_y,
+            mode='lines',
+            yaxis='y2',
+            line=dict(color='red', width=1, dash='dot'),
+            opacity=0.5,
+            hoverinfo='skip',
+            showlegend=False
+        ))
+
+        # Text labels only while they stay readable; hover markers always carry the names
+        if n_dates <= EVENT_LABELS_MAX:
+            fig.update_layout(annotations=[
+                dict(
+                    x=d, y=1, xref='x', yref='paper',
+                    text=names[0] if len(names) == 1 else f"{len(names)} eventi",
+                    textangle=-90, showarrow=False, xanchor='right', yanchor='top',
+                    font=dict(color='red'), opacity=0.7
+                )
+                for d, names in zip(date_strs, names_by_date)
+            ])
+
+        fig.add_trace(go.Scatter(
+            x=date_strs,
+            y=evt_y,
+            mode='markers',
+            name='Eventi',
+            marker=dict(size=10, color='red', symbol='diamond'),
+            text=evt_text,
+            hovertemplate="%{text}<extra></extra>"
+        ))
+        fig.update_layout(yaxis2=dict(overlaying='y', range=[0, 1], visible=False, fixedrange=True))
+
+    fig.update_layout(
+        template="simple_white",
+        hovermode="x unified",
+        height=500
+    )
+
+    return fig
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_yoy_tables(forecast_id, history_digest, _forecast, _history_df):
+    """Month/quarter/year YoY tables of one forecast (None if no future), shared by dashboard, chat and report."""
+    return scenario_analysis.calculate_yoy_tables(_forecast, _history_df)
+
+
+# Widget changes inside a fragment rerun only that block (st.fragment, when available)
+_fragment = getattr(st, "fragment", None) or (lambda fn: fn)
+
+# --- PROGRESSIVE INTERVALS ---
+@st.cache_resource
+def interval_executor():
+    """One background worker per server: interval jobs queue instead of competing for the CPU."""
+    from concurrent.futures import ThreadPoolExecutor
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="intervals")
+
+
+def submit_interval_job(pending):
+    """Starts complete_intervals in the background; the poller swaps the result into session state."""
+    st.session_state.interval_job = {
+        "future": interval_executor().submit(complete_intervals, pending),
+        "forecast_id": pending['forecast_id'],
+        "submitted": time.perf_counter()
+    }
+
+
+def intervals_pending():
+    """True while the displayed forecast still has NaN intervals (background job not merged yet)."""
+    job = st.session_state.get('interval_job')
+    return job is not None and job['forecast_id'] == st.session_state.get('last_forecast_id')
+
+
+INTERVALS_PENDING_HELP = "Disponibile quando gli intervalli di confidenza sono stati calcolati."
+
+
+def _poll_interval_job():
+    job = st.session_state.get('interval_job')
+    if job is None:
+        return
+    if job['forecast_id'] != st.session_state.get('last_forecast_id'):
+        # Superseded by a newer forecast: its result would not match the displayed frame
+        st.session_state.interval_job = None
+        return
+    if not job['future'].done():
+        st.info(f"⏳ Calcolo intervalli di confidenza in corso... ({time.perf_counter() - job['submitted']:.0f}s)")
+        return
+
+    st.session_state.interval_job = None
+    try:
+        done = job['future'].result()
+    except Exception as e:
+        st.warning(f"Intervalli di confidenza non disponibili: {e}")
+        return
+    st.session_state.last_forecast = merge_intervals(st.session_state.last_forecast, done)
+    st.session_state.last_forecast_id = done['full_forecast_id']
+    if done['impact_bands'] is not None:
+        st.session_state.last_impact_bands = done['impact_bands']
+    if st.session_state.get('last_debug'):
+        st.session_state.last_debug['timing'].update(done['timing'], intervals='ready')
+    st.rerun() # Full app rerun (also from inside the fragment): every view picks up the bands
+
+
+# Polls every second without rerunning the page (st.fragment run_every); older
+# Streamlit versions fall back to checking on the next interaction.
+poll_interval_job = st.fragment(run_every=1.0)(_poll_interval_job) if getattr(st, "fragment", None) else _poll_interval_job
+
+
+# --- SENSITIVITY SWEEP ---
+@_fragment
+def render_sensitivity_sweep(history_max):
+    """(impact x duration) what-if grid for future events on the last baseline (no refit)."""
+    baseline = st.session_state.get('last_baseline_forecast')
+    override_events = st.session_state.get('last_override_events') or []
+    if baseline is None or not override_events:
+        st.caption("Nessun evento futuro nell'ultimo forecast: aggiungi eventi dopo la fine dello storico per usare la griglia.")
+        return
+
+    labels = [f"{e['name']} ({pd.to_datetime(e['date']).strftime('%d/%m/%Y')})" for e in override_events]
+    with st.form("sweep_form"):
+        swept = st.multiselect("Eventi da variare", range(len(override_events)), default=[0],
+                               format_func=lambda i: labels[i], key="sweep_events")
+        c1, c2 = st.columns(2)
+        imp_range = c1.slider("Impatto (%)", -100, 200, (-20, 40), step=5, key="sweep_impact_range")
+        imp_steps = c1.number_input("Valori impatto", 2, 100, 25, key="sweep_impact_steps")
+        dur_range = c2.slider("Durata (giorni)", 1, 730, (30, 270), key="sweep_duration_range")
+        dur_steps = c2.number_input("Valori durata", 2, 100, 20, key="sweep_duration_steps")
+        submitted = st.form_submit_button("Calcola Griglia")
+
+    if submitted and swept:
+        st.session_state.sweep_result = sweep_override_grid(
+            baseline, override_events, swept,
+            np.linspace(imp_range[0], imp_range[1], int(imp_steps)) / 100,
+            np.unique(np.linspace(dur_range[0], dur_range[1], int(dur_steps)).round().astype(int)),
+            start=history_max
+        )
+
+    res = st.session_state.get('sweep_result')
+    if res is None:
+        return
+    table = res['table']
+    st.caption(f"{res['n_variants']:,} varianti calcolate in {res['timing']['sweep_s'] * 1000:.0f} ms · "
+               f"Click totali con i valori attuali: {res['reference']:,.0f}")
+    grid = table.pivot(index='Durata', columns='Impatto', values='Click')
+    fig = go.Figure(go.Heatmap(
+        z=grid.to_numpy(), x=(grid.columns.to_numpy() * 100).round(1), y=grid.index.to_numpy(),
+        colorscale="RdYlGn", colorbar=dict(title="Click"),
+        hovertemplate="Impatto %{x}%<br>Durata %{y} gg<br>Click %{z:,.0f}<extra></extra>"
+    ))
+    fig.update_layout(template="simple_white", height=420, xaxis_title="Impatto (%)", yaxis_title="Durata (giorni)")
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.dataframe(table.style.format({'Impatto': '{:+.0%}', 'Click': '{:,.0f}', 'Delta (Click)': '{:+,.0f}', 'Delta %': '{:+.1f}%'}),
+                 use_container_width=True, height=300)
+    st.download_button("📥 Scarica Griglia (CSV)", table.to_csv(index=False).encode('utf-8'),
+                       file_name="sensitivity_sweep.csv", mime="text/csv", key="dl_sweep")
+
+
+# --- PROSPECTING PACKAGES ---
+SETUP_MODE_LABELS = {"none": "Nessuno", "lite": "Lite", "full": "Full", "strategy": "Strategy"}
+ON_OFF_LABELS = {False: "Off", True: "On"}
+
+
+def _parse_levels(text):
+    """'10, 20, 30' -> [10.0, 20.0, 30.0] (invalid entries are ignored)."""
+    levels = []
+    for part in text.replace(';', ',').split(','):
+        try:
+            levels.append(float(part.strip()))
+        except ValueError:
+            continue
+    return sorted(set(levels))
+
+
+@_fragment
+def render_package_ranking(history_max):
+    """Ranks every combination of prospecting options by incremental clicks on the last baseline."""
+    baseline = st.session_state.get('last_baseline_forecast')
+    if baseline is None:
+        st.caption("Genera prima un forecast: i pacchetti vengono valutati sulla sua baseline.")
+        return
+
+    with st.form("packages_form"):
+        c1, c2 = st.columns(2)
+        start_date = c1.date_input("Inizio Contratto", value=(history_max + pd.Timedelta(days=1)).date(), key="pkg_start")
+        months = c2.number_input("Durata Contratto (mesi)", 1, 36, 12, key="pkg_months")
+        setup_modes = st.multiselect("Setup", list(SETUP_MODE_LABELS), default=list(SETUP_MODE_LABELS),
+                                     format_func=SETUP_MODE_LABELS.get, key="pkg_setup")
+        c3, c4 = st.columns(2)
+        content_on = c3.multiselect("Content Marketing", [False, True], default=[False, True], format_func=ON_OFF_LABELS.get, key="pkg_content")
+        content_levels = c3.text_input("Impatto Content (% target, separati da virgola)", "10, 20, 30", key="pkg_content_levels")
+        link_on = c4.multiselect("Link Building", [False, True], default=[False, True], format_func=ON_OFF_LABELS.get, key="pkg_link")
+        link_levels = c4.text_input("Impatto Link (% target, separati da virgola)", "10, 20, 30", key="pkg_link_levels")
+        c5, c6, c7 = st.columns(3)
+        tech_modes = c5.multiselect("Tech", ["none", "care"], default=["none", "care"],
+                                    format_func={"none": "Nessuno", "care": "Tech Care"}.get, key="pkg_tech")
+        onpage_on = c6.multiselect("On-Page", [False, True], default=[False, True], format_func=ON_OFF_LABELS.get, key="pkg_onpage")
+        local_on = c7.multiselect("Local SEO", [False, True], default=[False], format_func=ON_OFF_LABELS.get, key="pkg_local")
+        keep_current = st.checkbox("Includi gli eventi futuri attuali", value=False, key="pkg_keep_current")
+        submitted = st.form_submit_button("Valuta Pacchetti")
+
+    if submitted:
+        grid = {
+            'setup_mode': setup_modes or ['none'],
+            'content_enabled': content_on or [False],
+            'content_impact_total': _parse_levels(content_levels) or [0],
+            'link_enabled': link_on or [False],
+            'link_impact_total': _parse_levels(link_levels) or [0],
+            'tech_mode': tech_modes or ['none'],
+            'onpage_enabled': onpage_on or [False],
+            'local_enabled': local_on or [False]
+        }
+        months = int(months)
+        base_form = {'contract_start_date': start_date, 'contract_months': months, 'content_months': (1, months),
+                     'link_months': (1, months), 'onpage_months': (1, months), 'local_months': (1, months)}
+        st.session_state.package_result = evaluate_packages(
+            baseline, expand_form_variants(base_form, grid), start=history_max,
+            base_events=st.session_state.get('last_override_events') if keep_current else None
+        )
+
+    res = st.session_state.get('package_result')
+    if res is None:
+        return
+    table = res['table']
+    st.caption(f"{res['n_variants']:,} combinazioni → {res['n_packages']:,} pacchetti distinti, valutati in "
+               f"{(res['timing']['generate_s'] + res['timing']['evaluate_s']) * 1000:.0f} ms · "
+               f"Click senza pacchetto: {res['reference']:,.0f}")
+
+    top = table.head(15).iloc[::-1]
+    fig = go.Figure(go.Bar(x=top['Click Incrementali'], y=top['Pacchetto'], orientation='h', marker_color='#4CAF50',
+                           hovertemplate="%{y}<br>+%{x:,.0f} click<extra></extra>"))
+    fig.update_layout(template="simple_white", height=450, xaxis_title="Click Incrementali", yaxis=dict(automargin=True, tickfont=dict(size=10)))
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.dataframe(table.style.format({'Click': '{:,.0f}', 'Click Incrementali': '{:+,.0f}', 'Incremento %': '{:+.1f}%'}),
+                 use_container_width=True, height=350)
+    st.download_button("📥 Scarica Classifica Pacchetti (CSV)", table.to_csv(index=False).encode('utf-8'),
+                       file_name="pacchetti_prospecting.csv", mime="text/csv", key="dl_packages")
+
+
+# --- GOAL SEEK ---
+GOAL_SEEK_MODES = {"impact": "Impatto minimo", "start": "Mese di inizio (il più tardi possibile)", "duration": "Durata"}
+GOAL_TARGET_KINDS = {"clicks": "Click totali", "yoy_pct": "Crescita YoY %", "quarters": "Obiettivi trimestrali"}
+
+
+@_fragment
+def render_goal_seek(history_df):
+    """Solves the impact / start / duration of the chosen future events needed to reach a click goal."""
+    baseline = st.session_state.get('last_baseline_forecast')
+    override_events = st.session_state.get('last_override_events') or []
+    if baseline is None or not override_events:
+        st.caption("Nessun evento futuro nell'ultimo forecast: aggiungi eventi dopo la fine dello storico per usare il solver.")
+        return
+
+    history_max = history_df['date'].max()
+    future_ds = baseline.loc[baseline['ds'] > history_max, 'ds']
+    years = [str(y) for y in future_ds.dt.year.unique()]
+    quarters = [str(q) for q in future_ds.dt.to_period('Q').unique()]
+    labels = [f"{e['name']} ({pd.to_datetime(e['date']).strftime('%d/%m/%Y')})" for e in override_events]
+
+    with st.form("goal_seek_form"):
+        vary = st.multiselect("Eventi da regolare", range(len(override_events)), default=[0],
+                              format_func=lambda i: labels[i], key="gs_events")
+        c1, c2 = st.columns(2)
+        mode = c1.radio("Cosa cercare", list(GOAL_SEEK_MODES), format_func=GOAL_SEEK_MODES.get, key="gs_mode")
+        kind = c2.radio("Obiettivo", list(GOAL_TARGET_KINDS), format_func=GOAL_TARGET_KINDS.get, key="gs_kind")
+        c3, c4 = st.columns(2)
+        period = c3.selectbox("Periodo (click totali / YoY)", years + quarters, key="gs_period")
+        goal_value = c4.number_input("Click totali o crescita YoY %", value=10.0, step=1.0, key="gs_value")
+        quarter_goals = st.data_editor(pd.DataFrame({"Trimestre": quarters, "Obiettivo Click": [None] * len(quarters)}),
+                                       disabled=["Trimestre"], hide_index=True, key="gs_quarters",
+                                       column_config={"Obiettivo Click": st.column_config.NumberColumn(format="%d")})
+        submitted = st.form_submit_button("Calcola Piano Minimo")
+
+    if submitted and vary:
+        if kind == 'quarters':
+            filled = quarter_goals.dropna(subset=["Obiettivo Click"])
+            targets = [{'period': q, 'clicks': float(v)} for q, v in zip(filled["Trimestre"], filled["Obiettivo Click"])]
+        else:
+            targets = [{'period': period, kind: float(goal_value)}]
+        if not targets:
+            st.warning("Inserisci almeno un obiettivo trimestrale.")
+            return
+        try:
+            st.session_state.goal_seek_result = scenario_analysis.goal_seek(
+                baseline, override_events, vary, targets, mode=mode, history_df=history_df, start=history_max)
+        except ValueError as e:
+            st.error(str(e))
+            return
+
+    res = st.session_state.get('goal_seek_result')
+    if res is None:
+        return
+    value = res['value']
+    if res['mode'] == 'impact':
+        shown = f"{value:+.1%}"
+    elif res['mode'] == 'start':
+        shown = f"{value:+d} mesi"
+    else:
+        shown = f"{value} giorni"
+    if res['status'] == 'solved':
+        st.success(f"Piano minimo: {GOAL_SEEK_MODES[res['mode']].lower()} = **{shown}**")
+    elif res['status'] == 'already_met':
+        st.info(f"Obiettivo già raggiunto anche senza il contributo degli eventi selezionati ({shown}).")
+    else:
+        st.warning(f"Obiettivo non raggiungibile entro i limiti di ricerca (miglior valore: {shown}).")
+
+    st.dataframe(res['targets'].style.format('{:,.0f}', subset=['Obiettivo', 'Storico', 'Forecast', 'Totale', 'Scarto']),
+                 use_container_width=True, hide_index=True)
+    st.dataframe(pd.DataFrame([{"Evento": e['name'], "Data": pd.to_datetime(e['date']).strftime('%d/%m/%Y'),
+                                "Tipo": e['type'], "Durata": int(e['duration']), "Impatto": e['impact']} for e in res['plan']])
+                 .style.format({'Impatto': '{:+.1%}'}), use_container_width=True, hide_index=True)
+    st.caption("Diagnostica: " + " · ".join(f"{k}: {v}" for k, v in res['diagnostics'].items()))
+
+
+# --- SCENARIO COMPARISON ---
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_scenario_matrix(project_name, scenario_keys):
+    """
+    Aligned date x scenario matrix of yhat (NaN where a scenario has no data), filled from
+    the memory-mapped scenario files. scenario_keys: tuple of (label, file, mtime); the
+    mtimes are part of the cache key, so a changed file rebuilds the matrix.
+    """
+    return scenario_analysis.align_scenario_arrays(
+        {label: tools.project_manager.load_scenario_array(project_name, filename) for label, filename, _ in scenario_keys},
+        future_only=False
+    )
+
+
+def _scenario_labels(scenarios):
+    """Unique display label per scenario (names can repeat, e.g. batch runs)."""
+    counts = pd.Series([s['name'] for s in scenarios]).value_counts()
+    return {s['id']: (s['name'] if counts[s['name']] == 1 else f"{s['name']} ({s['created_at']})") for s in scenarios}
+
+
+@_fragment
+def render_scenario_comparison(curr_p, max_points=None):
+    scenarios = tools.project_manager.load_scenarios(curr_p)
+    if len(scenarios) < 2:
+        st.warning(f"⚠️ Hai salvato solo {len(scenarios)} scenario/i. Salvane almeno 2 per attivare il confronto.")
+        if len(scenarios) == 1:
+             st.write(f"Scenario attuale: **{scenarios[0]['name']}** ({scenarios[0]['created_at']})")
+        return
+
+    labels = _scenario_labels(scenarios)
+    by_label = {labels[s['id']]: s for s in scenarios}
+    all_labels = list(by_label.keys())
+
+    # 1. Summary Table (catalog only, no series loaded)
+    st.markdown("### 📋 Riepilogo Scenari")
+    df_comp_table = pd.DataFrame([{
+        "Scenario": labels[s['id']],
+        "Data Creazione": s['created_at'],
+        "Click Totali (Forecast)": s['total_clicks'],
+        "Eventi Attivi": s['events_count']
+    } for s in scenarios])
+    st.dataframe(
+        df_comp_table.style.format({'Click Totali (Forecast)': '{:,.0f}'}),
+        use_container_width=True
+    )
+
+    # 2. Selection: only these series are loaded
+    st.divider()
+    st.markdown("### 📈 Trend a Confronto")
+    selected = st.multiselect("Scenari nel grafico", all_labels, default=all_labels[:min(5, len(all_labels))], key="scen_compare_sel")
+
+    c_sel1, c_sel2 = st.columns(2)
+    with c_sel1:
+        s_a_name = st.selectbox("Scenario Base (A)", all_labels, index=len(all_labels)-1, key="scen_a")
+    with c_sel2:
+        s_b_name = st.selectbox("Scenario Target (B)", all_labels, index=0, key="scen_b")
+
+    needed = list(dict.fromkeys(selected + [s_a_name, s_b_name]))
+    scenario_keys = tuple(
+        (lbl, by_label[lbl]['file'], tools.project_manager.get_scenario_mtime(curr_p, by_label[lbl]['file']))
+        for lbl in needed
+    )
+    matrix = build_scenario_matrix(curr_p, scenario_keys)
+    # Filter Future Only for clarity
+    future_matrix = matrix[matrix.index > pd.Timestamp.now()] if not matrix.empty else matrix
+
+    fig_comp = go.Figure()
+    palette = ['#2E7D32', '#1565C0', '#D84315', '#6A1B9A', '#00838F', '#AD1457']
+    loaded_count = 0
+    for i, lbl in enumerate(selected):
+        if lbl in future_matrix.columns and future_matrix[lbl].notna().any():
+            col = downsample_frame(future_matrix[lbl].dropna().reset_index(), 'ds', lbl, max_points)
+            fig_comp.add_trace(go.Scatter(
+                x=col['ds'],
+                y=col[lbl],
+                mode='lines',
+                name=lbl,
+                line=dict(width=2, color=palette[i % len(palette)])
+            ))
+            loaded_count += 1
+
+    if loaded_count > 0:
+        fig_comp.update_layout(
+            title="Confronto Curve di Traffico (Forecast)",
+            hovermode="x unified",
+            template="plotly_white",
+            yaxis_title="Click Stimati",
+            legend=dict(orientation="h", y=1.1)
+        )
+        st.plotly_chart(fig_comp, use_container_width=True)
+    elif selected:
+        st.warning("Impossibile caricare i dati dei grafici per gli scenari selezionati.")
+
+    # Full matrix: every selected scenario against a reference, per month/quarter
+    matrix_cols = [lbl for lbl in selected if lbl in future_matrix.columns]
+    if len(matrix_cols) >= 2:
+        st.markdown("### 🧮 Matrice Scenari")
+        c_m1, c_m2 = st.columns([2, 1])
+        with c_m1:
+            ref_name = st.selectbox("Scenario di Riferimento", matrix_cols, key="scen_matrix_ref")
+        with c_m2:
+            freq_label = st.radio("Aggregazione", list(scenario_analysis.COMPARISON_FREQS.values()), horizontal=True, key="scen_matrix_freq")
+
+        freq = {v: k for k, v in scenario_analysis.COMPARISON_FREQS.items()}[freq_label]
+        tidy = scenario_analysis.compare_scenarios(future_matrix[matrix_cols], ref_name, freqs=(freq,))
+        if not tidy.empty:
+            wide = tidy.pivot(index='Periodo', columns='Scenario', values=['Click', 'Delta %'])[['Click', 'Delta %']]
+            wide = wide.reindex(columns=matrix_cols, level=1)
+            st.dataframe(
+                wide.style.format('{:,.0f}', subset=['Click']).format('{:+.1%}', subset=['Delta %']),
+                use_container_width=True
+            )
+            st.download_button(
+                "📥 Scarica Matrice (CSV)",
+                tidy.to_csv(index=False).encode('utf-8'),
+                file_name=f"matrice_scenari_{curr_p}.csv",
+                mime="text/csv",
+                key="dl_scen_matrix"
+            )
+
+    # 3. Delta Analysis (same aligned matrix as the chart)
+    st.divider()
+    st.markdown("### ⚖️ Analisi Differenziale (A vs B)")
+
+    s_a = by_label[s_a_name]
+    s_b = by_label[s_b_name]
+
+    # Calculate Metrics
+    delta_clicks = s_b['total_clicks'] - s_a['total_clicks']
+    delta_pct = (delta_clicks / s_a['total_clicks']) if s_a['total_clicks'] > 0 else 0
+
+    c_res1, c_res2, c_res3 = st.columns(3)
+    c_res1.metric("Differenza Totale Click", f"{int(delta_clicks):+,.0f}", delta=f"{delta_pct:+.1%}")
+
+    if s_a_name in future_matrix.columns and s_b_name in future_matrix.columns:
+        common = future_matrix[[s_a_name, s_b_name]].dropna()
+        if s_a_name == s_b_name:
+            common = future_matrix[[s_a_name]].dropna()
+            common[s_b_name + " "] = common[s_a_name]
+        if not common.empty:
+            daily_delta = common.iloc[:, 1] - common.iloc[:, 0]
+            base_sum = common.iloc[:, 0].sum()
+            c_res2.metric("Δ Periodo Comune", f"{daily_delta.sum():+,.0f}",
+                          delta=f"{daily_delta.sum() / base_sum:+.1%}" if base_sum > 0 else None,
+                          help=f"{len(common)} giorni futuri presenti in entrambi gli scenari.")
+            c_res3.metric("Δ Medio Giornaliero", f"{daily_delta.mean():+,.1f}")
+            st.area_chart(daily_delta.rename("Δ Click (B - A)"))
+
+    st.info(f"Confrontando **{s_b_name}** rispetto a **{s_a_name}**: lo scenario Target porta {int(delta_clicks):+,.0f} click in totale.")
+
 
 # --- DIALOG DEFINITIONS ---
 # Try to import dialog (st.dialog is new in 1.34+, st.experimental_dialog in 1.23+)
@@ -147,9 +728,6 @@ else:
     def edit_report_prompt_dialog():
         st.warning("Feature 'Dialog' non supportata.")
 
-import tools.export_utils
-importlib.reload(tools.export_utils)
-
 
 DEFAULT_SYSTEM_PROMPT = """# SEO Forecasting Assistant - System Prompt (v2.0 - App Optimized)
 
@@ -248,6 +826,8 @@ def init_session_state():
         st.session_state.last_metrics = None
     if 'last_debug' not in st.session_state:
         st.session_state.last_debug = None
+    if 'last_forecast_id' not in st.session_state:
+        st.session_state.last_forecast_id = None
 
     if 'generated_report' not in st.session_state:
         st.session_state.generated_report = None
@@ -451,6 +1031,14 @@ else:
 # 1. File Uploads
 st.sidebar.header("1. Upload Dati")
 gsc_file = st.sidebar.file_uploader("GSC Export (CSV)", type=['csv'])
+use_project_history = False
+if st.session_state.get('current_project'):
+    use_project_history = st.sidebar.checkbox(
+        "Usa e aggiorna lo storico del progetto",
+        value=True,
+        key="use_project_history",
+        help="Ogni export caricato viene unito allo storico salvato (solo i giorni nuovi + gli ultimi giorni ancora parziali). Senza upload si usa lo storico salvato."
+    )
 reg_file = st.sidebar.file_uploader("Regressori (Excel)", type=['xlsx'])
 
 # 2. Configura Forecast
@@ -458,6 +1046,13 @@ st.sidebar.header("2. Parametri Forecast")
 
 # Aggregation for Chart
 agg_mode = st.sidebar.selectbox("Aggregazione Grafico", ["Giornaliero", "Settimanale", "Mensile"], index=0)
+# Chart width in px the traces are reduced to (None = every point is sent to the browser)
+CHART_DETAIL_OPTIONS = {"Standard": 1200, "Alto (schermi 4K)": 2400, "Completo": None}
+chart_detail = st.sidebar.selectbox(
+    "Dettaglio Grafico", list(CHART_DETAIL_OPTIONS), index=0,
+    help="Le serie lunghe vengono ridotte lato server (LTTB) mantenendo forma e picchi. 'Completo' invia tutti i punti. Gli export usano sempre i dati completi."
+)
+chart_max_points = point_budget(CHART_DETAIL_OPTIONS[chart_detail])
 
 horizon = st.sidebar.selectbox(
     "Orizzonte Temporale", 
@@ -531,6 +1126,42 @@ with st.sidebar.expander("Avanzate (Prophet)"):
         idx_d = seas_toggles.index(curr_d) if curr_d in seas_toggles else 2
         daily_seas = st.selectbox("Daily", seas_toggles, index=idx_d, key="daily_seasonality")
 
+    st.markdown("---")
+    grouping_labels = {"none": "Un regressore per evento", "event_type": "Raggruppa per categoria (event_type)"}
+    reg_grouping = st.selectbox(
+        "Regressori Prophet",
+        list(grouping_labels.keys()),
+        format_func=lambda k: grouping_labels[k],
+        key="regressor_grouping",
+        help="Con molti eventi, raggruppare per categoria stima un solo coefficiente per gruppo (fit più veloce). L'impatto viene poi ripartito sui singoli eventi."
+    )
+    impact_samples = st.selectbox(
+        "Simulazioni Monte Carlo (eventi futuri)",
+        [0, 1000, 5000, 10000],
+        index=2,
+        key="impact_samples",
+        help="Per gli eventi futuri con 'Impatto Min/Max' o 'Dev. Std Impatto' calcola bande di rischio P10/P50/P90. 0 = disattivato."
+    )
+    uncertainty_samples = st.selectbox(
+        "Campioni Incertezza (intervalli)",
+        [200, 500, 1000, 2000],
+        index=2,
+        key="uncertainty_samples",
+        help="Simulazioni Prophet per yhat_lower/yhat_upper. Meno campioni = intervalli più rapidi ma meno stabili."
+    )
+    progressive_intervals = st.checkbox(
+        "Intervalli progressivi",
+        value=True,
+        key="progressive_intervals",
+        help="Mostra subito la previsione puntuale e calcola gli intervalli di confidenza in background."
+    )
+    use_warm_start = st.checkbox(
+        "Warm start (riusa parametri dell'ultimo fit)",
+        value=True,
+        key="use_warm_start",
+        help="Parte dai parametri dell'ultimo modello del progetto: refit più rapidi quando cambiano solo pochi giorni di dati o i prior."
+    )
+
 config = {
     "horizon_days": horizon,
     "seasonality_mode": seasonality,
@@ -539,34 +1170,55 @@ config = {
     "seasonality_prior_scale": seasonality_scale,
     "yearly_seasonality": yearly_seas,
     "weekly_seasonality": weekly_seas,
-    "daily_seasonality": daily_seas
+    "daily_seasonality": daily_seas,
+    "regressor_grouping": reg_grouping,
+    "impact_samples": impact_samples,
+    "uncertainty_samples": uncertainty_samples,
+    "progressive": progressive_intervals
 }
 
 # --- Main Interface ---
 st.title("📈 SEO Organic Traffic Forecaster")
 st.markdown("Genera previsioni di traffico basate su dati storici e regressori personalizzati (Core Updates, Stagionalità, Eventi).")
 
-if not gsc_file:
+history_project = st.session_state.current_project if use_project_history else None
+has_stored_history = history_project is not None and tools.project_manager.get_history_mtime(history_project) is not None
+
+if not gsc_file and not has_stored_history:
     st.info("👋 Per iniziare, carica il file CSV di Google Search Console.")
     # Show dummy data option?
     # Keeping it simple for now.
     st.stop()
 
 # --- Execution Logic ---
-if gsc_file:
+if gsc_file or has_stored_history:
     # 1. Ingest GSC
     with st.spinner("Analisi dati GSC..."):
         try:
-            df_gsc = pd.read_csv(gsc_file)
-            res_gsc = validate_gsc_data(df_gsc)
-            
-            if res_gsc['status'] == 'error':
-                st.error(f"Errore GSC: {res_gsc['message']}")
-                st.stop()
-            elif res_gsc['status'] == 'warning':
-                st.warning(res_gsc['message'])
-            
-            history_df = res_gsc['data']
+            if gsc_file:
+                gsc_bytes = gsc_file.getvalue()
+                history_digest = content_digest(gsc_bytes)
+                res_gsc = load_gsc_history(history_digest, gsc_bytes)
+                
+                if res_gsc['status'] == 'error':
+                    st.error(f"Errore GSC: {res_gsc['message']}")
+                    st.stop()
+                elif res_gsc['status'] == 'warning':
+                    st.warning(res_gsc['message'])
+                
+                history_df = res_gsc['data']
+
+                # Merge each distinct upload into the project store once
+                if history_project and st.session_state.get('history_merged') != (history_project, history_digest):
+                    _, merge_stats = tools.project_manager.merge_history(history_project, history_df)
+                    st.session_state.history_merged = (history_project, history_digest)
+                    st.toast(f"Storico '{history_project}': +{merge_stats['added']} giorni nuovi, {merge_stats['updated']} aggiornati.")
+
+            if history_project:
+                history_mtime = tools.project_manager.get_history_mtime(history_project)
+                history_df = load_project_history(history_project, history_mtime)
+                history_digest = content_digest(f"{history_project}:{history_mtime}".encode())
+
             st.success(f"✅ Dati caricati: {len(history_df)} giorni analizzati ({history_df['date'].min().date()} - {history_df['date'].max().date()})")
             
         except Exception as e:
@@ -574,13 +1226,18 @@ if gsc_file:
             st.stop()
 
     # --- TABS DEFINITION (Global) ---
-    tab_forecast, tab_compare, tab_regressors, tab_report, tab_chat = st.tabs([
+    tab_labels = [
         "📊 Analisi & Forecast", 
         "⚔️ Confronto Scenari", 
         "📝 Gestione Regressori", 
         "📋 Report", 
         "🤖 Assistant"
-    ])
+    ]
+    try:
+        # Tracked tabs (newer Streamlit): tab.open tells which one is visible
+        tab_forecast, tab_compare, tab_regressors, tab_report, tab_chat = st.tabs(tab_labels, key="main_tabs", on_change="rerun")
+    except TypeError:
+        tab_forecast, tab_compare, tab_regressors, tab_report, tab_chat = st.tabs(tab_labels)
 
     # 2. Ingest Regressors (Optional but recommended)
     # Only load from file if events list is empty OR if a new file is uploaded
@@ -643,6 +1300,33 @@ if gsc_file:
                 suggestions = analyze_gsc_data_heuristics(history_df)
                 st.session_state['param_suggestions'] = suggestions
                 st.session_state['ai_param_explanation'] = None # Reset AI expl
+
+        tune_n = st.number_input("Candidati Auto-tune", min_value=4, max_value=60, value=40, step=4, key="autotune_candidates")
+        if st.button("⚙️ Auto-tune (errore su holdout)", help="Prova più combinazioni di parametri in parallelo, scartando presto le peggiori, e sceglie quella con il MAPE più basso sugli ultimi 30 giorni."):
+            tune_bar = st.progress(0.0, text="Auto-tune in corso...")
+            def _tune_progress(rung, n_rungs, n_fits):
+                tune_bar.progress((rung + 1) / n_rungs, text=f"Round {rung + 1}/{n_rungs}: {n_fits} candidati valutati")
+            try:
+                tune = auto_tune(history_df, st.session_state.events, config, max_candidates=int(tune_n), on_progress=_tune_progress)
+                st.session_state['autotune_result'] = tune
+                if tune['best']:
+                    st.session_state['param_suggestions'] = {
+                        **tune['best'],
+                        "reasons": [f"Auto-tune ({tune['method']}): MAPE holdout {tune['best_score']['mape']:.2f}% "
+                                    f"su {tune['timing']['fits']} fit in {tune['timing']['wall_s']:.0f}s."]
+                    }
+                    st.session_state['ai_param_explanation'] = None
+                else:
+                    st.error("Auto-tune: nessun candidato valido.")
+            except Exception as e:
+                st.error(f"Errore Auto-tune: {str(e)}")
+            tune_bar.empty()
+
+    if st.session_state.get('autotune_result') is not None:
+        with st.expander("📊 Dettaglio Auto-tune (candidati e tempi)"):
+            trials = st.session_state['autotune_result']['trials']
+            st.dataframe(trials.drop(columns=[c for c in ['message'] if c in trials.columns])
+                         .sort_values(['rung', 'mape'], ascending=[False, True]), use_container_width=True)
                 
     if st.session_state.get('param_suggestions'):
         sugg = st.session_state['param_suggestions']
@@ -739,7 +1423,7 @@ if gsc_file:
                 df_editor = pd.DataFrame(st.session_state.events)
                 
                 # Ensure columns order
-                cols_order = ['name', 'date', 'type', 'duration', 'impact', 'event_type']
+                cols_order = ['name', 'date', 'type', 'duration', 'impact', 'impact_min', 'impact_max', 'impact_sd', 'event_type']
                 for c in cols_order:
                     if c not in df_editor.columns:
                         df_editor[c] = None
@@ -755,6 +1439,8 @@ if gsc_file:
                     df_editor['date'] = pd.to_datetime(df_editor['date'])
                     df_editor['duration'] = df_editor['duration'].fillna(30).astype(int)
                     df_editor['impact'] = df_editor['impact'].fillna(0.0).astype(float)
+                    for c in ['impact_min', 'impact_max', 'impact_sd']:
+                        df_editor[c] = pd.to_numeric(df_editor[c], errors='coerce')
             else:
                 # Empty template with correct types
                 df_editor = pd.DataFrame({
@@ -763,6 +1449,9 @@ if gsc_file:
                     'type': pd.Series(dtype='str'),
                     'duration': pd.Series(dtype='int'),
                     'impact': pd.Series(dtype='float'),
+                    'impact_min': pd.Series(dtype='float'),
+                    'impact_max': pd.Series(dtype='float'),
+                    'impact_sd': pd.Series(dtype='float'),
                     'event_type': pd.Series(dtype='str')
                 })
 
@@ -780,6 +1469,9 @@ if gsc_file:
                     "date": st.column_config.DateColumn("Data", format="YYYY-MM-DD"),
                     "type": st.column_config.SelectboxColumn("Tipo", options=["decay", "window", "step", "ramp"]),
                     "impact": st.column_config.NumberColumn("Impatto", help="Range -1.0 a 1.0"),
+                    "impact_min": st.column_config.NumberColumn("Impatto Min", help="Opzionale (solo eventi futuri): scenario pessimistico per le bande Monte Carlo"),
+                    "impact_max": st.column_config.NumberColumn("Impatto Max", help="Opzionale (solo eventi futuri): scenario ottimistico per le bande Monte Carlo"),
+                    "impact_sd": st.column_config.NumberColumn("Dev. Std Impatto", help="Opzionale: incertezza dell'impatto (alternativa a Min/Max)"),
                     "duration": st.column_config.NumberColumn("Durata (gg)", default=30),
                 },
                 key=f"regressor_editor_{st.session_state.events_editor_key}",
@@ -899,7 +1591,9 @@ if gsc_file:
             if 'last_forecast' in st.session_state and st.session_state.get('current_project'):
                 with st.expander("💾 Salva in Scenari", expanded=False):
                     scen_name = st.text_input("Nome Scenario", value=f"Scenario {pd.Timestamp.now().strftime('%d/%m %H:%M')}")
-                    if st.button("Salva Scenario"):
+                    if intervals_pending():
+                        st.caption("⏳ " + INTERVALS_PENDING_HELP)
+                    if st.button("Salva Scenario", disabled=intervals_pending(), help=INTERVALS_PENDING_HELP if intervals_pending() else None):
                         ok, msg = tools.project_manager.save_scenario(
                             st.session_state.current_project,
                             scen_name,
@@ -923,13 +1617,32 @@ if gsc_file:
             with st.spinner("Addestramento modello Prophet in corso..."):
                 try:
                     # Use events from session state
-                    results = execute_forecast(history_df, st.session_state.events, config)
+                    # Warm start: last fitted params of this project (or of this session)
+                    run_config = dict(config)
+                    curr_proj = st.session_state.get('current_project')
+                    if use_warm_start:
+                        run_config['warm_start'] = (tools.project_manager.load_fit_params(curr_proj) if curr_proj else None) \
+                            or st.session_state.get('last_warm_start')
+                    results = execute_forecast(history_df, st.session_state.events, run_config)
+                    st.session_state.last_warm_start = results['warm_start']
+                    if curr_proj:
+                        tools.project_manager.save_fit_params(curr_proj, results['warm_start'])
                     
                     # Save as last forecast
                     st.session_state.last_forecast = results['forecast']
                     st.session_state.last_metrics = results['metrics']
                     st.session_state.last_debug = results['debug_info']
                     st.session_state.last_run_config = config
+                    st.session_state.last_forecast_id = results['forecast_id']
+                    st.session_state.last_impact_bands = results['impact_bands']
+                    st.session_state.last_baseline_forecast = results['baseline_forecast'][['ds', 'yhat']]
+                    st.session_state.last_override_events = results['override_events']
+                    st.session_state.sweep_result = None
+                    st.session_state.package_result = None
+                    st.session_state.goal_seek_result = None
+                    st.session_state.interval_job = None
+                    if results['intervals']['status'] == 'pending':
+                        submit_interval_job(results['intervals'])
                     st.rerun()
                     
                 except Exception as e:
@@ -941,10 +1654,13 @@ if gsc_file:
             forecast = st.session_state.last_forecast
             metrics = st.session_state.last_metrics
             debug = st.session_state.last_debug
+            # Older sessions (or restored scenarios) have no id: key derived views on the frame itself
+            forecast_id = current_forecast_id(forecast)
             
             # --- Results Display ---
             st.divider()
             st.subheader("📊 Risultati Previsione")
+            poll_interval_job()
                 
             # Metrics Row
             # Check comparison
@@ -1042,271 +1758,130 @@ if gsc_file:
             st.markdown("### ⚙️ Metriche Modello")
             
             c1, c2, c3 = st.columns(3)
-            c1.metric("MAPE", f"{metrics['mape']:.2f}%")
+            c1.metric("MAPE", f"{metrics['mape']:.2f}%", help="In-sample: errore sul periodo di training. Per l'accuratezza reale usa il Backtest.")
             if 'rmse' in metrics: c2.metric("RMSE", f"{int(metrics['rmse'])}")
             if 'mae' in metrics: c3.metric("MAE", f"{int(metrics.get('mae', 0))}")
 
+            with st.expander("🧪 Backtest Rolling-Origin (accuratezza out-of-sample)"):
+                st.caption("Ri-addestra il modello a più date di taglio passate e confronta la previsione con i dati reali dei giorni successivi.")
+                c_bt1, c_bt2, c_bt3 = st.columns(3)
+                bt_horizon = c_bt1.number_input("Orizzonte (giorni)", min_value=7, max_value=365, value=min(int(target_days), 90), step=7, key="bt_horizon")
+                bt_period = c_bt2.number_input("Passo tra i tagli (giorni)", min_value=1, max_value=180, value=max(1, int(bt_horizon) // 2), key="bt_period")
+                bt_bucket = c_bt3.selectbox("Granularità", [1, 7, 30], index=1, format_func=lambda d: {1: "Giorno", 7: "Settimana", 30: "Mese"}[d], key="bt_bucket")
+
+                if st.button("▶️ Esegui Backtest", key="run_backtest_btn"):
+                    with st.spinner("Backtest in corso (fold in parallelo)..."):
+                        try:
+                            bt_res = run_backtest(history_df, st.session_state.events, st.session_state.last_run_config or config,
+                                                  horizon=int(bt_horizon), period=int(bt_period), bucket_days=int(bt_bucket))
+                            bt_res['forecast_id'] = forecast_id
+                            st.session_state.last_backtest = bt_res
+                        except Exception as e:
+                            st.error(f"Errore backtest: {str(e)}")
+
+                bt = st.session_state.get('last_backtest')
+                if bt:
+                    if bt.get('forecast_id') != forecast_id:
+                        st.warning("Backtest relativo a un forecast precedente: rieseguilo per aggiornarlo.")
+                    bt_sum = bt['summary']
+                    if bt_sum.get('mape') is None:
+                        st.info("Storico insufficiente per l'orizzonte scelto.")
+                    else:
+                        b1, b2, b3, b4 = st.columns(4)
+                        b1.metric("MAPE (out-of-sample)", f"{bt_sum['mape']:.2f}%")
+                        b2.metric("RMSE", f"{int(bt_sum['rmse'])}")
+                        b3.metric("MAE", f"{int(bt_sum['mae'])}")
+                        b4.metric("Copertura Intervallo", f"{bt_sum['coverage']:.0%}")
+                        st.dataframe(bt['by_horizon'].rename(columns={
+                            'horizon': 'Orizzonte (gg)', 'n': 'Punti', 'mape': 'MAPE %',
+                            'rmse': 'RMSE', 'mae': 'MAE', 'coverage': 'Copertura'
+                        }).style.format({'MAPE %': '{:.2f}', 'RMSE': '{:,.0f}', 'MAE': '{:,.0f}', 'Copertura': '{:.0%}'}),
+                            use_container_width=True)
+                        t = bt['timing']
+                        st.caption(f"{bt_sum['folds']} fold ({t['folds_run']} eseguiti, {t['folds_memo']} da cache) in {t['wall_s']:.1f}s")
+
             
             st.divider()
 
             # Chart
             st.subheader(f"Trend Temporale ({agg_mode})")
             
-            # Chart Aggregation Logic
-            plot_df_hist = history_df.copy()
-            plot_df_forecast = forecast.copy()
-            plot_base = None
-            
-            if st.session_state.baseline_forecast is not None:
-                plot_base = st.session_state.baseline_forecast.copy()
-            
-            if agg_mode == "Settimanale":
-                plot_df_hist = plot_df_hist.resample('W', on='date').sum().reset_index()
-                plot_df_forecast = plot_df_forecast.resample('W', on='ds').sum().reset_index()
-                if plot_base is not None: plot_base = plot_base.resample('W', on='ds').sum().reset_index()
-            elif agg_mode == "Mensile":
-                plot_df_hist = plot_df_hist.resample('ME', on='date').sum().reset_index()
-                plot_df_forecast = plot_df_forecast.resample('ME', on='ds').sum().reset_index()
-                if plot_base is not None: plot_base = plot_base.resample('ME', on='ds').sum().reset_index()
-
-            fig = go.Figure()
-            
-            # Historical
-            fig.add_trace(go.Scatter(
-                x=plot_df_hist['date'], 
-                y=plot_df_hist['clicks'],
-                mode='lines',
-                name='Storico',
-                line=dict(color='#333333', width=1)
-            ))
-            
-            # Forecast
-            future_only = plot_df_forecast[plot_df_forecast['ds'] > plot_df_hist['date'].max()]
-            fig.add_trace(go.Scatter(
-                x=future_only['ds'],
-                y=future_only['yhat'],
-                mode='lines',
-                name='Previsione',
-                line=dict(color='#4CAF50', width=2)
-            ))
-            
-            # Baseline Trace Removed
-
-                
-            # Events Markers setup
-            if st.session_state.events:
-                 # Filter events in range? Plotly handles zooming.
-                 pass 
+            # Server-side zoom: the point budget is spent on the selected window only
+            chart_min = history_df['date'].min().to_pydatetime()
+            chart_max = max(forecast['ds'].max(), history_df['date'].max()).to_pydatetime()
+            chart_window = None
+            if chart_max_points is not None and chart_max > chart_min:
+                sel_window = st.slider(
+                    "Finestra temporale", min_value=chart_min, max_value=chart_max,
+                    value=(chart_min, chart_max), format="YYYY-MM-DD", key="chart_window",
+                    help="Restringi l'intervallo per vedere la serie a piena risoluzione."
+                )
+                if tuple(sel_window) != (chart_min, chart_max):
+                    chart_window = tuple(sel_window)
 
-            # Confidence Interval (Only valid for Daily usually, summing upper/lower is mathematically approx but acceptable for viz)
-            # We skip CI for aggressive aggregation to avoid confusion or just sum it? 
-            # Summing variance is complex. Let's hide CI for Monthly/Weekly for simplicity or just keep it daily.
-            # User requested aggregation.
-            
-            # Events Markers
-            if st.session_state.events:
-                # Group events by date
-                events_by_date = {}
-                for evt in st.session_state.events:
-                    d = evt['date'].strftime("%Y-%m-%d")
-                    if d not in events_by_date:
-                        events_by_date[d] = []
-                    events_by_date[d].append(evt)
-
-                # Arrays for the "Tokens" trace
-                evt_x = []
-                evt_y = [] # We place markers at the top or on the forecast line?
-                evt_text = []
-
-                # Iterate uniquely
-                for date_str, evts in events_by_date.items():
-                    count = len(evts)
-                    names = [e['name'] for e in evts]
-                    
-                    # Label text
-                    label_text = names[0] if count == 1 else f"{count} eventi"
-                    
-                    # Hover text (HTML allowed in plotly)
-                    hover_content = f"<b>{date_str}</b><br>" + "<br>".join([f"• {n}" for n in names])
-                    
-                    # Add VLine
-                    # Helper to parse TS
-                    ts = pd.Timestamp(date_str).timestamp() * 1000
-                    
-                    fig.add_vline(
-                        x=ts, 
-                        line_width=1, 
-                        line_dash="dot", 
-                        line_color="red",
-                        annotation_text=label_text,
-                        annotation_textangle=-90,
-                        annotation_position="top left",
-                        opacity=0.5
-                    )
-                    
-                    # Add Point for Hover
-                    # Finding Y height for the marker?
-                    # If date is in history, use history Y. If future, use forecast Y.
-                    # For simplicity, we can let it be somewhat arbitrary or max of entire chart.
-                    # Better: Use the max y of the chart to place markers at top?
-                    # Or just rely on "x unified" hover.
-                    
-                    # If we just add a scatter trace with correct x, the hover will pick it up.
-                    # Set y to 0 (or some valid value) but make marker invisible.
-                    # Actually if y is 0 it might distort auto-range if data is 5000+.
-                    # Let's try to match y-value from data.
-                    
-                    check_date = pd.to_datetime(date_str)
-                    current_y = 0
-                    
-                    # Look in history
-                    hist_row = history_df[history_df['date'] == check_date]
-                    if not hist_row.empty:
-                        current_y = hist_row['clicks'].values[0]
-                    else:
-                        # Look in forecast
-                        fut_row = forecast[forecast['ds'] == check_date]
-                        if not fut_row.empty:
-                            current_y = fut_row['yhat'].values[0]
-                    
-                    evt_x.append(date_str)
-                    evt_y.append(current_y)
-                    evt_text.append(hover_content)
-
-                # Add the invisible "Events" trace for Hover
-                fig.add_trace(go.Scatter(
-                    x=evt_x,
-                    y=evt_y,
-                    mode='markers',
-                    name='Eventi',
-                    marker=dict(size=10, color='red', symbol='diamond'),
-                    text=evt_text,
-                    hovertemplate="%{text}<extra></extra>"
-                ))
-            
-            # ... (rest of layout)
-            
-            fig.update_layout(
-                template="simple_white",
-                hovermode="x unified",
-                height=500
+            fig = build_forecast_figure(
+                forecast_id, history_digest, agg_mode, content_digest(st.session_state.events),
+                forecast, history_df, st.session_state.events,
+                max_points=chart_max_points, window=chart_window
             )
             
             st.plotly_chart(fig, use_container_width=True)
 
+            # --- Bande di rischio eventi futuri (Monte Carlo) ---
+            bands = st.session_state.get('last_impact_bands')
+            if bands is not None:
+                with st.expander("🎲 Bande di Rischio Eventi Futuri (Monte Carlo)", expanded=True):
+                    st.caption(f"{bands['n_samples']:,} simulazioni: incertezza degli impatti degli eventi futuri + intervallo del modello. "
+                               f"Calcolo in {bands['timing']['simulate_s'] + bands['timing']['quantile_s']:.2f}s.")
+                    band_df = bands['daily']
+                    fig_bands = go.Figure([
+                        go.Scatter(x=band_df['ds'], y=band_df['p90'], mode='lines', line=dict(width=0), name='P90', showlegend=False),
+                        go.Scatter(x=band_df['ds'], y=band_df['p10'], mode='lines', line=dict(width=0), fill='tonexty',
+                                   fillcolor='rgba(76, 175, 80, 0.2)', name='P10-P90'),
+                        go.Scatter(x=band_df['ds'], y=band_df['p50'], mode='lines', line=dict(color='#4CAF50', width=2), name='P50')
+                    ])
+                    fig_bands.update_layout(template="simple_white", hovermode="x unified", height=350, yaxis_title="Click Stimati")
+                    st.plotly_chart(fig_bands, use_container_width=True)
+
+                    st.dataframe(
+                        bands['monthly'].rename(columns={'month': 'Mese', 'p10': 'P10 (pessimistico)', 'p50': 'P50 (mediano)', 'p90': 'P90 (ottimistico)'})
+                        .style.format('{:,.0f}', subset=['P10 (pessimistico)', 'P50 (mediano)', 'P90 (ottimistico)']),
+                        use_container_width=True
+                    )
+
+            # --- Sensitivity sweep (future events, no refit) ---
+            with st.expander("🎛️ Analisi di Sensibilità Eventi Futuri (Impatto × Durata)", expanded=False):
+                render_sensitivity_sweep(history_df['date'].max())
+
+            # --- Prospecting packages (batch, no refit) ---
+            with st.expander("💼 Confronto Pacchetti Prospecting", expanded=False):
+                render_package_ranking(history_df['date'].max())
+
+            # --- Goal seek (required impact / timing for a click target) ---
+            with st.expander("🎯 Obiettivo di Traffico (Goal Seek)", expanded=False):
+                render_goal_seek(history_df)
+
             # --- Analisi YoY Futura ---
             st.markdown("### 📅 Variazione YoY (Forecast vs Anno Precedente)")
             
-            # Prepare data
-            future_daily = forecast[forecast['ds'] > history_df['date'].max()].copy()
+            yoy_tables = build_yoy_tables(forecast_id, history_digest, forecast, history_df)
             
-            if not future_daily.empty:
-                # 1. Monthly Analysis
-                future_daily['Month'] = future_daily['ds'].dt.to_period('M')
-                
-                # Group by Month
-                f_cancel = future_daily.groupby('Month')['yhat'].sum().reset_index().rename(columns={'yhat': 'Forecast'})
-                f_cancel['Days'] = future_daily.groupby('Month')['ds'].count().values
-                
-                # History Monthly
-                h_daily = history_df.copy()
-                d_col = 'date' if 'date' in h_daily.columns else 'ds'
-                clicks_col = 'clicks' if 'clicks' in h_daily.columns else 'y'
-                # Ensure datetime
-                if not pd.api.types.is_datetime64_any_dtype(h_daily[d_col]):
-                    h_daily[d_col] = pd.to_datetime(h_daily[d_col])
-
-                h_daily['Month'] = h_daily[d_col].dt.to_period('M')
-                h_monthly = h_daily.groupby('Month')[clicks_col].sum().reset_index().rename(columns={clicks_col: 'History'})
-                
-                # Merge logic: Forecast Month M vs History Month M-12
-                yoy_rows = []
-                
-                for idx, row in f_cancel.iterrows():
-                    m = row['Month']
-                    prev_m = m - 12
-                    
-                    # Check completeness
-                    days_in_m = m.days_in_month
-                    is_partial = row['Days'] < days_in_m
-                    # Also check if historical data was partial? (Assume history is complete usually)
-                    note = "⚠️ Parziale" if is_partial else ""
-                    
-                    hist_val = 0
-                    yoy_abs = 0
-                    yoy_pct = 0
-                    
-                    match = h_monthly[h_monthly['Month'] == prev_m]
-                    if not match.empty:
-                        hist_val = match.iloc[0]['History']
-                        yoy_abs = row['Forecast'] - hist_val
-                        yoy_pct = (yoy_abs / hist_val) if hist_val > 0 else 0
-                    
-                    yoy_rows.append({
-                        "Mese": str(m),
-                        "Forecast": row['Forecast'],
-                        "Anno Prec": hist_val if hist_val > 0 else None,
-                        "Δ Assoluto": yoy_abs,
-                        "Δ %": yoy_pct,
-                        "Note": note
-                    })
-                    
-                st.markdown("#### Variazione Mensile")
-                st.dataframe(pd.DataFrame(yoy_rows).style.format({
-                    "Forecast": "{:,.0f}",
-                    "Anno Prec": "{:,.0f}",
-                    "Δ Assoluto": "{:+,.0f}",
-                    "Δ %": "{:+.1%}"
-                }).applymap(lambda v: f'color: {"#28a745" if v > 0 else "#dc3545" if v < 0 else "inherit"}', subset=['Δ Assoluto', 'Δ %']), use_container_width=True)
-
-
-                # 2. Quarterly Analysis
-                future_daily['Quarter'] = future_daily['ds'].dt.to_period('Q')
-                f_q = future_daily.groupby('Quarter')['yhat'].sum().reset_index().rename(columns={'yhat': 'Forecast'})
-                
-                max_date = future_daily['ds'].max()
-                
-                q_rows = []
-                h_daily['Quarter'] = h_daily[d_col].dt.to_period('Q')
-                h_q = h_daily.groupby('Quarter')[clicks_col].sum().reset_index().rename(columns={clicks_col: 'History'})
-                
-                for idx, row in f_q.iterrows():
-                    q = row['Quarter']
-                    prev_q = q - 4
-                    
-                    # Check partial
-                    # If q.end_time > max_date, then it's partial
-                    is_partial = q.end_time.date() > max_date.date()
-                    note = "⚠️ Parziale" if is_partial else ""
-
-                    hist_val = 0
-                    yoy_abs = 0
-                    yoy_pct = 0
-                    
-                    match = h_q[h_q['Quarter'] == prev_q]
-                    if not match.empty:
-                        hist_val = match.iloc[0]['History']
-                        yoy_abs = row['Forecast'] - hist_val
-                        yoy_pct = (yoy_abs / hist_val) if hist_val > 0 else 0
-                        
-                    q_rows.append({
-                        "Quarter": str(q),
-                        "Forecast": row['Forecast'],
-                        "Anno Prec": hist_val if hist_val > 0 else None,
-                        "Δ Assoluto": yoy_abs,
-                        "Δ %": yoy_pct,
-                        "Note": note
-                    })
-                
-                st.markdown("#### Variazione Trimestrale")
-                st.dataframe(pd.DataFrame(q_rows).style.format({
-                    "Forecast": "{:,.0f}",
-                    "Anno Prec": "{:,.0f}",
-                    "Δ Assoluto": "{:+,.0f}",
-                    "Δ %": "{:+.1%}"
-                }).applymap(lambda v: f'color: {"#28a745" if v > 0 else "#dc3545" if v < 0 else "inherit"}', subset=['Δ Assoluto', 'Δ %']), use_container_width=True)
+            if yoy_tables is not None:
+                yoy_views = [
+                    ("Variazione Mensile", 'monthly', "Mese"),
+                    ("Variazione Trimestrale", 'quarterly', "Quarter"),
+                    ("Variazione Annuale", 'yearly', "Anno")
+                ]
+                for title, key, period_label in yoy_views:
+                    st.markdown(f"#### {title}")
+                    yoy_df = yoy_tables[key].rename(columns={'Periodo': period_label})
+                    st.dataframe(yoy_df[[period_label, "Forecast", "Anno Prec", "Δ Assoluto", "Δ %", "Note"]].style.format({
+                        "Forecast": "{:,.0f}",
+                        "Anno Prec": "{:,.0f}",
+                        "Δ Assoluto": "{:+,.0f}",
+                        "Δ %": "{:+.1%}"
+                    }, na_rep="-").map(lambda v: f'color: {"#28a745" if v > 0 else "#dc3545" if v < 0 else "inherit"}', subset=['Δ Assoluto', 'Δ %']), use_container_width=True)
 
-                
             else:
                 st.info("Nessun dato forecast futuro disponibile per analisi YoY.")
             
@@ -1351,6 +1926,9 @@ if gsc_file:
                     st.caption("Contributo totale assoluto al valore finale predetto.")
                     if 'regressor_diagnostics' in debug and debug['regressor_diagnostics']:
                         st.dataframe(pd.DataFrame(debug['regressor_diagnostics']))
+                    if debug.get('event_attribution'):
+                        st.caption("Regressori raggruppati: contributo del gruppo ripartito pro-quota sui singoli eventi.")
+                        st.dataframe(pd.DataFrame(debug['event_attribution']))
 
                     st.markdown("### 4. Eventi Futuri (Override Manuale)")
                     st.caption("I seguenti eventi sono stati applicati **dopo** il forecast come moltiplicatori diretti (es. -0.5 = -50%), perché non esistono nel passato.")
@@ -1359,6 +1937,26 @@ if gsc_file:
                     else:
                          st.write("Nessun override manuale applicato.")
 
+                    st.markdown("### 5. Cache Modello")
+                    if 'cache' in debug:
+                        c_info = debug['cache']
+                        esito = "✅ HIT (modello riutilizzato)" if c_info.get('hit') else "🔄 MISS (nuovo fit)"
+                        st.caption(f"{esito} · Chiave `{c_info.get('key')}`")
+                        st.write({k: v for k, v in c_info.items() if k not in ('key', 'hit')})
+                    if 'timing' in debug:
+                        st.caption("Tempi di esecuzione (secondi) per fase: fit, previsione puntuale, override eventi futuri, intervalli (progressivi).")
+                        st.write(debug['timing'])
+                    if debug.get('warm_start'):
+                        w = debug['warm_start']
+                        w_labels = {"warm": "🔥 Warm start", "cold": "❄️ Fit da zero", "cached": "✅ Da cache",
+                                    "incompatible": "⚠️ Struttura cambiata (fit da zero)", "fallback": "⚠️ Warm start fallito (fit da zero)"}
+                        w_line = f"{w_labels.get(w.get('status'), w.get('status'))} · iterazioni: {w.get('iterations', '-')} · fit: {w.get('fit_s', 0):.2f}s"
+                        if 'fit_s_saved' in w:
+                            w_line += f" · risparmio vs ultimo fit da zero: {w['fit_s_saved']:+.2f}s"
+                            if 'iterations_saved' in w:
+                                w_line += f", {w['iterations_saved']:+d} iterazioni"
+                        st.caption(w_line)
+
             # Export
             st.subheader("📥 Export Dati")
             csv = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].to_csv(index=False).encode('utf-8')
@@ -1367,6 +1965,8 @@ if gsc_file:
                 data=csv,
                 file_name='seo_forecast.csv',
                 mime='text/csv',
+                disabled=intervals_pending(),
+                help=INTERVALS_PENDING_HELP if intervals_pending() else None
             )
 
         except Exception as e:
@@ -1380,90 +1980,10 @@ if gsc_file:
         curr_p = st.session_state.get('current_project')
         if not curr_p:
             st.info("👈 Seleziona un progetto dalla sidebar per accedere al confronto scenari.")
+        elif getattr(tab_compare, 'open', None) is False:
+            pass # Hidden tab: skip catalog and series loading until it is opened
         else:
-            scenarios = tools.project_manager.load_scenarios(curr_p)
-            if len(scenarios) < 2:
-                st.warning(f"⚠️ Hai salvato solo {len(scenarios)} scenario/i. Salvane almeno 2 per attivare il confronto.")
-                if len(scenarios) == 1:
-                     st.write(f"Scenario attuale: **{scenarios[0]['name']}** ({scenarios[0]['created_at']})")
-            else:
-                # 1. Summary Table
-                st.markdown("### 📋 Riepilogo Scenari")
-                comp_data = []
-                for s in scenarios:
-                    comp_data.append({
-                        "Scenario": s['name'],
-                        "Data Creazione": s['created_at'],
-                        "Click Totali (Forecast)": s['total_clicks'],
-                        "Eventi Attivi": s['events_count']
-                    })
-                
-                df_comp_table = pd.DataFrame(comp_data)
-                st.dataframe(
-                    df_comp_table.style.format({'Click Totali (Forecast)': '{:,.0f}'}),
-                    use_container_width=True
-                )
-                
-                # 2. Comparative Chart
-                st.divider()
-                st.markdown("### 📈 Trend a Confronto")
-                
-                fig_comp = go.Figure()
-                palette = ['#2E7D32', '#1565C0', '#D84315', '#6A1B9A', '#00838F', '#AD1457']
-                
-                loaded_count = 0
-                for i, s in enumerate(scenarios):
-                    df_s = tools.project_manager.load_scenario_df(curr_p, s['file'])
-                    if df_s is not None and not df_s.empty:
-                         # Filter Future Only for clarity
-                         future_s = df_s[df_s['ds'] > pd.Timestamp.now()]
-                         if not future_s.empty:
-                             fig_comp.add_trace(go.Scatter(
-                                 x=future_s['ds'],
-                                 y=future_s['yhat'],
-                                 mode='lines',
-                                 name=s['name'],
-                                 line=dict(width=2, color=palette[i % len(palette)])
-                             ))
-                             loaded_count += 1
-                
-                if loaded_count > 0:
-                    fig_comp.update_layout(
-                        title="Confronto Curve di Traffico (Forecast)",
-                        hovermode="x unified",
-                        template="plotly_white",
-                        yaxis_title="Click Stimati",
-                        legend=dict(orientation="h", y=1.1)
-                    )
-                    st.plotly_chart(fig_comp, use_container_width=True)
-                else:
-                    st.warning("Impossibile caricare i dati dei grafici per gli scenari selezionati.")
-                
-                # 3. Delta Analysis
-                st.divider()
-                st.markdown("### ⚖️ Analisi Differenziale (A vs B)")
-                
-                c_sel1, c_sel2 = st.columns(2)
-                with c_sel1:
-                    s_a_name = st.selectbox("Scenario Base (A)", [s['name'] for s in scenarios], index=len(scenarios)-1, key="scen_a")
-                with c_sel2:
-                    s_b_name = st.selectbox("Scenario Target (B)", [s['name'] for s in scenarios], index=0, key="scen_b")
-                    
-                if s_a_name and s_b_name:
-                    s_a = next(s for s in scenarios if s['name'] == s_a_name)
-                    s_b = next(s for s in scenarios if s['name'] == s_b_name)
-                    
-                    # Calculate Metrics
-                    delta_clicks = s_b['total_clicks'] - s_a['total_clicks']
-                    delta_pct = (delta_clicks / s_a['total_clicks']) if s_a['total_clicks'] > 0 else 0
-                    
-                    c_res1, c_res2, c_res3 = st.columns(3)
-                    c_res1.metric("Differenza Totale Click", f"{int(delta_clicks):+,.0f}", delta=f"{delta_pct:+.1%}")
-                    
-                    # More deep analysis if feasible (needs loading both DFs)
-                    # For now, simplistic total is enough for executive view.
-                    
-                    st.info(f"Confrontando **{s_b_name}** rispetto a **{s_a_name}**: lo scenario Target porta {int(delta_clicks):+,.0f} click in totale.")
+            render_scenario_comparison(curr_p, chart_max_points)
 
 
 
@@ -1516,7 +2036,8 @@ Tono: Professionale, Diretto, Persuasivo."""
                         st.divider()
                         
                         # Trigger Button
-                        if st.button("✨ Genera Report Prospect", type="primary", key="btn_gen_rep"):
+                        if st.button("✨ Genera Report Prospect", type="primary", key="btn_gen_rep", disabled=intervals_pending(),
+                                     help=INTERVALS_PENDING_HELP if intervals_pending() else None):
                             st.session_state._report_gen_trigger = True
                         
                         if st.session_state.get('_report_gen_trigger'):
@@ -1541,11 +2062,19 @@ Tono: Professionale, Diretto, Persuasivo."""
                                     
                                     api_key_use = st.session_state.get('openai_api_key', os.getenv("OPENAI_API_KEY"))
                                     
+                                    curr_yoy = None
+                                    if curr_forecast is not None:
+                                        curr_yoy = build_yoy_tables(
+                                            current_forecast_id(curr_forecast),
+                                            history_digest, curr_forecast, history_df
+                                        )
+                                    
                                     rep_txt, err = generate_marketing_report(
                                         metrics=curr_metrics,
                                         events=curr_events,
                                         horizon=curr_horizon,
                                         forecast_df=curr_forecast,
+                                        yoy_tables=curr_yoy,
                                         api_key=api_key_use,
                                         model=sel_rep_model,
                                         system_instruction=txt_sys_rep
@@ -1743,14 +2272,23 @@ with tab_chat:
                     st.info(prompt, icon="👤")
                     if files: st.caption(f"📎 {len(files)} file allegati.")
 
-            # Prepare Context
+            # Prepare Context (YoY tables shared with the dashboard cache)
+            chat_forecast = st.session_state.last_forecast
+            chat_yoy = None
+            if chat_forecast is not None:
+                chat_yoy = build_yoy_tables(
+                    current_forecast_id(chat_forecast),
+                    history_digest, chat_forecast, history_df
+                )
             context_data = prepare_context_data(
                 history_df, 
                 st.session_state.events, 
                 st.session_state.last_forecast, 
                 st.session_state.last_metrics,
                 config,
-                None # st.session_state.baseline_forecast (Legacy)
+                None, # st.session_state.baseline_forecast (Legacy)
+                backtest=st.session_state.get('last_backtest'),
+                yoy_tables=chat_yoy
             )
             
             # Call AI
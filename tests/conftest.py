@@ -0,0 +1,26 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools import forecast_cache
+
+logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+
+
+@pytest.fixture(autouse=True)
+def isolated_fit_cache(tmp_path, monkeypatch):
+    """Each test gets an empty fit cache (disk and memory tier)."""
+    monkeypatch.setattr(forecast_cache, "CACHE_DIR", str(tmp_path / "forecast_cache"))
+    monkeypatch.setattr(forecast_cache, "_memory", type(forecast_cache._memory)())
+
+
+@pytest.fixture
+def history_df():
+    """Synthetic GSC history: trend + weekly seasonality + noise."""
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2024-01-01", periods=300, freq="D")
+    t = np.arange(len(dates))
+    clicks = 1000 + 0.5 * t + 120 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 40, len(dates))
+    return pd.DataFrame({'date': dates, 'clicks': clicks.round()})
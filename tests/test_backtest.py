@@ -0,0 +1,78 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools import backtest
+from tools.backtest import make_cutoffs, run_backtest
+
+
+def test_coverage_uses_real_intervals_with_progressive_config(history_df):
+    # The app default config is progressive: folds must still score real intervals
+    config = {"progressive": True, "uncertainty_samples": 200}
+    res = run_backtest(history_df, [], config, horizon=14, period=30, max_workers=1)
+
+    rows = res['rows']
+    assert not rows[['yhat_lower', 'yhat_upper']].isna().any().any()
+    coverage = res['summary']['coverage']
+    assert not np.isnan(coverage)
+    assert coverage > 0
+
+
+@pytest.fixture(autouse=True)
+def empty_fold_memo(monkeypatch):
+    monkeypatch.setattr(backtest, "_fold_memo", OrderedDict())
+
+
+def test_cutoffs_are_anchored_at_history_start(history_df):
+    before = make_cutoffs(history_df, horizon=14, period=30)
+    longer = pd.concat([history_df, pd.DataFrame({
+        'date': pd.date_range(history_df['date'].max() + pd.Timedelta(days=1), periods=40),
+        'clicks': 1100.0})], ignore_index=True)
+    after = make_cutoffs(longer, horizon=14, period=30)
+
+    assert after[:len(before)] == before
+    assert len(after) > len(before)
+
+
+def test_new_history_only_fits_new_folds(history_df):
+    config = {"uncertainty_samples": 100}
+    first = run_backtest(history_df, [], config, horizon=14, period=60, max_workers=1)
+
+    longer = pd.concat([history_df, pd.DataFrame({
+        'date': pd.date_range(history_df['date'].max() + pd.Timedelta(days=1), periods=75),
+        'clicks': 1100.0})], ignore_index=True)
+    second = run_backtest(longer, [], config, horizon=14, period=60, max_workers=1)
+
+    assert second['timing']['folds_memo'] == first['summary']['folds']
+    assert second['timing']['folds_run'] == second['summary']['folds'] - first['summary']['folds'] > 0
+
+
+def test_revised_actuals_rescore_the_fold(history_df):
+    config = {"uncertainty_samples": 100}
+    first = run_backtest(history_df, [], config, horizon=14, period=60, max_workers=1)
+    cutoff = first['cutoffs'][-1]  # the revised day is only in this fold's scored window
+
+    revised = history_df.copy()
+    revised_day = revised['date'] == cutoff + pd.Timedelta(days=3)
+    revised.loc[revised_day, 'clicks'] += 500
+    second = run_backtest(revised, [], config, horizon=14, period=60, max_workers=1)
+
+    assert second['timing']['folds_run'] == 1
+    row = second['rows'][(second['rows']['cutoff'] == cutoff) & (second['rows']['horizon_day'] == 3)]
+    assert float(row['y'].iloc[0]) == float(revised.loc[revised_day, 'clicks'].iloc[0])
+
+
+def test_fold_memo_is_lru_capped(history_df, monkeypatch):
+    monkeypatch.setattr(backtest, "FOLD_MEMO_MAX_ENTRIES", 2)
+    config = {"uncertainty_samples": 0}
+    first = run_backtest(history_df, [], config, horizon=14, period=60, max_workers=1)
+    assert first['summary']['folds'] > 2
+    assert len(backtest._fold_memo) == 2
+
+    again = run_backtest(history_df, [], config, horizon=14, period=60, max_workers=1)
+    # Only the most recently used folds survived; the others come back from the fit cache
+    assert again['timing']['folds_memo'] == 2
+    assert again['timing']['fit_cache_hits'] == again['timing']['folds_run']
+    pd.testing.assert_frame_equal(again['rows'], first['rows'])
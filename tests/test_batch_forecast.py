@@ -0,0 +1,20 @@
+import os
+
+from tools import batch_forecast
+
+
+def _crashing_job(job):
+    os._exit(1)  # Simulates a worker killed mid-job (OOM, segfault)
+
+
+def test_crashed_worker_is_reported_against_its_job(monkeypatch):
+    monkeypatch.setattr(batch_forecast, "run_job", _crashing_job)
+    jobs = [{"job_id": "a", "project": "Cliente A", "config": {}},
+            {"job_id": "b", "project": "Cliente B", "config": {}}]
+
+    report = batch_forecast.run_batch(jobs, max_workers=1, save=False)
+
+    assert sorted(report['job_id']) == ["a", "b"]
+    assert set(report['project']) == {"Cliente A", "Cliente B"}
+    assert (report['status'] == 'error').all()
+    assert report['message'].str.len().gt(0).all()
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.chart_utils import downsample_frame, lttb_indices, minmax_indices
+
+
+def _series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    x = pd.date_range("2023-01-01", periods=n, freq="D").to_numpy()
+    y = 1000 + 200 * np.sin(np.arange(n) / 30) + rng.normal(0, 50, n)
+    return x, y
+
+
+@pytest.mark.parametrize("n, n_out", [(1000, 100), (1000, 3), (101, 100), (10, 9), (5000, 2400), (997, 37)])
+def test_lttb_keeps_endpoints_and_exact_length(n, n_out):
+    x, y = _series(n)
+    idx = lttb_indices(x, y, n_out)
+
+    assert len(idx) == n_out
+    assert idx[0] == 0 and idx[-1] == n - 1
+    assert np.all(np.diff(idx) > 0)  # Sorted, no duplicates
+
+
+def test_lttb_keeps_isolated_spike_and_dip():
+    x, y = _series(2000)
+    y[700], y[1500] = 10_000, -10_000
+    idx = lttb_indices(x, y, 120)
+
+    assert 700 in idx and 1500 in idx
+
+
+@pytest.mark.parametrize("n, n_out", [(1000, 100), (1000, 4), (101, 100), (10, 9), (5000, 2400), (997, 37)])
+def test_minmax_keeps_endpoints_extremes_and_budget(n, n_out):
+    _, y = _series(n, seed=n)
+    idx = minmax_indices(y, n_out)
+
+    assert len(idx) <= n_out
+    assert idx[0] == 0 and idx[-1] == n - 1
+    assert np.all(np.diff(idx) > 0)
+    assert np.argmax(y) in idx and np.argmin(y) in idx
+
+
+def test_small_budgets_and_short_series_return_everything():
+    x, y = _series(50)
+    assert np.array_equal(lttb_indices(x, y, None), np.arange(50))
+    assert np.array_equal(lttb_indices(x, y, 2), np.arange(50))
+    assert np.array_equal(lttb_indices(x, y, 50), np.arange(50))
+    assert np.array_equal(minmax_indices(y, 3), np.arange(50))
+    assert np.array_equal(minmax_indices(y, 80), np.arange(50))
+
+
+def test_downsample_frame_under_budget_is_unchanged():
+    x, y = _series(300)
+    df = pd.DataFrame({'ds': x, 'yhat': y, 'yhat_lower': y - 10})
+
+    assert downsample_frame(df, 'ds', 'yhat', 300) is df
+    assert downsample_frame(df, 'ds', 'yhat', None) is df
+
+    for method in ("lttb", "minmax"):
+        small = downsample_frame(df, 'ds', 'yhat', 60, method=method)
+        assert len(small) <= 60
+        # Other columns follow the selected rows
+        pd.testing.assert_frame_equal(small, df.loc[small.index])
@@ -0,0 +1,140 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools import forecast_cache
+
+
+class _LockCheckingDict(OrderedDict):
+    """Memory tier that fails if it is touched without holding forecast_cache._memory_lock."""
+
+    def _check(self):
+        assert forecast_cache._memory_lock.locked(), "memory tier accessed without the lock"
+
+    def __setitem__(self, key, value):
+        self._check()
+        super().__setitem__(key, value)
+
+    def get(self, key, default=None):
+        self._check()
+        return super().get(key, default)
+
+    def move_to_end(self, key, last=True):
+        self._check()
+        super().move_to_end(key, last)
+
+    def popitem(self, last=True):
+        self._check()
+        return super().popitem(last)
+
+    def clear(self):
+        self._check()
+        super().clear()
+
+
+def test_memory_tier_access_holds_lock(monkeypatch):
+    # complete_intervals stores from a worker thread while the script thread loads
+    monkeypatch.setattr(forecast_cache, "_memory", _LockCheckingDict())
+    monkeypatch.setattr(forecast_cache, "MEMORY_MAX_ENTRIES", 2)
+    frame = pd.DataFrame({'ds': pd.date_range("2025-01-01", periods=3), 'yhat': 1.0})
+
+    for key in ["a", "b", "c"]:
+        forecast_cache._remember(key, None, frame)
+    assert list(forecast_cache._memory) == ["b", "c"]
+
+    hit = forecast_cache.load_fit("b")
+    assert hit['source'] == 'memory'
+    assert list(forecast_cache._memory) == ["c", "b"]
+    assert forecast_cache.load_fit("a") is None
+
+    forecast_cache.clear_cache()
+    assert len(forecast_cache._memory) == 0
+
+
+class _LockCheckingStats(dict):
+    """Counters that fail if they are updated without holding forecast_cache._memory_lock."""
+
+    def __setitem__(self, key, value):
+        assert forecast_cache._memory_lock.locked(), "cache stats updated without the lock"
+        super().__setitem__(key, value)
+
+
+def test_stats_updates_hold_lock(monkeypatch):
+    monkeypatch.setattr(forecast_cache, "_stats", _LockCheckingStats(hits=0, memory_hits=0, misses=0, evictions=0))
+    frame = pd.DataFrame({'ds': pd.date_range("2025-01-01", periods=3), 'yhat': 1.0})
+
+    forecast_cache._remember("a", None, frame)
+    forecast_cache.load_fit("a")        # memory hit
+    forecast_cache.load_fit("missing")  # miss
+    os.makedirs(forecast_cache.CACHE_DIR, exist_ok=True)
+    with open(os.path.join(forecast_cache.CACHE_DIR, "old.pkl"), 'wb') as f:
+        f.write(b"x" * 10)
+    forecast_cache._evict(0)            # eviction
+
+    stats = forecast_cache.get_cache_stats()
+    assert (stats['hits'], stats['memory_hits'], stats['misses'], stats['evictions']) == (1, 1, 1, 1)
+
+
+# --- make_cache_key ---
+
+PROPHET_KWARGS = {
+    "seasonality_mode": "multiplicative",
+    "yearly_seasonality": "auto",
+    "weekly_seasonality": True,
+    "daily_seasonality": False,
+    "changepoint_prior_scale": 0.05,
+    "seasonality_prior_scale": 10.0,
+    "changepoint_range": 0.8,
+}
+CHANGED_KWARGS = {
+    "seasonality_mode": "additive",
+    "yearly_seasonality": True,
+    "weekly_seasonality": False,
+    "daily_seasonality": True,
+    "changepoint_prior_scale": 0.5,
+    "seasonality_prior_scale": 1.0,
+    "changepoint_range": 0.9,
+}
+FIT_EVENT = {'name': 'Migrazione', 'date': pd.Timestamp("2025-02-01"), 'type': 'window',
+             'duration': 14, 'impact': -0.2}
+CHANGED_EVENT_FIELDS = {'name': 'Altro', 'date': pd.Timestamp("2025-02-02"), 'type': 'step',
+                        'duration': 15, 'impact': -0.25}
+
+
+@pytest.fixture
+def prophet_history():
+    ds = pd.date_range("2025-01-01", periods=120, freq="D")
+    return pd.DataFrame({'ds': ds, 'y': 1000 + 10 * np.sin(np.arange(120))})
+
+
+def _key(history, events=(FIT_EVENT,), kwargs=PROPHET_KWARGS, horizon=90):
+    return forecast_cache.make_cache_key(history, list(events), dict(kwargs), horizon)
+
+
+def test_cache_key_ignores_row_order(prophet_history):
+    shuffled = prophet_history.sample(frac=1.0, random_state=0)
+    assert _key(shuffled) == _key(prophet_history)
+
+
+@pytest.mark.parametrize("name", list(CHANGED_KWARGS))
+def test_cache_key_changes_with_every_prophet_kwarg(prophet_history, name):
+    assert _key(prophet_history, kwargs=dict(PROPHET_KWARGS, **{name: CHANGED_KWARGS[name]})) != _key(prophet_history)
+
+
+@pytest.mark.parametrize("field", list(CHANGED_EVENT_FIELDS))
+def test_cache_key_changes_with_every_fit_event_field(prophet_history, field):
+    changed = dict(FIT_EVENT, **{field: CHANGED_EVENT_FIELDS[field]})
+    assert _key(prophet_history, events=[changed]) != _key(prophet_history)
+
+
+def test_cache_key_changes_with_events_data_and_horizon(prophet_history):
+    base = _key(prophet_history)
+    assert _key(prophet_history, events=[]) != base
+    assert _key(prophet_history, events=[FIT_EVENT, dict(FIT_EVENT, name='Secondo')]) != base
+    assert _key(prophet_history, horizon=30) != base
+    revised = prophet_history.copy()
+    revised.loc[100, 'y'] += 1
+    assert _key(revised) != base
@@ -0,0 +1,58 @@
+import io
+
+import pandas as pd
+
+from tools import ingest_data
+
+
+def _gsc_export(days=70):
+    # Bulk-export layout: several query rows per date
+    dates = pd.date_range("2025-01-01", periods=days).strftime("%Y-%m-%d")
+    rows = [{"date": d, "query": q, "clicks": i + len(q), "impressions": 10 * (i + len(q))}
+            for i, d in enumerate(dates) for q in ("seo", "forecast", "prophet")]
+    return pd.DataFrame(rows).to_csv(index=False).encode()
+
+
+def test_streaming_and_plain_readers_agree():
+    raw = _gsc_export()
+
+    plain = ingest_data.load_gsc_csv(io.BytesIO(raw))
+    streamed = ingest_data.stream_gsc_csv(io.BytesIO(raw), chunksize=50)
+
+    assert plain['status'] == streamed['status'] == 'success'
+    assert list(plain['data'].columns) == ['date', 'clicks', 'impressions']
+    pd.testing.assert_frame_equal(plain['data'].reset_index(drop=True),
+                                  streamed['data'].reset_index(drop=True))
+
+
+def _daily_export(days=70):
+    # Dashboard layout: one row per day with the derived metrics
+    clicks = pd.Series(range(100, 100 + days))
+    return pd.DataFrame({
+        "date": pd.date_range("2025-01-01", periods=days).strftime("%Y-%m-%d"),
+        "clicks": clicks,
+        "impressions": clicks * 20,
+        "ctr": 0.05,
+        "position": 7.5,
+    }).to_csv(index=False).encode()
+
+
+def test_columns_do_not_depend_on_file_size(monkeypatch):
+    raw = _daily_export()
+    plain = ingest_data.load_gsc_csv(io.BytesIO(raw))
+    monkeypatch.setattr(ingest_data, "STREAM_THRESHOLD_BYTES", 0)
+    streamed = ingest_data.load_gsc_csv(io.BytesIO(raw))
+
+    assert list(plain['data'].columns) == ['date', 'clicks', 'impressions']
+    pd.testing.assert_frame_equal(plain['data'].reset_index(drop=True),
+                                  streamed['data'].reset_index(drop=True))
+
+
+def test_missing_clicks_is_reported_by_both_readers(monkeypatch):
+    raw = pd.DataFrame({"date": ["2025-01-01"], "impressions": [10]}).to_csv(index=False).encode()
+    plain = ingest_data.load_gsc_csv(io.BytesIO(raw))
+    monkeypatch.setattr(ingest_data, "STREAM_THRESHOLD_BYTES", 0)
+    streamed = ingest_data.load_gsc_csv(io.BytesIO(raw))
+
+    assert plain['status'] == streamed['status'] == 'error'
+    assert plain['message'] == streamed['message']
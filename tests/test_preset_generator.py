@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools import preset_generator
+from tools.run_forecast import apply_future_overrides
+
+
+def _events(form):
+    day = pd.Timestamp("2026-03-01")
+    return [{'name': f"Evento {i}", 'date': day, 'type': 'window', 'duration': 20, 'impact': impact}
+            for i, impact in enumerate(form['impacts'])]
+
+
+@pytest.mark.parametrize("impacts", [(0.2,), (-1.0,), (-1.5,), (-1.5, -2.0), (-1.5, 0.3), (-1.0, 0.5)])
+def test_package_totals_match_engine_for_any_impact(monkeypatch, impacts):
+    monkeypatch.setattr(preset_generator, "generate_prospecting_events", _events)
+    baseline = pd.DataFrame({'ds': pd.date_range("2026-01-01", "2026-06-30"), 'yhat': 1000.0})
+    variants = [({'impacts': str(impacts)}, {'impacts': impacts}), ({'impacts': "()"}, {'impacts': ()})]
+
+    result = preset_generator.evaluate_packages(baseline, variants)
+    totals = result['table'].set_index('Pacchetto')['Click']
+
+    expected = apply_future_overrides(baseline.copy(), _events({'impacts': impacts}))[0]['yhat'].sum()
+    assert totals.loc[f"impacts={impacts}"] == pytest.approx(expected)
+    assert np.isclose(result['reference'], 1000.0 * len(baseline))
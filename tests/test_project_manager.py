@@ -0,0 +1,185 @@
+import io
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools import ingest_data, project_manager, scenario_analysis
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.setattr(project_manager, "PROJECTS_DIR", str(tmp_path))
+    (tmp_path / "Cliente").mkdir()
+    return "Cliente"
+
+
+def _scenario_df(n_days=90, start="2026-01-01", level=1000.0):
+    ds = pd.date_range(start, periods=n_days, freq="D")
+    yhat = level + np.arange(n_days, dtype=float)
+    return pd.DataFrame({'ds': ds, 'yhat': yhat, 'yhat_lower': yhat * 0.9, 'yhat_upper': yhat * 1.1})
+
+
+def test_concurrent_legacy_migration_never_loses_the_scenario(project):
+    legacy = _scenario_df()
+    project_path = os.path.join(project_manager.PROJECTS_DIR, project)
+    n_threads, results = 4, []
+
+    for rep in range(40):
+        filename = f"legacy_{rep}.csv"
+        legacy.to_csv(os.path.join(project_path, filename), index=False)
+        barrier = threading.Barrier(n_threads)
+
+        def load():
+            barrier.wait()
+            results.append(project_manager.load_scenario_df(project, filename))
+
+        threads = [threading.Thread(target=load) for _ in range(n_threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert len(results) == 40 * n_threads
+    assert all(df is not None and np.allclose(df['yhat'], legacy['yhat']) for df in results)
+    leftovers = [f for f in os.listdir(project_path) if f.endswith('.csv') or '.tmp' in f]
+    assert leftovers == []
+
+
+def test_scenario_matrix_from_arrays_matches_dataframes(project):
+    frames = {'A': _scenario_df(), 'B': _scenario_df(n_days=30, start="2026-02-15", level=500.0)}
+    for label, df in frames.items():
+        project_manager._write_scenario_array(os.path.join(project_manager.PROJECTS_DIR, project, f"{label}.npy"), df)
+
+    arrays = {label: project_manager.load_scenario_array(project, f"{label}.npy") for label in frames}
+    assert all(isinstance(arr, np.memmap) for arr in arrays.values())
+
+    from_arrays = scenario_analysis.align_scenario_arrays(dict(arrays, C=None), future_only=False)
+    from_frames = scenario_analysis.align_scenarios(
+        {label: project_manager.load_scenario_df(project, f"{label}.npy") for label in frames}, future_only=False)
+    pd.testing.assert_frame_equal(from_arrays, from_frames.astype(np.float64), check_freq=False)
+
+
+# --- Scenario catalog (index.json -> SQLite) ---
+
+def _write_index(project, entries_or_text):
+    path = os.path.join(project_manager.PROJECTS_DIR, project, "index.json")
+    with open(path, 'w') as f:
+        f.write(entries_or_text if isinstance(entries_or_text, str) else json.dumps(entries_or_text))
+    return path
+
+
+def test_legacy_index_is_imported_once_and_renamed(project):
+    index_path = _write_index(project, [
+        {"id": "20250101_100000_Base", "name": "Base", "file": "20250101_100000_Base.csv",
+         "created_at": "20250101_100000", "total_clicks": 1234.5, "events_count": 2,
+         "events_summary": ["Migrazione", "Campagna"]},
+        {"id": "20250102_100000_Old", "file": "20250102_100000_Old.csv"},  # Pre-metadata entry
+        {"name": "Senza id", "file": "x.csv"},  # Unusable: skipped
+    ])
+
+    scenarios = {s['id']: s for s in project_manager.load_scenarios(project)}
+
+    assert set(scenarios) == {"20250101_100000_Base", "20250102_100000_Old"}
+    assert scenarios["20250101_100000_Base"]['events_summary'] == ["Migrazione", "Campagna"]
+    assert scenarios["20250101_100000_Base"]['total_clicks'] == 1234.5
+    assert scenarios["20250102_100000_Old"]['name'] == "20250102_100000_Old"
+    assert scenarios["20250102_100000_Old"]['events_count'] == 0
+    assert not os.path.exists(index_path) and os.path.exists(index_path + ".migrated")
+
+    # A later index.json (e.g. restored by hand) is not imported twice
+    _write_index(project, [{"id": "late", "file": "late.csv"}])
+    assert project_manager.count_scenarios(project) == 2
+
+
+def test_malformed_index_is_left_in_place(project):
+    index_path = _write_index(project, "[{not json")
+
+    assert project_manager.load_scenarios(project) == []
+    assert os.path.exists(index_path)
+
+
+def test_same_name_in_the_same_second_gets_a_suffix(project, monkeypatch):
+    monkeypatch.setattr(pd.Timestamp, "now", classmethod(lambda cls, tz=None: pd.Timestamp("2026-01-01 10:00:00")))
+    events = [{'name': 'Campagna'}]
+    for _ in range(3):
+        ok, _msg = project_manager.save_scenario(project, "Piano", _scenario_df(), events, {'forecast_total': 10.0})
+        assert ok
+
+    ids = sorted(s['id'] for s in project_manager.load_scenarios(project))
+    assert ids == ["20260101_100000_Piano", "20260101_100000_Piano_2", "20260101_100000_Piano_3"]
+    for s in project_manager.load_scenarios(project):
+        assert project_manager.load_scenario_df(project, s['file']) is not None
+
+
+def test_failed_write_leaves_no_catalog_entry(project, monkeypatch):
+    def failing_write(path, forecast_df):
+        raise OSError("disco pieno")
+    monkeypatch.setattr(project_manager, "_write_scenario_array", failing_write)
+
+    with pytest.raises(OSError):
+        project_manager.save_scenario(project, "Piano", _scenario_df(), [], {'forecast_total': 1.0})
+    assert project_manager.count_scenarios(project) == 0
+
+
+def test_delete_after_migration_removes_entry_and_files(project):
+    project_path = os.path.join(project_manager.PROJECTS_DIR, project)
+    _scenario_df().to_csv(os.path.join(project_path, "legacy.csv"), index=False)
+    _write_index(project, [{"id": "legacy", "name": "Legacy", "file": "legacy.csv"}])
+
+    assert project_manager.load_scenario_df(project, "legacy.csv") is not None  # Converts to legacy.npy
+    assert project_manager.delete_scenario(project, "legacy")
+
+    assert project_manager.load_scenarios(project) == []
+    assert not os.path.exists(os.path.join(project_path, "legacy.csv"))
+    assert not os.path.exists(os.path.join(project_path, "legacy.npy"))
+    assert not project_manager.delete_scenario(project, "legacy")
+
+
+# --- History store ---
+
+def _history(start, days, clicks=100):
+    dates = pd.date_range(start, periods=days, freq="D")
+    return pd.DataFrame({'date': dates, 'clicks': np.full(days, clicks, dtype=np.int64),
+                         'impressions': np.full(days, clicks * 20, dtype=np.int64)})
+
+
+def test_merged_history_keeps_upload_dtypes(project):
+    upload = ingest_data.load_gsc_csv(io.BytesIO(_history("2025-01-01", 90).to_csv(index=False).encode()))['data']
+
+    merged, _ = project_manager.merge_history(project, upload)
+    stored = project_manager.load_history(project)
+
+    assert stored['clicks'].dtype == np.int64 and stored['impressions'].dtype == np.int64
+    pd.testing.assert_frame_equal(stored, upload.reset_index(drop=True))
+    pd.testing.assert_frame_equal(merged, stored)
+    # A second merge does not drift the dtypes either
+    merged, _ = project_manager.merge_history(project, upload)
+    pd.testing.assert_frame_equal(project_manager.load_history(project), upload.reset_index(drop=True))
+
+
+def test_only_the_refresh_window_is_overwritten(project):
+    project_manager.merge_history(project, _history("2025-01-01", 100, clicks=100))
+    # Later export: revises the last 10 stored days and adds 5 new ones
+    merged, stats = project_manager.merge_history(project, _history("2025-03-31", 16, clicks=999), refresh_days=3)
+
+    by_day = merged.set_index('date')['clicks']
+    last_stored = pd.Timestamp("2025-04-10")
+    assert (by_day[:last_stored - pd.Timedelta(days=3)] == 100).all()
+    assert (by_day[last_stored - pd.Timedelta(days=2):] == 999).all()
+    assert stats == {"added": 5, "updated": 3, "total": 105, "start": "2025-01-01", "end": "2025-04-15"}
+
+
+def test_older_export_is_prepended_without_touching_stored_days(project):
+    project_manager.merge_history(project, _history("2025-03-01", 60, clicks=100))
+    # Older export overlapping the first 10 stored days
+    merged, stats = project_manager.merge_history(project, _history("2025-01-01", 69, clicks=7))
+
+    by_day = merged.set_index('date')['clicks']
+    assert (by_day[:"2025-02-28"] == 7).all() and len(by_day[:"2025-02-28"]) == 59
+    assert (by_day["2025-03-01":] == 100).all()
+    assert stats['added'] == 59 and stats['updated'] == 0 and stats['start'] == "2025-01-01"
+    assert merged['date'].is_monotonic_increasing and not merged['date'].duplicated().any()
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.regressor_logic import REGRESSOR_TYPES, apply_regressors, build_regressor_matrix
+
+
+def _reference_column(ds, event):
+    """Per-event formulas, one event at a time (the original apply_regressors loop)."""
+    days_since = (ds - pd.Timestamp(event['date'])).dt.days.to_numpy(dtype=np.float64)
+    duration, impact = event['duration'], event['impact']
+    col = np.zeros(len(ds))
+
+    if event['type'] == 'window':
+        mask = (days_since >= 0) & (days_since <= duration)
+        col[mask] = impact
+    elif event['type'] == 'decay':
+        mask = (days_since >= 0) & (days_since <= duration)
+        tau = duration / 3.0 if duration > 0 else 1.0
+        col[mask] = impact * np.exp(-days_since[mask] / tau)
+    elif event['type'] == 'step':
+        col[days_since >= 0] = impact
+    elif event['type'] == 'ramp':
+        mask_ramp = (days_since >= 0) & (days_since < duration)
+        if duration > 0:
+            col[mask_ramp] = (days_since[mask_ramp] / duration) * impact
+        col[days_since >= duration] = impact
+    return col
+
+
+def _random_events(rng, ds, n):
+    first, last = ds.min(), ds.max()
+    span = (last - first).days
+    events = []
+    for i in range(n):
+        # Starts from well before the history to after its end
+        offset = int(rng.integers(-200, span + 30))
+        events.append({
+            'name': f"Evento {i}",
+            'date': first + pd.Timedelta(days=offset),
+            'type': str(rng.choice(REGRESSOR_TYPES)),
+            'duration': int(rng.choice([0, 1, 2, int(rng.integers(3, 400))])),
+            'impact': float(rng.normal(0, 0.3)),
+        })
+    return events
+
+
+def test_matrix_matches_per_event_formulas_on_random_event_sets():
+    rng = np.random.default_rng(0)
+    ds = pd.Series(pd.date_range("2024-01-01", periods=400, freq="D"))
+    for _ in range(300):
+        events = _random_events(rng, ds, int(rng.integers(1, 12)))
+        matrix, _ = build_regressor_matrix(ds, events)
+        expected = np.column_stack([_reference_column(ds, e) for e in events])
+        np.testing.assert_allclose(matrix, expected, rtol=1e-12, atol=0)
+
+
+@pytest.mark.parametrize("reg_type", REGRESSOR_TYPES)
+def test_edge_cases_match_formulas(reg_type):
+    ds = pd.Series(pd.date_range("2024-01-01", periods=60, freq="D"))
+    events = [
+        {'name': 'Zero', 'date': pd.Timestamp("2024-01-20"), 'type': reg_type, 'duration': 0, 'impact': 0.3},
+        {'name': 'Prima', 'date': pd.Timestamp("2023-11-01"), 'type': reg_type, 'duration': 90, 'impact': -0.2},
+        {'name': 'Finita prima', 'date': pd.Timestamp("2023-06-01"), 'type': reg_type, 'duration': 10, 'impact': 0.5},
+        {'name': 'Dopo', 'date': pd.Timestamp("2024-06-01"), 'type': reg_type, 'duration': 10, 'impact': 0.5},
+    ]
+    matrix, names = build_regressor_matrix(ds, events)
+
+    expected = np.column_stack([_reference_column(ds, e) for e in events])
+    np.testing.assert_allclose(matrix, expected, rtol=1e-12, atol=0)
+    assert not matrix[:, 3].any()  # Event after the frame never contributes
+
+    df, added = apply_regressors(pd.DataFrame({'ds': ds, 'y': 1.0}), events)
+    assert added == names
+    np.testing.assert_allclose(df[added].to_numpy(), matrix)
@@ -0,0 +1,80 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from tools.run_forecast import execute_forecast, complete_intervals, merge_intervals, simulate_override_bands
+
+
+def _future_event(history_df):
+    return [{'name': 'Campagna', 'date': history_df['date'].max() + pd.Timedelta(days=10),
+             'type': 'window', 'duration': 20, 'impact': 0.2}]
+
+
+def test_progressive_intervals_merge_into_point_forecast(history_df):
+    events = _future_event(history_df)
+    config = {'horizon_days': 60, 'uncertainty_samples': 300, 'use_cache': False}
+
+    full = execute_forecast(history_df, events, config)
+    progressive = execute_forecast(history_df, events, dict(config, progressive=True))
+
+    assert progressive['intervals']['status'] == 'pending'
+    point = progressive['forecast']
+    assert point['yhat_lower'].isna().all() and point['yhat_upper'].isna().all()
+    assert np.allclose(point['yhat'], full['forecast']['yhat'])
+
+    done = complete_intervals(progressive['intervals'])
+    merged = merge_intervals(point, done)
+
+    assert set(merged.columns) == set(full['forecast'].columns)
+    assert not merged[['yhat_lower', 'yhat_upper']].isna().any().any()
+    assert (merged['yhat_lower'] <= merged['yhat']).all() and (merged['yhat'] <= merged['yhat_upper']).all()
+    # Overrides are applied to the deferred bands too: the event window is lifted by 20%
+    window = merged['ds'].between(events[0]['date'], events[0]['date'] + pd.Timedelta(days=5))
+    ratio = merged.loc[window, 'yhat_upper'] / full['forecast'].loc[window, 'yhat_upper']
+    assert np.allclose(ratio, 1.0, atol=0.1)
+    assert 'intervals_s' in done['timing']
+    # Derived views are memoized on forecast_id: point-only and completed frames must not share it
+    assert progressive['forecast_id'] != full['forecast_id']
+    assert done['full_forecast_id'] == full['forecast_id']
+
+
+def test_sync_run_reports_ready_intervals(history_df):
+    res = execute_forecast(history_df, [], {'horizon_days': 30, 'use_cache': False, 'uncertainty_samples': 200})
+    assert res['intervals']['status'] == 'ready'
+    assert not res['forecast'][['yhat_lower', 'yhat_upper']].isna().any().any()
+    assert res['debug_info']['timing']['intervals'] == 'ready'
+
+
+def _band_inputs(n_days=365):
+    ds = pd.date_range("2026-01-01", periods=n_days, freq="D")
+    yhat = 1000 + 200 * np.sin(np.arange(n_days) / 58)
+    baseline = pd.DataFrame({'ds': ds, 'yhat': yhat, 'yhat_lower': yhat * 0.85, 'yhat_upper': yhat * 1.15})
+    events = [{'name': 'Campagna', 'date': ds[40], 'type': 'ramp', 'duration': 90, 'impact': 0.2, 'impact_sd': 0.1},
+              {'name': 'Migrazione', 'date': ds[200], 'type': 'window', 'duration': 30, 'impact': -0.1,
+               'impact_min': -0.3, 'impact_max': 0.0}]
+    return baseline, events
+
+
+def test_impact_bands_do_not_depend_on_day_blocks():
+    baseline, events = _band_inputs()
+    whole = simulate_override_bands(baseline, events, n_samples=2000, seed=7)
+    blocked = simulate_override_bands(baseline, events, n_samples=2000, seed=7, chunk_bytes=2000 * 8 * 3 * 10)
+
+    assert blocked['chunk_size'] == 10 and whole['chunk_size'] == len(baseline)
+    pd.testing.assert_frame_equal(whole['daily'], blocked['daily'])
+    pd.testing.assert_frame_equal(whole['monthly'], blocked['monthly'], rtol=1e-9)
+    assert (whole['daily']['p10'] <= whole['daily']['p50']).all() and (whole['daily']['p50'] <= whole['daily']['p90']).all()
+
+
+def test_impact_bands_memory_is_bounded_by_chunk_bytes():
+    baseline, events = _band_inputs()
+    n_samples, chunk_bytes = 20_000, 4 * 1024 ** 2
+    full_paths = n_samples * len(baseline) * 4  # the old float32 (samples x days) array
+
+    tracemalloc.start()
+    simulate_override_bands(baseline, events, n_samples=n_samples, seed=0, chunk_bytes=chunk_bytes)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert peak < full_paths / 2
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.run_forecast import apply_future_overrides
+from tools.scenario_analysis import calculate_yoy_tables, goal_seek
+
+HISTORY_END = pd.Timestamp("2025-12-31")
+
+
+@pytest.fixture
+def baseline():
+    ds = pd.date_range("2024-01-01", "2026-12-31", freq="D")
+    return pd.DataFrame({'ds': ds, 'yhat': 1000.0})
+
+
+@pytest.fixture
+def history():
+    return pd.DataFrame({'date': pd.date_range("2024-01-01", HISTORY_END, freq="D"), 'clicks': 1000.0})
+
+
+@pytest.fixture
+def events():
+    return [
+        {'name': 'Campagna', 'date': pd.Timestamp("2026-03-01"), 'type': 'window', 'duration': 30, 'impact': 0.2},
+        {'name': 'Altro', 'date': pd.Timestamp("2026-06-01"), 'type': 'window', 'duration': 10, 'impact': -0.05},
+    ]
+
+
+def _year_total(baseline, events, plan):
+    """2026 clicks with the solved plan applied to event 0, via the forecast engine."""
+    applied = [plan[0]] + events[1:]
+    fc, _ = apply_future_overrides(baseline, applied)
+    return fc.loc[fc['ds'].dt.year == 2026, 'yhat'].sum()
+
+
+def test_impact_is_minimal(baseline, history, events):
+    target = {'period': '2026', 'clicks': 370_000}
+    res = goal_seek(baseline, events, [0], target, mode='impact', history_df=history, tol=1e-5)
+
+    assert res['status'] == 'solved'
+    assert _year_total(baseline, events, res['plan']) >= 370_000
+    lower = [dict(events[0], impact=res['value'] - 2e-5)]
+    assert _year_total(baseline, events, lower) < 370_000
+
+
+def test_duration_is_smallest_feasible(baseline, history, events):
+    # window: longer duration = more lift; the answer is the shortest window reaching the goal
+    target = {'period': '2026', 'clicks': 372_000}
+    res = goal_seek(baseline, events, [0], target, mode='duration', history_df=history)
+
+    assert res['status'] == 'solved'
+    d = res['value']
+    assert _year_total(baseline, events, [dict(events[0], duration=d)]) >= 372_000
+    assert _year_total(baseline, events, [dict(events[0], duration=d - 1)]) < 372_000
+    # Longer windows also meet the goal, but are not the minimal plan
+    assert _year_total(baseline, events, [dict(events[0], duration=d + 60)]) >= 372_000
+
+
+def test_duration_ramp_is_not_surplus_minimizing(baseline, history, events):
+    # ramp: a longer ramp gives less lift, so every feasible duration is longer than the
+    # minimal one; the solver must return the shortest, not the one closest to the goal
+    ramp = [dict(events[0], type='ramp', impact=0.05)] + events[1:]
+    target = {'period': '2026', 'clicks': 370_000}
+    res = goal_seek(baseline, ramp, [0], target, mode='duration', history_df=history, bounds=(7, 300))
+
+    assert res['status'] == 'solved'
+    assert res['value'] == 7
+    assert _year_total(baseline, ramp, res['plan']) >= 370_000
+
+
+def test_start_is_latest_feasible(baseline, history, events):
+    target = {'period': '2026', 'clicks': 368_500}
+    res = goal_seek(baseline, events, [0], target, mode='start', history_df=history)
+
+    assert res['status'] == 'solved'
+    shift = res['value']
+    later = [dict(events[0], date=events[0]['date'] + pd.DateOffset(months=shift + 1))]
+    assert _year_total(baseline, events, res['plan']) >= 368_500
+    assert _year_total(baseline, events, later) < 368_500
+
+
+@pytest.mark.parametrize("mode", ['impact', 'start', 'duration'])
+def test_already_met_without_varied_events(baseline, history, events, mode):
+    res = goal_seek(baseline, events, [0], {'period': '2026', 'clicks': 300_000}, mode=mode, history_df=history)
+    assert res['status'] == 'already_met'
+    assert res['diagnostics']['residual'] >= 0
+
+
+@pytest.mark.parametrize("mode", ['impact', 'start', 'duration'])
+def test_unreachable_target_is_infeasible(baseline, history, events, mode):
+    res = goal_seek(baseline, events, [0], {'period': '2026', 'clicks': 10_000_000}, mode=mode, history_df=history)
+    assert res['status'] == 'infeasible'
+    assert not res['diagnostics']['converged']
+
+
+def test_yoy_target_uses_previous_year(baseline, history, events):
+    res = goal_seek(baseline, events, [0], {'period': '2026', 'yoy_pct': 1}, mode='impact', history_df=history)
+    goal = res['targets']['Obiettivo'].iloc[0]
+    assert np.isclose(goal, 365 * 1000.0 * 1.01)
+    assert res['status'] == 'solved'
+
+
+def test_yoy_history_partial_uses_the_previous_period_calendar():
+    # Complete Feb 2023 (28 days) vs Feb 2024 (29 days); Feb 2024 history missing one day vs Feb 2025
+    history = pd.DataFrame({'date': pd.date_range("2023-01-01", "2024-02-28", freq="D"), 'clicks': 1000.0})
+    forecast = pd.DataFrame({'ds': pd.date_range("2024-01-01", "2025-03-31", freq="D"), 'yhat': 1000.0})
+
+    monthly = calculate_yoy_tables(forecast, history, start=pd.Timestamp("2023-12-31"))['monthly']
+    flags = monthly.set_index('Periodo')['Storico Parziale']
+
+    assert not flags['2024-02']
+    assert flags['2025-02']
+    assert not flags['2025-01']
@@ -0,0 +1,222 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from tools import forecast_cache
+
+# Rolling-origin backtest: for each cutoff the model only sees history <= cutoff and
+# is scored on the following `horizon` days. Events starting after the cutoff are
+# treated as future overrides, exactly as in a live forecast.
+
+# Fold results already computed in this process (fold key -> rows DataFrame), LRU-capped:
+# every session and project of the server shares it. Fits themselves are also in the
+# on-disk forecast cache, shared with the workers.
+FOLD_MEMO_MAX_ENTRIES = 256
+_fold_memo = OrderedDict()
+_fold_memo_lock = threading.Lock()
+
+
+def _memo_get(key):
+    with _fold_memo_lock:
+        rows = _fold_memo.get(key)
+        if rows is not None:
+            _fold_memo.move_to_end(key)
+    return rows
+
+
+def _memo_put(key, rows):
+    with _fold_memo_lock:
+        _fold_memo[key] = rows
+        _fold_memo.move_to_end(key)
+        while len(_fold_memo) > FOLD_MEMO_MAX_ENTRIES:
+            _fold_memo.popitem(last=False)
+
+
+def make_cutoffs(history_df, horizon, initial=None, period=None):
+    """
+    Cutoff dates, oldest first (same defaults as prophet.diagnostics.cross_validation).
+    Cutoffs are anchored at the start of the history (first date + initial, then every
+    `period` days) rather than counted back from the last date: appending new days only
+    adds cutoffs at the end, so earlier folds keep their keys and stay memoized.
+
+    Args:
+        history_df: DF with 'date' and 'clicks'
+        horizon: days scored after each cutoff
+        initial: minimum training window in days (default 3 * horizon)
+        period: spacing between cutoffs in days (default horizon / 2)
+    """
+    initial = initial or 3 * horizon
+    period = period or max(1, horizon // 2)
+
+    dates = pd.to_datetime(history_df['date'])
+    last_allowed = dates.max() - pd.Timedelta(days=horizon)
+    cutoff = dates.min() + pd.Timedelta(days=initial)
+
+    cutoffs = []
+    while cutoff <= last_allowed:
+        cutoffs.append(cutoff)
+        cutoff += pd.Timedelta(days=period)
+    return cutoffs
+
+
+def _fold_key(train_df, actual_df, events, config, cutoff, horizon):
+    """Fold identity: training fit key + the scored actuals (revised recent days re-score the fold)."""
+    prophet_side = {k: v for k, v in config.items() if k not in ('use_cache', 'warm_start')}
+    actual = actual_df.rename(columns={'date': 'ds', 'clicks': 'y'})
+    actual_digest = forecast_cache.make_cache_key(actual, [], {}, 0)
+    return forecast_cache.make_cache_key(
+        train_df.rename(columns={'date': 'ds', 'clicks': 'y'}),
+        events, prophet_side, horizon, extra={"backtest_cutoff": str(cutoff), "actuals": actual_digest})
+
+
+def run_fold(fold):
+    """
+    Fits on history <= cutoff and returns the scored rows for (cutoff, cutoff + horizon].
+    Executed inside a worker process.
+    """
+    from tools.run_forecast import execute_forecast
+
+    stan_logger = logging.getLogger('cmdstanpy')
+    if not stan_logger.handlers:
+        stan_logger.addHandler(logging.NullHandler())
+    stan_logger.setLevel(logging.WARNING)
+
+    t0 = time.perf_counter()
+    cutoff = fold['cutoff']
+    # Coverage needs real intervals: no progressive (point-only) folds, no Monte Carlo bands
+    config = dict(fold['config'], horizon_days=fold['horizon'], progressive=False, impact_samples=0)
+    results = execute_forecast(fold['train'], fold['events'], config)
+
+    fc = results['forecast']
+    fc = fc[(fc['ds'] > cutoff) & (fc['ds'] <= cutoff + pd.Timedelta(days=fold['horizon']))]
+    actual = fold['actual'].rename(columns={'date': 'ds', 'clicks': 'y'})[['ds', 'y']]
+
+    rows = fc[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].merge(actual, on='ds', how='inner')
+    rows.insert(0, 'cutoff', cutoff)
+    rows['horizon_day'] = (rows['ds'] - cutoff).dt.days
+    return {
+        "rows": rows,
+        "seconds": time.perf_counter() - t0,
+        "cache_hit": results['debug_info']['cache']['hit']
+    }
+
+
+def score_by_horizon(rows, bucket_days=1):
+    """
+    Per-horizon accuracy table: MAPE/RMSE/MAE (as in calculate_metrics) plus the
+    share of actuals inside [yhat_lower, yhat_upper].
+    bucket_days groups horizon days (e.g. 7 = one row per forecast week).
+    """
+    if rows.empty:
+        return pd.DataFrame(columns=['horizon', 'n', 'mape', 'rmse', 'mae', 'coverage'])
+
+    err = rows['y'].to_numpy() - rows['yhat'].to_numpy()
+    y = rows['y'].to_numpy()
+    days = rows['horizon_day'].to_numpy()
+    scored = pd.DataFrame({
+        # Bucket labelled by its last day (the final bucket may be shorter)
+        'horizon': np.minimum(((days - 1) // bucket_days + 1) * bucket_days, days.max()),
+        'ape': np.where(y != 0, np.abs(err) / np.where(y != 0, y, 1), np.nan) * 100,
+        'se': err ** 2,
+        'ae': np.abs(err),
+        'covered': ((y >= rows['yhat_lower'].to_numpy()) & (y <= rows['yhat_upper'].to_numpy())).astype(float)
+    })
+
+    table = scored.groupby('horizon').agg(
+        n=('ae', 'size'), mape=('ape', 'mean'), mse=('se', 'mean'),
+        mae=('ae', 'mean'), coverage=('covered', 'mean')
+    ).reset_index()
+    table['rmse'] = np.sqrt(table.pop('mse'))
+    return table[['horizon', 'n', 'mape', 'rmse', 'mae', 'coverage']]
+
+
+def run_backtest(history_df, events, config, horizon=30, initial=None, period=None,
+                 max_workers=None, bucket_days=1, cutoffs=None):
+    """
+    Rolling-origin backtest of execute_forecast.
+
+    Args:
+        history_df: DF with 'date' and 'clicks'
+        events: list of event dicts (split per fold into fit / override like a live run)
+        config: execute_forecast config (horizon_days is replaced by `horizon`)
+        horizon, initial, period: see make_cutoffs
+        max_workers: process pool size (1 = run folds inline)
+        bucket_days: horizon granularity of the per-horizon table
+        cutoffs: explicit cutoff dates (overrides initial/period)
+
+    Returns:
+        Dict: {
+            "cutoffs": list of Timestamps,
+            "rows": df (cutoff, ds, yhat, yhat_lower, yhat_upper, y, horizon_day),
+            "by_horizon": df (horizon, n, mape, rmse, mae, coverage),
+            "summary": dict (mape, rmse, mae, coverage, folds, horizon),
+            "timing": dict (wall_s, fold_s, folds_run, folds_memo, fit_cache_hits)
+        }
+    """
+    history_df = history_df.sort_values('date')
+    if cutoffs is None:
+        cutoffs = make_cutoffs(history_df, horizon, initial, period)
+    cutoffs = [pd.Timestamp(c) for c in cutoffs]
+
+    t_start = time.perf_counter()
+    fold_rows = {}
+    pending = []
+    for cutoff in cutoffs:
+        train = history_df[history_df['date'] <= cutoff]
+        actual = history_df[(history_df['date'] > cutoff) &
+                            (history_df['date'] <= cutoff + pd.Timedelta(days=horizon))]
+        key = _fold_key(train, actual, events, config, cutoff, horizon)
+        memo = _memo_get(key)
+        if memo is not None:
+            fold_rows[cutoff] = memo
+            continue
+        pending.append((key, {
+            "cutoff": cutoff,
+            "horizon": horizon,
+            "train": train,
+            "actual": actual,
+            "events": events,
+            "config": config
+        }))
+
+    fold_seconds = []
+    cache_hits = 0
+    if pending:
+        if max_workers == 1 or len(pending) == 1:
+            outputs = [run_fold(fold) for _, fold in pending]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                outputs = list(pool.map(run_fold, [fold for _, fold in pending]))
+
+        for (key, fold), out in zip(pending, outputs):
+            _memo_put(key, out['rows'])
+            fold_rows[fold['cutoff']] = out['rows']
+            fold_seconds.append(out['seconds'])
+            cache_hits += int(out['cache_hit'])
+
+    frames = [fold_rows[c] for c in cutoffs if not fold_rows[c].empty]
+    rows = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=['cutoff', 'ds', 'yhat', 'yhat_lower', 'yhat_upper', 'y', 'horizon_day'])
+
+    overall = score_by_horizon(rows.assign(horizon_day=1))
+    summary = {"folds": len(cutoffs), "horizon": horizon}
+    if not overall.empty:
+        summary.update({k: float(overall.iloc[0][k]) for k in ['mape', 'rmse', 'mae', 'coverage']})
+
+    return {
+        "cutoffs": cutoffs,
+        "rows": rows,
+        "by_horizon": score_by_horizon(rows, bucket_days),
+        "summary": summary,
+        "timing": {
+            "wall_s": round(time.perf_counter() - t_start, 3),
+            "fold_s": [round(s, 3) for s in fold_seconds],
+            "folds_run": len(pending),
+            "folds_memo": len(cutoffs) - len(pending),
+            "fit_cache_hits": cache_hits
+        }
+    }
@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tools import project_manager
+
+# Columns shipped back from workers (keeps inter-process payloads small)
+SCENARIO_COLS = ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
+
+
+def load_manifest(path):
+    """
+    Reads a batch manifest (JSON or CSV) into a list of job dicts.
+
+    Job keys:
+        project (str, required): target folder in user_projects/
+        gsc_csv (str, required): path to the GSC export
+        regressors (str, optional): CSV/XLSX events file (same format as the app upload)
+        config (dict or JSON string, optional): execute_forecast config
+        scenario_name (str, optional): defaults to "Batch <job_id>"
+        job_id (str, optional): defaults to the row index
+    """
+    if path.lower().endswith('.csv'):
+        jobs = pd.read_csv(path).fillna('').to_dict('records')
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        jobs = data.get('jobs', []) if isinstance(data, dict) else data
+
+    normalized = []
+    for i, job in enumerate(jobs):
+        job = dict(job)
+        cfg = job.get('config') or {}
+        if isinstance(cfg, str):
+            cfg = json.loads(cfg)
+        job['config'] = cfg
+        job['job_id'] = str(job.get('job_id') or i)
+        if not job.get('scenario_name'):
+            job['scenario_name'] = f"Batch {job['job_id']}"
+        normalized.append(job)
+    return normalized
+
+
+def load_events_file(path):
+    """
+    Loads events from a regressor file: the two-sheet Excel (Eventi + Template)
+    or the flat CSV/XLSX exported by the regressor editor.
+    """
+    from tools import ingest_data, regressor_logic
+
+    if path.lower().endswith('.xlsx'):
+        res = ingest_data.parse_regressors(path)
+        if res['status'] == 'success':
+            return res['data']
+
+    with open(path, 'rb') as f:
+        res = regressor_logic.parse_regressors(f)
+    if res['status'] == 'error':
+        raise ValueError(f"Regressori: {res['message']}")
+    return res['data'] or []
+
+
+def run_job(job):
+    """
+    Runs a single forecast job. Executed inside a worker process (one Prophet fit per worker).
+    Never raises: failures are returned as status 'error'.
+    """
+    from tools.ingest_data import load_gsc_csv
+    from tools.run_forecast import execute_forecast
+
+    # Keep worker output readable: one INFO line per Stan chain adds up over hundreds of jobs
+    stan_logger = logging.getLogger('cmdstanpy')
+    if not stan_logger.handlers:
+        stan_logger.addHandler(logging.NullHandler())
+    stan_logger.setLevel(logging.WARNING)
+    t0 = time.perf_counter()
+    result = {"job_id": job['job_id'], "project": job.get('project')}
+
+    try:
+        res_gsc = load_gsc_csv(job['gsc_csv'])
+        if res_gsc['status'] == 'error':
+            raise ValueError(f"GSC: {res_gsc['message']}")
+
+        events = load_events_file(job['regressors']) if job.get('regressors') else []
+
+        history_df = res_gsc['data']
+        config = dict(job['config'])
+        if job.get('project') and 'warm_start' not in config:
+            config['warm_start'] = project_manager.load_fit_params(job['project'])
+        results = execute_forecast(history_df, events, config)
+        forecast = results['forecast']
+
+        # Scenario total = forecast beyond the last GSC day (not "after today": exports may be old)
+        metrics = dict(results['metrics'])
+        metrics['forecast_total'] = float(forecast.loc[forecast['ds'] > history_df['date'].max(), 'yhat'].sum())
+
+        result.update({
+            "status": "ok",
+            "forecast": forecast[[c for c in SCENARIO_COLS if c in forecast.columns]],
+            "events": events,
+            "metrics": metrics,
+            "cache_hit": results['debug_info']['cache']['hit'],
+            "warm_start": results['warm_start']
+        })
+    except Exception as e:
+        result.update({"status": "error", "message": str(e)})
+
+    result["seconds"] = time.perf_counter() - t0
+    return result
+
+
+def _save_result(job, result):
+    """Streams a finished job into user_projects/<project> as soon as it completes."""
+    project = job['project']
+    if not os.path.exists(os.path.join(project_manager.PROJECTS_DIR, project)):
+        project_manager.create_new_project(project)
+
+    project_manager.save_fit_params(project, result['warm_start'])
+    return project_manager.save_scenario(
+        project,
+        job['scenario_name'],
+        result['forecast'],
+        result['events'],
+        result['metrics']
+    )
+
+
+def run_batch(jobs, max_workers=None, save=True, on_result=None):
+    """
+    Runs jobs across a process pool and saves each scenario as soon as it completes.
+
+    Args:
+        jobs: list of job dicts (see load_manifest)
+        max_workers: pool size (default: os.cpu_count())
+        save: write results to the scenario store
+        on_result: optional callback(report_row) for progress reporting
+
+    Returns:
+        pd.DataFrame: one row per job (job_id, project, status, seconds, message)
+    """
+    jobs_by_id = {job['job_id']: job for job in jobs}
+    rows = []
+    t_start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(run_job, job): job for job in jobs}
+        for fut in as_completed(futures):
+            try:
+                result = fut.result()
+            except Exception as e:
+                # Worker crashed (e.g. killed process): report it against the submitted job
+                job = futures[fut]
+                result = {"job_id": job['job_id'], "project": job.get('project'), "status": "error",
+                          "message": f"Worker terminato: {e}", "seconds": 0.0}
+
+            row = {
+                "job_id": result['job_id'],
+                "project": result['project'],
+                "status": result['status'],
+                "seconds": round(result['seconds'], 3),
+                "message": result.get('message', '')
+            }
+
+            if result['status'] == 'ok' and save:
+                ok, msg = _save_result(jobs_by_id[result['job_id']], result)
+                if not ok:
+                    row['status'] = 'error'
+                    row['message'] = msg
+
+            rows.append(row)
+            if on_result:
+                on_result(row)
+
+    report = pd.DataFrame(rows, columns=["job_id", "project", "status", "seconds", "message"])
+    report.attrs['wall_seconds'] = time.perf_counter() - t_start
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Forecast batch su più progetti/proprietà GSC.")
+    parser.add_argument("manifest", help="Manifest JSON o CSV dei job")
+    parser.add_argument("--workers", type=int, default=None, help="Processi paralleli (default: CPU)")
+    parser.add_argument("--report", default=None, help="Salva il report dei job in CSV")
+    parser.add_argument("--no-save", action="store_true", help="Non salvare gli scenari")
+    args = parser.parse_args(argv)
+
+    jobs = load_manifest(args.manifest)
+    print(f"{len(jobs)} job in coda...")
+
+    def progress(row):
+        flag = "OK " if row['status'] == 'ok' else "ERR"
+        print(f"[{flag}] {row['job_id']} ({row['project']}) {row['seconds']:.2f}s {row['message']}")
+
+    report = run_batch(jobs, max_workers=args.workers, save=not args.no_save, on_result=progress)
+
+    n_err = int((report['status'] != 'ok').sum())
+    print(f"Completati {len(report) - n_err}/{len(report)} in {report.attrs['wall_seconds']:.1f}s")
+    if args.report:
+        report.to_csv(args.report, index=False)
+    return 1 if n_err else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,338 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# Micro-benchmarks for the performance-sensitive paths.
+# Usage: python -m tools.benchmarks [name]   (no name = run all)
+
+
+def _timeit(fn, repeat=3):
+    """Best-of-N wall time in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _random_events(n_events, start, n_days, seed=42):
+    rng = np.random.default_rng(seed)
+    types = ['window', 'decay', 'step', 'ramp']
+    return [{
+        "name": f"Evento {i}",
+        "date": start + pd.Timedelta(days=int(rng.integers(0, n_days))),
+        "type": types[i % len(types)],
+        "duration": int(rng.integers(1, 180)),
+        "impact": float(rng.uniform(-0.3, 0.3))
+    } for i in range(n_events)]
+
+
+def _legacy_apply_regressors(df, events):
+    """Previous per-event implementation (pandas masks), kept as benchmark reference."""
+    df = df.copy()
+    df['ds'] = pd.to_datetime(df['ds'])
+    for i, event in enumerate(events):
+        col_name = f"reg_{i}"
+        df[col_name] = 0.0
+        duration = event['duration']
+        impact = event['impact']
+        days_since = (df['ds'] - event['date']).dt.days
+        if event['type'] == 'window':
+            df.loc[(days_since >= 0) & (days_since <= duration), col_name] = impact
+        elif event['type'] == 'decay':
+            mask = (days_since >= 0) & (days_since <= duration)
+            tau = duration / 3.0 if duration > 0 else 1.0
+            df.loc[mask, col_name] = impact * np.exp(-days_since[mask] / tau)
+        elif event['type'] == 'step':
+            df.loc[days_since >= 0, col_name] = impact
+        elif event['type'] == 'ramp':
+            mask_ramp = (days_since >= 0) & (days_since < duration)
+            if duration > 0:
+                df.loc[mask_ramp, col_name] = (days_since[mask_ramp] / duration) * impact
+            df.loc[days_since >= duration, col_name] = impact
+    return df
+
+
+def bench_regressors(n_events=500, n_days=3000):
+    """Legacy per-event loop vs vectorized apply_regressors."""
+    import warnings
+    from tools.regressor_logic import apply_regressors
+
+    start = pd.Timestamp('2018-01-01')
+    df = pd.DataFrame({'ds': pd.date_range(start, periods=n_days, freq='D')})
+    events = _random_events(n_events, start, n_days)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # Legacy path floods fragmentation warnings
+        t_legacy = _timeit(lambda: _legacy_apply_regressors(df, events), repeat=1)
+    t_new = _timeit(lambda: apply_regressors(df, events))
+
+    print(f"[regressors] {n_events} eventi x {n_days} giorni")
+    print(f"  legacy loop : {t_legacy * 1000:8.1f} ms")
+    print(f"  vectorized  : {t_new * 1000:8.1f} ms  (x{t_legacy / t_new:.0f})")
+
+
+def _subprocess_seconds(code, repeat=3):
+    """Best-of-N wall time of a fresh interpreter running `code` (cold start)."""
+    import os
+    import subprocess
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return _timeit(lambda: subprocess.run([sys.executable, "-c", code], cwd=root,
+                                          capture_output=True, check=True), repeat=repeat)
+
+
+def bench_imports():
+    """Cold-start import time of the app header, the CLI and the core engine modules."""
+    import os
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(root, "app.py"), encoding="utf-8") as f:
+        app_src = f.read()
+    # Everything app.py executes before its first function definition (imports + reloads)
+    app_header = app_src.split("# --- HELPER FUNCTIONS ---")[0]
+
+    cases = {
+        "app.py (import block)": app_header,
+        "tools.cli --help": "import sys; sys.argv=['cli','--help']\ntry:\n    import tools.cli as c; c.main()\nexcept SystemExit: pass",
+        "tools.run_forecast": "import tools.run_forecast",
+        "tools.chatbot": "import tools.chatbot",
+        "tools.report_generator": "import tools.report_generator",
+    }
+    print("[imports] cold start (best of 3)")
+    for label, code in cases.items():
+        print(f"  {label:<24}: {_subprocess_seconds(code) * 1000:8.0f} ms")
+
+
+def _write_bulk_gsc_csv(path, n_rows, n_days=480, seed=0, chunk=1_000_000):
+    """Synthetic bulk export: one row per date x query x page x country."""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range('2024-01-01', periods=n_days, freq='D').strftime('%Y-%m-%d').to_numpy()
+    countries = np.array(['ita', 'usa', 'deu', 'fra', 'esp'])
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("date,query,page,country,clicks,impressions,ctr,position\n")
+        while written < n_rows:
+            n = min(chunk, n_rows - written)
+            clicks = rng.poisson(3, n)
+            impressions = clicks * 10 + rng.poisson(20, n)
+            pd.DataFrame({
+                'date': days[rng.integers(0, n_days, n)],
+                'query': np.char.add('query ', rng.integers(0, 50_000, n).astype(str)),
+                'page': np.char.add('/page/', rng.integers(0, 5_000, n).astype(str)),
+                'country': countries[rng.integers(0, len(countries), n)],
+                'clicks': clicks,
+                'impressions': impressions,
+                'ctr': np.round(clicks / impressions, 4),
+                'position': np.round(rng.uniform(1, 50, n), 1)
+            }).to_csv(f, header=False, index=False)
+            written += n
+
+
+def _peak_memory(fn):
+    """(seconds, peak traced MB) of one call."""
+    import tracemalloc
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak / 1024 ** 2
+
+
+def bench_ingest(n_rows=5_000_000):
+    """Whole-file read_csv + validate_gsc_data vs chunked stream_gsc_csv on a bulk export."""
+    import os
+    import tempfile
+    from tools.ingest_data import validate_gsc_data, stream_gsc_csv
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "gsc_bulk.csv")
+        _write_bulk_gsc_csv(path, n_rows)
+        size_mb = os.path.getsize(path) / 1024 ** 2
+
+        res_old, t_old, peak_old = _peak_memory(lambda: validate_gsc_data(pd.read_csv(path)))
+        res_new, t_new, peak_new = _peak_memory(lambda: stream_gsc_csv(path))
+
+    same = np.allclose(res_old['data']['clicks'].to_numpy(dtype=float), res_new['data']['clicks'].to_numpy())
+    print(f"[ingest] {n_rows:,} righe, {size_mb:.0f} MB ({len(res_new['data'])} giorni, totali identici: {same})")
+    print(f"  read_csv + groupby : {t_old:6.1f} s  picco {peak_old:8.0f} MB")
+    print(f"  streaming (chunk)  : {t_new:6.1f} s  picco {peak_new:8.0f} MB")
+
+
+def _dir_size_mb(path, ext):
+    import os
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path) if f.endswith(ext)) / 1024 ** 2
+
+
+def bench_scenarios(n_scenarios=100, n_days=3 * 365):
+    """Legacy CSV scenarios vs structured .npy (load all + disk size)."""
+    import os
+    import tempfile
+    from tools import project_manager, scenario_analysis
+
+    rng = np.random.default_rng(0)
+    ds = pd.date_range('2024-01-01', periods=n_days, freq='D')
+    frames = []
+    for _ in range(n_scenarios):
+        yhat = 1000 + rng.normal(0, 50, n_days).cumsum()
+        frames.append(pd.DataFrame({'ds': ds, 'yhat': yhat, 'yhat_lower': yhat * 0.9, 'yhat_upper': yhat * 1.1}))
+
+    old_dir = project_manager.PROJECTS_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        project_manager.PROJECTS_DIR = tmp
+        try:
+            proj = os.path.join(tmp, "bench")
+            os.makedirs(proj)
+            for i, df in enumerate(frames):
+                df.to_csv(os.path.join(proj, f"s{i}.csv"), index=False)
+            csv_mb = _dir_size_mb(proj, '.csv')
+
+            def load_csv():
+                for i in range(n_scenarios):
+                    df = pd.read_csv(os.path.join(proj, f"s{i}.csv"))
+                    df['ds'] = pd.to_datetime(df['ds'])
+            t_csv = _timeit(load_csv)
+
+            t_migrate = _timeit(lambda: [project_manager.load_scenario_df("bench", f"s{i}.csv") for i in range(n_scenarios)], repeat=1)
+            npy_mb = _dir_size_mb(proj, '.npy')
+            t_npy = _timeit(lambda: [project_manager.load_scenario_df("bench", f"s{i}.csv") for i in range(n_scenarios)])
+            t_mmap = _timeit(lambda: [project_manager.load_scenario_array("bench", f"s{i}.csv") for i in range(n_scenarios)])
+            # Comparison matrix as built by the app: from DataFrames vs straight from the mmap arrays
+            t_matrix_df = _timeit(lambda: scenario_analysis.align_scenarios(
+                {i: project_manager.load_scenario_df("bench", f"s{i}.csv") for i in range(n_scenarios)}, future_only=False))
+            t_matrix_mmap = _timeit(lambda: scenario_analysis.align_scenario_arrays(
+                {i: project_manager.load_scenario_array("bench", f"s{i}.csv") for i in range(n_scenarios)}, future_only=False))
+        finally:
+            project_manager.PROJECTS_DIR = old_dir
+
+    print(f"[scenarios] {n_scenarios} scenari x {n_days} giorni")
+    print(f"  CSV (read_csv + date parse): {t_csv * 1000:8.1f} ms   {csv_mb:6.2f} MB")
+    print(f"  .npy -> DataFrame           : {t_npy * 1000:8.1f} ms   {npy_mb:6.2f} MB")
+    print(f"  .npy memory-mapped array    : {t_mmap * 1000:8.1f} ms")
+    print(f"  matrice confronto (DataFrame): {t_matrix_df * 1000:8.1f} ms")
+    print(f"  matrice confronto (mmap)    : {t_matrix_mmap * 1000:8.1f} ms")
+    print(f"  migrazione CSV -> .npy (1x) : {t_migrate * 1000:8.1f} ms")
+
+
+def bench_impact_mc(n_samples=10_000, n_days=365, n_events=50):
+    """Monte Carlo impact bands: chunked (samples x days) simulation vs full-tensor memory."""
+    from tools.run_forecast import simulate_override_bands
+
+    start = pd.Timestamp("2026-01-01")
+    ds = pd.date_range(start, periods=n_days, freq="D")
+    rng = np.random.default_rng(0)
+    yhat = 1000 + 200 * np.sin(np.arange(n_days) / 58) + rng.normal(0, 20, n_days)
+    baseline = pd.DataFrame({'ds': ds, 'yhat': yhat, 'yhat_lower': yhat * 0.85, 'yhat_upper': yhat * 1.15})
+
+    events = _random_events(n_events, start, n_days)
+    for i, evt in enumerate(events):
+        if i % 2:
+            evt['impact_sd'] = abs(evt['impact']) / 2 + 0.01
+        else:
+            evt['impact_min'], evt['impact_max'] = evt['impact'] - 0.1, evt['impact'] + 0.1
+
+    res, seconds, peak = _peak_memory(lambda: simulate_override_bands(baseline, events, n_samples=n_samples, seed=0))
+    full_tensor_mb = n_samples * n_days * n_events * 8 / 1024 ** 2
+    monthly = res['monthly']
+
+    print(f"[impact_mc] {n_samples:,} campioni x {n_days} giorni x {n_events} eventi (blocchi di {res['chunk_size']} giorni)")
+    print(f"  simulazione + quantili : {seconds * 1000:8.1f} ms  picco {peak:6.0f} MB "
+          f"(tensore completo sarebbe {full_tensor_mb:,.0f} MB)")
+    print(f"  fasi                   : {res['timing']}")
+    print(f"  totale P10/P50/P90     : {monthly['p10'].sum():,.0f} / {monthly['p50'].sum():,.0f} / {monthly['p90'].sum():,.0f}")
+
+
+def bench_sweep(n_impacts=40, n_durations=25, n_days=365, n_events=20, n_swept=3):
+    """Sensitivity sweep: (impact x duration) variants on one baseline vs one override pass per variant."""
+    from tools.run_forecast import sweep_override_grid, apply_future_overrides
+
+    start = pd.Timestamp("2026-01-01")
+    ds = pd.date_range(start, periods=n_days, freq="D")
+    yhat = 1000 + 200 * np.sin(np.arange(n_days) / 58)
+    baseline = pd.DataFrame({'ds': ds, 'yhat': yhat})
+    events = _random_events(n_events, start, n_days)
+    impacts = np.linspace(-0.3, 0.5, n_impacts)
+    durations = np.linspace(30, 270, n_durations).astype(int)
+    swept = list(range(n_swept))
+
+    t_grid = _timeit(lambda: sweep_override_grid(baseline, events, swept, impacts, durations))
+
+    # Naive reference: edit the events and re-apply the overrides for a sample of variants
+    def naive(n=50):
+        for a, d in list(zip(impacts, durations))[:n]:
+            variant = [dict(e, impact=a, duration=d) if i in swept else e for i, e in enumerate(events)]
+            apply_future_overrides(baseline, variant)[0]['yhat'].sum()
+    t_naive = _timeit(naive, repeat=1) / 50 * n_impacts * n_durations
+
+    print(f"[sweep] {n_impacts * n_durations} varianti ({n_impacts} impatti x {n_durations} durate), "
+          f"{n_swept}/{n_events} eventi, {n_days} giorni")
+    print(f"  griglia vettoriale       : {t_grid * 1000:8.1f} ms")
+    print(f"  override per variante    : {t_naive * 1000:8.1f} ms (stimato)")
+
+
+def bench_packages():
+    """Prospecting packages: cartesian form variants ranked on one baseline vs one override pass per package."""
+    from tools.preset_generator import expand_form_variants, evaluate_packages, generate_prospecting_events
+    from tools.run_forecast import apply_future_overrides
+
+    start = pd.Timestamp("2026-01-01")
+    baseline = pd.DataFrame({'ds': pd.date_range(start, periods=365, freq="D"),
+                             'yhat': 1000 + 200 * np.sin(np.arange(365) / 58)})
+    base_form = {'contract_start_date': start, 'contract_months': 12, 'content_months': (2, 10),
+                 'link_months': (3, 12), 'onpage_months': (1, 6), 'local_months': (1, 12)}
+    grid = {'setup_mode': ['none', 'lite', 'full', 'strategy'], 'content_enabled': [False, True],
+            'content_impact_total': [10, 20, 30, 40, 50], 'link_enabled': [False, True],
+            'link_impact_total': [10, 20, 30, 40, 50], 'tech_mode': ['none', 'care'],
+            'onpage_enabled': [False, True], 'local_enabled': [False, True]}
+    variants = expand_form_variants(base_form, grid)
+
+    res = evaluate_packages(baseline, variants)
+    t_batch = _timeit(lambda: evaluate_packages(baseline, variants))
+
+    def naive(n=100):
+        for _, form in variants[:n]:
+            apply_future_overrides(baseline, generate_prospecting_events(form))[0]['yhat'].sum()
+    t_naive = _timeit(naive, repeat=1) / 100 * len(variants)
+
+    print(f"[packages] {res['n_variants']} varianti -> {res['n_packages']} pacchetti distinti")
+    print(f"  batch vettoriale         : {t_batch * 1000:8.1f} ms  fasi {res['timing']}")
+    print(f"  override per pacchetto   : {t_naive * 1000:8.1f} ms (stimato)")
+
+
+def bench_goal_seek(n_events=20, n_vary=3):
+    """Goal seek: impact / start / duration solved for a YoY target on one baseline."""
+    from tools.scenario_analysis import goal_seek
+
+    start = pd.Timestamp("2026-01-01")
+    ds = pd.date_range(start - pd.Timedelta(days=730), periods=730 + 365, freq="D")
+    yhat = 1000 + 200 * np.sin(np.arange(len(ds)) / 58)
+    baseline = pd.DataFrame({'ds': ds, 'yhat': yhat})
+    history = pd.DataFrame({'date': ds[:730], 'clicks': yhat[:730]})
+    events = _random_events(n_events, start + pd.Timedelta(days=1), 300)
+
+    print(f"[goal_seek] obiettivo YoY +25% sul {start.year}, {n_vary}/{n_events} eventi regolati")
+    for mode in ['impact', 'start', 'duration']:
+        res = goal_seek(baseline, events, range(n_vary), {'period': str(start.year), 'yoy_pct': 25},
+                        mode=mode, history_df=history, start=start - pd.Timedelta(days=1))
+        d = res['diagnostics']
+        print(f"  {mode:<9}: {d['seconds'] * 1000:7.1f} ms  {res['status']:<11} valore {res['value']:<8.4g} "
+              f"iterazioni {d['iterations']}, valutazioni {d['evaluations']}")
+
+
+BENCHMARKS = {
+    "regressors": bench_regressors,
+    "imports": bench_imports,
+    "ingest": bench_ingest,
+    "scenarios": bench_scenarios,
+    "impact_mc": bench_impact_mc,
+    "sweep": bench_sweep,
+    "packages": bench_packages,
+    "goal_seek": bench_goal_seek,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
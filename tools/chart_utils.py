@@ -0,0 +1,92 @@
+import numpy as np
+
+# Server-side downsampling of Plotly traces: a browser chart cannot show more
+# distinct points than it has pixels, so long daily series are reduced to a
+# point budget before being serialized. Exports always use the full frames.
+DEFAULT_CHART_WIDTH_PX = 1200
+POINTS_PER_PX = 2
+
+
+def point_budget(width_px=DEFAULT_CHART_WIDTH_PX, points_per_px=POINTS_PER_PX):
+    """Max points per trace for a chart `width_px` wide (None = full resolution)."""
+    if width_px is None:
+        return None
+    return int(width_px * points_per_px)
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return np.nan_to_num(values.astype(np.float64))
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: indices of the n_out points that best keep
+    the visual shape (peaks and dips) of the series. First and last points are
+    always kept. x must be sorted; datetimes are accepted.
+    """
+    n = len(y)
+    if n_out is None or n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = _as_float(x)
+    y = _as_float(y)
+
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+
+    # Bucket averages do not depend on the selection: compute them all at once.
+    # Bucket i is scored against the average of bucket i + 1 (the last one against the final point).
+    bounds = np.append(edges, n)
+    sizes = np.diff(bounds)
+    avg_x = np.add.reduceat(x, bounds[:-1]) / sizes
+    avg_y = np.add.reduceat(y, bounds[:-1]) / sizes
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Triangle area (x2) between the last kept point, each candidate and the next bucket's average
+        area = np.abs((x[a] - avg_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(y, n_out):
+    """
+    Min/max bucketing: keeps the lowest and highest point of each bucket
+    plus the endpoints (at most n_out points). Cheaper than LTTB and exact on extremes.
+    """
+    n = len(y)
+    if n_out is None or n_out >= n or n_out < 4:
+        return np.arange(n)
+
+    y = _as_float(y)
+    starts = np.linspace(0, n, (n_out - 2) // 2, endpoint=False).astype(np.int64)
+    lengths = np.diff(np.append(starts, n))
+    bucket_of = np.repeat(np.arange(len(starts)), lengths)
+
+    # Position of the min/max inside each bucket via one lexsort per direction
+    order_min = np.lexsort((y, bucket_of))
+    order_max = np.lexsort((-y, bucket_of))
+    idx = np.concatenate([order_min[starts], order_max[starts], [0, n - 1]])
+    return np.unique(idx)
+
+
+def downsample_frame(df, x_col, y_col, max_points, method="lttb"):
+    """
+    Rows of df selected by LTTB ('lttb') or min/max bucketing ('minmax') on
+    (x_col, y_col). All other columns follow the same rows (e.g. intervals).
+    Returns df unchanged when it already fits the budget or max_points is None.
+    """
+    if max_points is None or len(df) <= max_points:
+        return df
+    if method == "minmax":
+        idx = minmax_indices(df[y_col].to_numpy(), max_points)
+    else:
+        idx = lttb_indices(df[x_col].to_numpy(), df[y_col].to_numpy(), max_points)
+    return df.iloc[idx]
@@ -1,9 +1,9 @@
 
-import streamlit as st
-from openai import OpenAI
 import pandas as pd
 import json
 
+from tools.scenario_analysis import calculate_yoy_tables
+
 def get_system_prompt(custom_prompt=None, context_data=None):
     base_prompt = """Sei un assistente esperto in SEO e Forecasting.
 Il tuo compito è aiutare l'utente a comprendere i dati di traffico, le previsioni generate da Prophet e l'impatto dei regressori.
@@ -53,9 +53,11 @@ Regole:
     
     return base_prompt + technical_instructions
 
-def prepare_context_data(gsc_data, events, forecast_data, metrics, config, baseline_data=None):
+def prepare_context_data(gsc_data, events, forecast_data, metrics, config, baseline_data=None, backtest=None, yoy_tables=None):
     """
     Condenses the application state into a text summary for the LLM.
+    backtest: optional tools.backtest.run_backtest result (out-of-sample accuracy).
+    yoy_tables: optional scenario_analysis.calculate_yoy_tables result (computed here if missing).
     """
     context = []
     
@@ -132,55 +134,36 @@ def prepare_context_data(gsc_data, events, forecast_data, metrics, config, basel
                 context.append("\n=== REPORT TRIMESTRALE (VALIDAZIONE TARGET - LIVE DATA) ===")
                 context.append("Questo report mostra l'impatto REALE dei nuovi regressori:")
                 
-                # Setup
-                df_curr = future_forecast.copy()
-                df_curr['quarter'] = df_curr['ds'].dt.to_period('Q')
-                q_curr = df_curr.groupby('quarter')['yhat'].sum()
-                
-                # History (for YoY)
-                q_hist = pd.Series(dtype='float64')
-                if gsc_data is not None and not gsc_data.empty:
-                    df_h = gsc_data.copy()
-                    # Normalize
-                    if 'ds' not in df_h.columns and 'date' in df_h.columns: df_h = df_h.rename(columns={'date': 'ds'})
-                    if 'y' not in df_h.columns and 'clicks' in df_h.columns: df_h = df_h.rename(columns={'clicks': 'y'})
-                    if 'ds' in df_h.columns: # Verify column exists
-                        if not pd.api.types.is_datetime64_any_dtype(df_h['ds']):
-                             df_h['ds'] = pd.to_datetime(df_h['ds'])
-                        df_h['quarter'] = df_h['ds'].dt.to_period('Q')
-                        q_hist = df_h.groupby('quarter')['y'].sum()
-                
+                if yoy_tables is None:
+                    yoy_tables = calculate_yoy_tables(forecast_data, gsc_data)
+                if yoy_tables is None:
+                    raise ValueError("nessun giorno di forecast oltre lo storico")
+
+                # Components per quarter, over the same forecast days as the YoY table
+                df_curr = forecast_data[forecast_data['ds'] > yoy_tables['start']]
+                quarter = df_curr['ds'].dt.to_period('Q').astype(str)
+                q_comp = None
+                if 'trend' in df_curr.columns:
+                    reg_cols = [evt['name'] for evt in (events or []) if evt['name'] in df_curr.columns]
+                    q_comp = pd.DataFrame({
+                        'trend': df_curr['trend'],
+                        'regs': df_curr[reg_cols].sum(axis=1)
+                    }).groupby(quarter).sum()
+
                 # Baseline (for Scenario Gap)
                 q_base = pd.Series(dtype='float64')
                 if baseline_data is not None and not baseline_data.empty:
-                    df_b = baseline_data[baseline_data['ds'] > pd.to_datetime('today')].copy()
-                    df_b['quarter'] = df_b['ds'].dt.to_period('Q')
-                    q_base = df_b.groupby('quarter')['yhat'].sum()
+                    df_b = baseline_data[baseline_data['ds'] > pd.to_datetime('today')]
+                    q_base = df_b.groupby(df_b['ds'].dt.to_period('Q').astype(str))['yhat'].sum()
+
+                for row in yoy_tables['quarterly'].to_dict('records'):
+                    q = row['Periodo']
+                    val_scen = row['Forecast']
+                    line = f"• {q}{' (parziale)' if row['Parziale'] else ''}: {int(val_scen):,}"
 
-                # Loop Forecast Quarters
-                cols_avail = df_curr.columns.tolist()
-                
-                for q in q_curr.index:
-                    val_scen = q_curr[q]
-                    line = f"• {q}: {int(val_scen):,}"
-                    
                     # Components Breakdown (Trend vs Regressors)
-                    mask_q = df_curr['quarter'] == q
-                    rows_q = df_curr[mask_q]
-                    
-                    if not rows_q.empty and 'trend' in cols_avail:
-                        trend_val = rows_q['trend'].sum()
-                        
-                        # Sum Active Regressors
-                        regs_val = 0
-                        if events:
-                            for evt in events:
-                                ename = evt['name']
-                                if ename in cols_avail:
-                                    regs_val += rows_q[ename].sum()
-                        
-                        # Append component info
-                        line += f" [Trend: {int(trend_val):,+}, Regs: {int(regs_val):,+}]"
+                    if q_comp is not None and q in q_comp.index:
+                        line += f" [Trend: {int(q_comp.at[q, 'trend']):+,}, Regs: {int(q_comp.at[q, 'regs']):+,}]"
 
                     # vs Baseline
                     if q in q_base.index:
@@ -188,22 +171,24 @@ def prepare_context_data(gsc_data, events, forecast_data, metrics, config, basel
                         diff_b = val_scen - val_b
                         pct_b = (diff_b / val_b * 100) if val_b else 0
                         line += f" | vs Base: {pct_b:+.1f}%"
-                    
+
                     # vs History (YoY)
-                    prev_q = q - 4
-                    if prev_q in q_hist.index:
-                        val_h = q_hist[prev_q]
-                        diff_h = val_scen - val_h
-                        pct_h = (diff_h / val_h * 100) if val_h else 0
-                        line += f" | YoY: {pct_h:+.1f}% (vs {int(val_h):,})"
-                    
+                    val_h = row['Anno Prec']
+                    if pd.notna(val_h):
+                        line += f" | YoY: {row['Δ %'] * 100:+.1f}% (vs {int(val_h):,})"
+
                     context.append(line)
             except Exception as e:
                 context.append(f"(Errore nel calcolo trimestrale: {str(e)})")
     
     # 5. Metrics
     if metrics:
-        context.append(f"Metriche Accuratezza (Cross-Validation): {json.dumps(metrics, indent=2)}")
+        context.append(f"Metriche Fit (In-Sample, sui dati di training): {json.dumps(metrics, indent=2)}")
+
+    if backtest and backtest.get('summary', {}).get('mape') is not None:
+        bt = backtest['summary']
+        context.append(f"Backtest Rolling-Origin ({bt['folds']} fold, orizzonte {bt['horizon']}gg, out-of-sample): "
+                       f"MAPE {bt['mape']:.2f}%, RMSE {bt['rmse']:.0f}, MAE {bt['mae']:.0f}, Copertura intervallo {bt['coverage']:.0%}")
 
     return "\n".join(context)
 
@@ -215,6 +200,7 @@ def chat_with_assistant(user_input, history, context_data, api_key, model="gpt-4
     if not api_key:
         return "⚠️ Errore: API Key mancante. Aggiungila nelle impostazioni o nel .env."
 
+    from openai import OpenAI # Lazy: loaded only when the assistant is used
     client = OpenAI(api_key=api_key)
     
     # Append File Text to Context if present
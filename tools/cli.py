@@ -0,0 +1,175 @@
+import os
+import sys
+import json
+import argparse
+
+# Headless entry point: python -m tools.cli forecast --gsc export.csv --out-dir out/
+# Heavy modules (pandas, prophet) are imported inside the commands so that
+# `--help` and argument errors return instantly.
+
+OUTPUT_FORMATS = ['csv', 'parquet']
+
+
+def _load_config(args):
+    """Config from --config (JSON file or inline JSON) + explicit flag overrides."""
+    config = {}
+    if args.config:
+        if os.path.exists(args.config):
+            with open(args.config, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        else:
+            config = json.loads(args.config)
+
+    if args.horizon is not None:
+        config['horizon_days'] = args.horizon
+    if args.seasonality_mode:
+        config['seasonality_mode'] = args.seasonality_mode
+    if args.no_cache:
+        config['use_cache'] = False
+    return config
+
+
+def _write_table(df, path_base, fmt):
+    path = f"{path_base}.{fmt}"
+    if fmt == 'parquet':
+        try:
+            df.to_parquet(path, index=False)
+        except ImportError:
+            raise SystemExit("Modulo 'pyarrow' mancante per Parquet. Installa con `pip install pyarrow` o usa --format csv.")
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+
+def cmd_forecast(args):
+    import pandas as pd
+    from tools.ingest_data import load_gsc_csv
+    from tools.run_forecast import execute_forecast
+    from tools.batch_forecast import load_events_file
+
+    config = _load_config(args)
+
+    res_gsc = load_gsc_csv(args.gsc)
+    if res_gsc['status'] == 'error':
+        print(f"Errore GSC: {res_gsc['message']}", file=sys.stderr)
+        return 1
+    if res_gsc['status'] == 'warning':
+        print(f"Attenzione: {res_gsc['message']}", file=sys.stderr)
+    history_df = res_gsc['data']
+
+    events = load_events_file(args.regressors) if args.regressors else []
+
+    results = execute_forecast(history_df, events, config)
+    forecast = results['forecast']
+    metrics = results['metrics']
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    out_cols = args.columns.split(',') if args.columns else ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
+    written = [
+        _write_table(forecast[[c for c in out_cols if c in forecast.columns]],
+                     os.path.join(args.out_dir, 'forecast'), args.format),
+        _write_table(pd.DataFrame([{k: v for k, v in metrics.items() if k != 'monthly_data'}]),
+                     os.path.join(args.out_dir, 'metrics'), args.format),
+        _write_table(pd.DataFrame(metrics.get('monthly_data', [])),
+                     os.path.join(args.out_dir, 'monthly'), args.format)
+    ]
+
+    cache = results['debug_info'].get('cache', {})
+    print(f"Forecast OK: {len(history_df)} giorni storici, {len(events)} eventi, "
+          f"MAPE {metrics['mape']:.2f}% (cache {'hit' if cache.get('hit') else 'miss'})")
+    for path in written:
+        print(f"  -> {path}")
+    return 0
+
+
+def cmd_backtest(args):
+    from tools.ingest_data import load_gsc_csv
+    from tools.backtest import run_backtest
+    from tools.batch_forecast import load_events_file
+
+    config = _load_config(args)
+
+    res_gsc = load_gsc_csv(args.gsc)
+    if res_gsc['status'] == 'error':
+        print(f"Errore GSC: {res_gsc['message']}", file=sys.stderr)
+        return 1
+    history_df = res_gsc['data']
+    events = load_events_file(args.regressors) if args.regressors else []
+
+    res = run_backtest(history_df, events, config, horizon=args.bt_horizon, initial=args.initial,
+                       period=args.period, max_workers=args.workers, bucket_days=args.bucket)
+    summary = res['summary']
+    if summary.get('mape') is None:
+        print("Storico insufficiente per l'orizzonte richiesto.", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    written = [
+        _write_table(res['by_horizon'], os.path.join(args.out_dir, 'backtest_by_horizon'), args.format),
+        _write_table(res['rows'], os.path.join(args.out_dir, 'backtest_folds'), args.format)
+    ]
+    print(f"Backtest OK: {summary['folds']} fold, orizzonte {summary['horizon']}gg, "
+          f"MAPE {summary['mape']:.2f}%, copertura {summary['coverage']:.0%} ({res['timing']['wall_s']:.1f}s)")
+    for path in written:
+        print(f"  -> {path}")
+    return 0
+
+
+def cmd_batch(args):
+    from tools import batch_forecast
+    argv = [args.manifest]
+    if args.workers:
+        argv += ['--workers', str(args.workers)]
+    if args.report:
+        argv += ['--report', args.report]
+    if args.no_save:
+        argv.append('--no-save')
+    return batch_forecast.main(argv)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m tools.cli", description="SEO Forecaster da riga di comando (senza Streamlit).")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_fc = sub.add_parser("forecast", help="Esegue un forecast e salva i risultati")
+    p_fc.add_argument("--gsc", required=True, help="Export GSC (CSV con date, clicks)")
+    p_fc.add_argument("--regressors", default=None, help="File eventi (XLSX Eventi/Template o CSV/XLSX piatto)")
+    p_fc.add_argument("--config", default=None, help="Config JSON (file o stringa inline)")
+    p_fc.add_argument("--horizon", type=int, default=None, help="Orizzonte in giorni (sovrascrive config)")
+    p_fc.add_argument("--seasonality-mode", choices=["multiplicative", "additive"], default=None)
+    p_fc.add_argument("--out-dir", default="forecast_output", help="Cartella di output")
+    p_fc.add_argument("--format", choices=OUTPUT_FORMATS, default="csv")
+    p_fc.add_argument("--columns", default=None, help="Colonne forecast da esportare (es. ds,yhat,trend)")
+    p_fc.add_argument("--no-cache", action="store_true", help="Forza un nuovo fit")
+    p_fc.set_defaults(func=cmd_forecast)
+
+    p_bt = sub.add_parser("backtest", help="Backtest rolling-origin (accuratezza out-of-sample)")
+    p_bt.add_argument("--gsc", required=True, help="Export GSC (CSV con date, clicks)")
+    p_bt.add_argument("--regressors", default=None, help="File eventi (XLSX Eventi/Template o CSV/XLSX piatto)")
+    p_bt.add_argument("--config", default=None, help="Config JSON (file o stringa inline)")
+    p_bt.add_argument("--bt-horizon", type=int, default=30, help="Giorni valutati dopo ogni taglio")
+    p_bt.add_argument("--initial", type=int, default=None, help="Training minimo in giorni (default 3x orizzonte)")
+    p_bt.add_argument("--period", type=int, default=None, help="Passo tra i tagli in giorni (default orizzonte/2)")
+    p_bt.add_argument("--bucket", type=int, default=1, help="Granularità della tabella per orizzonte (giorni)")
+    p_bt.add_argument("--workers", type=int, default=None, help="Processi paralleli (default: CPU)")
+    p_bt.add_argument("--out-dir", default="forecast_output", help="Cartella di output")
+    p_bt.add_argument("--format", choices=OUTPUT_FORMATS, default="csv")
+    p_bt.set_defaults(func=cmd_backtest, horizon=None, seasonality_mode=None, no_cache=False)
+
+    p_b = sub.add_parser("batch", help="Forecast paralleli da manifest (vedi tools.batch_forecast)")
+    p_b.add_argument("manifest")
+    p_b.add_argument("--workers", type=int, default=None)
+    p_b.add_argument("--report", default=None)
+    p_b.add_argument("--no-save", action="store_true")
+    p_b.set_defaults(func=cmd_batch)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
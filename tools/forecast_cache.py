@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+import numpy as np
+
+# On-disk, content-addressed cache of fitted Prophet models.
+# Key = hash(normalized history, fit events, Prophet kwargs, horizon).
+CACHE_DIR = ".forecast_cache"
+CACHE_MAX_BYTES = 512 * 1024 * 1024  # LRU eviction above this size
+CACHE_VERSION = 1
+
+# Hot tier: live (model, baseline forecast) objects, no deserialization needed
+MEMORY_MAX_ENTRIES = 8
+_memory = OrderedDict()
+# The app completes progressive intervals on a worker thread (store_fit) while the
+# script thread reads (load_fit): every _memory and _stats access goes through this lock.
+_memory_lock = threading.Lock()
+
+# Process-wide counters (shown in debug_info)
+_stats = {"hits": 0, "memory_hits": 0, "misses": 0, "evictions": 0}
+
+
+def _count(*names):
+    with _memory_lock:
+        for name in names:
+            _stats[name] += 1
+
+
+def _normalize_history(df):
+    """Returns (ds as int64 seconds, y as float64) sorted by date."""
+    h = df[['ds', 'y']].copy()
+    h['ds'] = pd.to_datetime(h['ds'])
+    h = h.sort_values('ds')
+    ds = h['ds'].values.astype('datetime64[s]').astype(np.int64)
+    y = h['y'].to_numpy(dtype=np.float64)
+    return ds, y
+
+
+def _normalize_event(evt):
+    """Keeps only the fields that influence the regressor vectors."""
+    return {
+        "name": str(evt.get('name')),
+        "date": pd.Timestamp(evt.get('date')).isoformat(),
+        "type": str(evt.get('type')),
+        "duration": int(evt.get('duration', 0)),
+        "impact": float(evt.get('impact', 0.0))
+    }
+
+
+def make_cache_key(history_df, fit_events, prophet_kwargs, horizon, extra=None):
+    """
+    Builds the content hash for a fit.
+    history_df must be in Prophet format ('ds', 'y').
+    extra: any other JSON-serializable setting that changes the fit (e.g. regressor groups).
+    """
+    h = hashlib.sha256()
+    h.update(f"v{CACHE_VERSION}".encode())
+
+    ds, y = _normalize_history(history_df)
+    h.update(ds.tobytes())
+    h.update(y.tobytes())
+
+    payload = {
+        "events": [_normalize_event(e) for e in fit_events],
+        "prophet": prophet_kwargs,
+        "horizon": int(horizon),
+        "extra": extra
+    }
+    h.update(json.dumps(payload, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def make_forecast_id(cache_key, override_events):
+    """
+    Identity of a final forecast: fit key + the future-only overrides applied on top.
+    Stable across reruns, so UI layers can memoize derived tables on it.
+    """
+    h = hashlib.sha256(cache_key.encode())
+    h.update(json.dumps([_normalize_event(e) for e in override_events], sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def _entry_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.pkl")
+
+
+def _remember(key, model, forecast):
+    with _memory_lock:
+        _memory[key] = (model, forecast)
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_MAX_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def load_fit(key):
+    """
+    Returns {'model': Prophet, 'forecast': DataFrame, 'source': 'memory'|'disk'} or None on miss.
+    The returned forecast is a private copy. A disk hit refreshes the entry's mtime
+    (used as LRU clock) and promotes it to the memory tier.
+    """
+    with _memory_lock:
+        hit = _memory.get(key)
+        if hit is not None:
+            _memory.move_to_end(key)
+            _stats["hits"] += 1
+            _stats["memory_hits"] += 1
+    if hit is not None:
+        model, forecast = hit
+        return {"model": model, "forecast": forecast.copy(), "source": "memory"}
+
+    path = _entry_path(key)
+    if not os.path.exists(path):
+        _count("misses")
+        return None
+
+    try:
+        from prophet.serialize import model_from_json
+        with open(path, 'rb') as f:
+            entry = pickle.load(f)
+        if entry.get('version') != CACHE_VERSION:
+            raise ValueError("Versione cache obsoleta")
+        model = model_from_json(entry['model_json'])
+    except Exception:
+        # Corrupted or stale entry: drop it and treat as miss
+        try:
+            os.remove(path)
+        except OSError: pass
+        _count("misses")
+        return None
+
+    try:
+        os.utime(path, None)
+    except OSError: pass
+
+    _remember(key, model, entry['forecast'].copy())
+    _count("hits")
+    return {"model": model, "forecast": entry['forecast'], "source": "disk"}
+
+
+def store_fit(key, model, forecast):
+    """Serializes the fitted model + forecast frame and enforces the size budget."""
+    from prophet.serialize import model_to_json
+    _remember(key, model, forecast.copy())
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    entry = {
+        "version": CACHE_VERSION,
+        "created_at": time.time(),
+        "model_json": model_to_json(model),
+        "forecast": forecast
+    }
+
+    path = _entry_path(key)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)  # Atomic: readers never see partial files
+
+    _evict(CACHE_MAX_BYTES)
+
+
+def _list_entries():
+    if not os.path.exists(CACHE_DIR):
+        return []
+    entries = []
+    for fname in os.listdir(CACHE_DIR):
+        if not fname.endswith('.pkl'):
+            continue
+        path = os.path.join(CACHE_DIR, fname)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    return entries
+
+
+def _evict(max_bytes):
+    """Removes least recently used entries until the cache fits in max_bytes."""
+    entries = sorted(_list_entries())  # Oldest mtime first
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            _count("evictions")
+        except OSError: pass
+
+
+def get_cache_stats():
+    """Counters + current disk footprint."""
+    entries = _list_entries()
+    with _memory_lock:
+        stats = dict(_stats)
+    stats["entries"] = len(entries)
+    stats["size_bytes"] = int(sum(size for _, size, _ in entries))
+    return stats
+
+
+def clear_cache():
+    with _memory_lock:
+        _memory.clear()
+    for _, _, path in _list_entries():
+        try:
+            os.remove(path)
+        except OSError: pass
@@ -1,3 +1,4 @@
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime
@@ -18,9 +19,10 @@ def validate_gsc_data(df):
     except Exception as e:
         return {"status": "error", "message": f"Errore conversione date: {str(e)}"}
     
-    # Aggregate duplicates
+    # Aggregate duplicates (same columns the streaming reader keeps)
     if df['date'].duplicated().any():
-        df = df.groupby('date')['clicks'].sum().reset_index()
+        sum_cols = [c for c in STREAM_SUM_COLUMNS if c in df.columns]
+        df = df.groupby('date')[sum_cols].sum().reset_index()
         
     df = df.sort_values('date')
     
@@ -34,6 +36,73 @@ def validate_gsc_data(df):
         
     return {"status": "success", "data": df}
 
+# Streaming path for bulk exports (one row per date x query/page/country):
+# only date/clicks/impressions are read, in chunks, and reduced to daily sums.
+STREAM_CHUNK_ROWS = 500_000
+STREAM_THRESHOLD_BYTES = 20 * 1024 * 1024  # Smaller files go through the plain reader
+STREAM_SUM_COLUMNS = ['clicks', 'impressions']
+
+def _source_size(source):
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    pos = source.tell()
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    source.seek(pos)
+    return size
+
+def stream_gsc_csv(source, chunksize=STREAM_CHUNK_ROWS):
+    """
+    Reads a GSC CSV (path or binary buffer) chunk by chunk and returns the same
+    result as validate_gsc_data. Peak memory is bounded by one chunk plus the
+    per-day totals, whatever the number of dimension rows.
+    """
+    header = pd.read_csv(source, nrows=0).columns
+    if not isinstance(source, (str, os.PathLike)):
+        source.seek(0)
+
+    missing = [c for c in ['date', 'clicks'] if c not in header]
+    if missing:
+        return {"status": "error", "message": f"Mancano colonne: {', '.join(missing)}"}
+    sum_cols = [c for c in STREAM_SUM_COLUMNS if c in header]
+
+    totals = None
+    reader = pd.read_csv(source, usecols=['date'] + sum_cols, chunksize=chunksize,
+                         dtype={'date': str, **{c: np.float64 for c in sum_cols}})
+    for chunk in reader:
+        partial = chunk.groupby('date', sort=False)[sum_cols].sum()
+        totals = partial if totals is None else totals.add(partial, fill_value=0)
+
+    if totals is None:
+        return {"status": "error", "message": "File vuoto"}
+
+    daily = totals.reset_index()
+    # Dates are parsed once per distinct day, not once per row
+    try:
+        daily['date'] = pd.to_datetime(daily['date'])
+    except Exception as e:
+        return {"status": "error", "message": f"Errore conversione date: {str(e)}"}
+    # Same day written in two formats across chunks
+    if daily['date'].duplicated().any():
+        daily = daily.groupby('date')[sum_cols].sum().reset_index()
+    # Chunks are summed as float64; restore the integer counts the plain reader yields
+    for c in sum_cols:
+        if np.isfinite(daily[c]).all() and (daily[c] % 1 == 0).all():
+            daily[c] = daily[c].astype(np.int64)
+
+    return validate_gsc_data(daily)
+
+def load_gsc_csv(source):
+    """
+    Entry point for GSC files: streaming reader above STREAM_THRESHOLD_BYTES.
+    Both paths keep only date + STREAM_SUM_COLUMNS, so the history columns do not
+    depend on the file size.
+    """
+    if _source_size(source) > STREAM_THRESHOLD_BYTES:
+        return stream_gsc_csv(source)
+    keep = {'date', *STREAM_SUM_COLUMNS}
+    return validate_gsc_data(pd.read_csv(source, usecols=lambda c: c in keep))
+
 def parse_regressors(excel_file):
     """
     Parses Regressor Excel file (both sheets).
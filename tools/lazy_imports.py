@@ -0,0 +1,26 @@
+import sys
+import importlib.util
+
+
+def lazy_module(name):
+    """
+    Returns module `name` without executing it: the real import runs on first
+    attribute access. Keeps heavy optional dependencies (plotly, openai, ...)
+    out of cold start for pages and commands that never use them.
+
+    Note: only the top-level package of a dotted name is imported eagerly
+    (needed to locate the submodule).
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"Modulo '{name}' non trovato. Installa le dipendenze con `pip install -r requirements.txt`.")
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
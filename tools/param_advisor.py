@@ -1,6 +1,10 @@
 
+import time
+import logging
+import itertools
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 
 def analyze_gsc_data_heuristics(df):
     """
@@ -84,3 +88,154 @@ def analyze_gsc_data_heuristics(df):
         suggestions['reasons'].append("Bassa volatilità: Changepoint Scale ridotto a 0.01 per trend più rigido.")
 
     return suggestions
+
+
+# --- AUTO-TUNE (holdout search over Prophet kwargs) ---
+
+# Values tried for each execute_forecast config key (full grid = 60 candidates)
+SEARCH_SPACE = {
+    "seasonality_mode": ["additive", "multiplicative"],
+    "changepoint_prior_scale": [0.001, 0.01, 0.05, 0.1, 0.5],
+    "seasonality_prior_scale": [0.1, 1.0, 10.0],
+    "changepoint_range": [0.8, 0.9]
+}
+
+MIN_TRAIN_DAYS = 90
+
+
+def build_candidates(search_space=None, max_candidates=None, seed=0):
+    """Cartesian grid over search_space, optionally subsampled (deterministically) to max_candidates."""
+    space = search_space or SEARCH_SPACE
+    keys = list(space.keys())
+    grid = [dict(zip(keys, values)) for values in itertools.product(*[space[k] for k in keys])]
+    if max_candidates and len(grid) > max_candidates:
+        idx = np.random.default_rng(seed).choice(len(grid), size=max_candidates, replace=False)
+        grid = [grid[i] for i in sorted(idx)]
+    return grid
+
+
+def _evaluate_candidate(task):
+    """Fits one candidate on the training window and scores it on the holdout. Runs in a worker."""
+    from tools.run_forecast import execute_forecast, calculate_metrics
+
+    stan_logger = logging.getLogger('cmdstanpy')
+    if not stan_logger.handlers:
+        stan_logger.addHandler(logging.NullHandler())
+    stan_logger.setLevel(logging.WARNING)
+
+    t0 = time.perf_counter()
+    out = {"candidate_id": task['candidate_id'], "rung": task['rung'], "train_days": len(task['train'])}
+    try:
+        results = execute_forecast(task['train'], task['events'], task['config'])
+        fc = results['forecast'][['ds', 'yhat']]
+        scored = task['holdout'].rename(columns={'date': 'ds', 'clicks': 'y'})[['ds', 'y']].merge(fc, on='ds')
+        m = calculate_metrics(scored['y'].to_numpy(dtype=float), scored['yhat'].to_numpy(dtype=float))
+        out.update({"status": "ok", "mape": float(m['mape']), "rmse": float(m['rmse'])})
+    except Exception as e:
+        out.update({"status": "error", "mape": np.inf, "rmse": np.inf, "message": str(e)})
+    out["seconds"] = time.perf_counter() - t0
+    return out
+
+
+def auto_tune(history_df, events=None, base_config=None, search_space=None, max_candidates=40,
+              holdout_days=30, method="auto", eta=3, rungs=3, prune_factor=2.0,
+              max_workers=None, on_progress=None):
+    """
+    Searches Prophet settings by holdout error (last `holdout_days` of history).
+
+    method:
+        'grid'    -> every candidate fitted once on the full training window
+        'halving' -> successive halving: all candidates start on the most recent
+                     1/eta^(rungs-1) of the training window, the best 1/eta advance
+                     to a larger window, the last rung uses all of it
+        'auto'    -> halving when the smallest window still covers MIN_TRAIN_DAYS,
+                     grid otherwise (on short histories every fit costs about the same)
+    Candidates scoring worse than prune_factor x the rung's best MAPE (or failing)
+    are dropped early regardless of the halving quota.
+
+    Returns:
+        Dict: {
+            "method": 'grid'|'halving' (resolved),
+            "best": dict (winning config keys, ready for param_suggestions),
+            "best_score": dict (mape, rmse),
+            "trials": df (one row per candidate x rung: params, mape, rmse, seconds, status),
+            "timing": dict (wall_s, fits, fit_s_total)
+        }
+    """
+    base_config = dict(base_config or {})
+    for key in ('warm_start', 'use_cache'):
+        base_config.pop(key, None)
+    events = events or []
+
+    history_df = history_df.sort_values('date')
+    holdout_days = int(min(holdout_days, max(7, len(history_df) // 5)))
+    cutoff = history_df['date'].max() - pd.Timedelta(days=holdout_days)
+    train_full = history_df[history_df['date'] <= cutoff]
+    holdout = history_df[history_df['date'] > cutoff]
+
+    candidates = build_candidates(search_space, max_candidates)
+    if method == "auto":
+        method = "halving" if len(train_full) / eta ** (rungs - 1) >= MIN_TRAIN_DAYS else "grid"
+    if method == "grid":
+        fractions = [1.0]
+    else:
+        fractions = [1.0 / eta ** (rungs - 1 - r) for r in range(rungs)]
+
+    t_start = time.perf_counter()
+    trials = []
+    alive = list(range(len(candidates)))
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for rung, fraction in enumerate(fractions):
+            n_days = max(MIN_TRAIN_DAYS, int(len(train_full) * fraction))
+            train = train_full.tail(n_days)
+            tasks = [{
+                "candidate_id": cid,
+                "rung": rung,
+                "train": train,
+                "holdout": holdout,
+                "events": events,
+                "config": {**base_config, **candidates[cid], "horizon_days": holdout_days, "use_cache": False,
+                           "progressive": False, "impact_samples": 0}
+            } for cid in alive]
+
+            results = list(pool.map(_evaluate_candidate, tasks))
+            trials.extend(results)
+            if on_progress:
+                on_progress(rung, len(fractions), len(results))
+
+            ok = sorted((r for r in results if r['status'] == 'ok'), key=lambda r: r['mape'])
+            if not ok:
+                alive = []
+                break
+            if rung == len(fractions) - 1:
+                alive = [ok[0]['candidate_id']]
+                break
+
+            # Early pruning + halving quota
+            best_mape = ok[0]['mape']
+            keep = max(1, int(np.ceil(len(alive) / eta)))
+            alive = [r['candidate_id'] for r in ok[:keep] if r['mape'] <= best_mape * prune_factor or r is ok[0]]
+
+    trials_df = pd.DataFrame(trials)
+    if not trials_df.empty:
+        params_df = pd.DataFrame([candidates[cid] for cid in trials_df['candidate_id']])
+        trials_df = pd.concat([trials_df, params_df], axis=1)
+
+    best, best_score = None, None
+    if alive:
+        winner = trials_df[(trials_df['candidate_id'] == alive[0]) & (trials_df['rung'] == trials_df['rung'].max())].iloc[0]
+        best = dict(candidates[alive[0]])
+        best_score = {"mape": float(winner['mape']), "rmse": float(winner['rmse'])}
+
+    return {
+        "method": method,
+        "best": best,
+        "best_score": best_score,
+        "trials": trials_df,
+        "timing": {
+            "wall_s": round(time.perf_counter() - t_start, 3),
+            "fits": len(trials),
+            "fit_s_total": round(float(trials_df['seconds'].sum()), 3) if not trials_df.empty else 0.0
+        }
+    }
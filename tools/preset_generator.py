@@ -1,4 +1,7 @@
 
+import time
+import itertools
+import numpy as np
 import pandas as pd
 from datetime import timedelta
 from dateutil.relativedelta import relativedelta
@@ -258,3 +261,109 @@ def generate_prospecting_events(form_data):
             events.append({"name": name, "date": date_obj, "type": tpl['type'], "duration": tpl['duration'], "impact": tpl['impact'], "event_type": "marketing"})
 
     return events
+
+
+# --- BATCH: confronto pacchetti ---
+PACKAGE_COLUMNS = ['Pacchetto', 'Eventi', 'Click', 'Click Incrementali', 'Incremento %']
+
+def _event_key(evt):
+    """Identity of an event for the regressor matrix (name and notes do not change its shape)."""
+    return (pd.Timestamp(evt['date']).value, evt['type'], float(evt['duration']), float(evt['impact']))
+
+def expand_form_variants(base_form, grid):
+    """
+    Cartesian product of form_data variants for generate_prospecting_events.
+
+    Args:
+        base_form: form_data shared by every package (contract_start_date, contract_months, ...)
+        grid: {form key: list of values}, e.g. {'setup_mode': ['none', 'lite', 'full'],
+              'content_enabled': [False, True], 'link_impact_total': [10, 20, 30]}
+
+    Returns: list of (choices dict, form_data dict)
+    """
+    keys = list(grid)
+    # Parse the start date once instead of once per variant
+    base_form = dict(base_form, contract_start_date=pd.Timestamp(base_form['contract_start_date']))
+    return [(dict(zip(keys, combo)), {**base_form, **dict(zip(keys, combo))})
+            for combo in itertools.product(*(grid[k] for k in keys))]
+
+def evaluate_packages(baseline_forecast, variants, start=None, base_events=None):
+    """
+    Ranks prospecting packages by incremental clicks on one shared baseline (no refit).
+    Every package's events are applied as future overrides (as in apply_future_overrides):
+    the distinct events of all packages form one regressor matrix, and each package
+    multiplier is prod(1 + matrix) taken as exp(log|1 + matrix| @ membership), a single
+    matmul for all packages; sign and zero factors (impact <= -1) are counted separately so
+    the result matches the engine's product exactly.
+    Packages producing the same event list (e.g. content off at any content impact) are
+    evaluated once.
+
+    Args:
+        baseline_forecast: stage-1 forecast (ds, yhat)
+        variants: expand_form_variants output
+        start: only days after `start` are totalled (e.g. last history date)
+        base_events: events applied to every package and to the reference (e.g. current future events)
+
+    Returns:
+        Dict: {"table": df (choices + PACKAGE_COLUMNS, best first), "reference": float,
+               "n_variants": int, "n_packages": int, "timing": {"generate_s", "evaluate_s"}}
+    """
+    from tools.regressor_logic import build_regressor_matrix
+
+    t0 = time.perf_counter()
+    columns = {}
+    packages = []
+    seen = set()
+    for choices, form in variants:
+        events = generate_prospecting_events(form)
+        keys = [_event_key(e) for e in events]
+        signature = tuple(sorted(keys))
+        if signature in seen:
+            continue
+        seen.add(signature)
+        for evt, key in zip(events, keys):
+            columns.setdefault(key, evt)
+        packages.append((choices, keys))
+    t_generate = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    fc = baseline_forecast if start is None else baseline_forecast[baseline_forecast['ds'] > start]
+    yhat = fc['yhat'].to_numpy(dtype=np.float64)
+    fixed, _ = build_regressor_matrix(fc['ds'], base_events or [])
+    weighted = yhat * np.prod(1.0 + fixed, axis=1)
+    reference = float(weighted.sum())
+
+    col_index = {key: j for j, key in enumerate(columns)}
+    membership = np.zeros((len(columns), len(packages)))
+    for p, (_, keys) in enumerate(packages):
+        for key in keys:
+            membership[col_index[key], p] += 1 # The same event twice compounds, as in the engine
+
+    matrix, _ = build_regressor_matrix(fc['ds'], list(columns.values()))
+    factors = 1.0 + matrix
+    zero = factors == 0
+    negatives = (factors < 0).astype(np.float64) @ membership
+    log_abs = np.log(np.abs(np.where(zero, 1.0, factors)))
+    multipliers = np.exp(log_abs @ membership)
+    multipliers[negatives % 2 == 1] *= -1.0
+    multipliers[zero.astype(np.float64) @ membership > 0] = 0.0
+    totals = weighted @ multipliers
+    t_evaluate = time.perf_counter() - t0
+
+    table = pd.DataFrame([choices for choices, _ in packages])
+    # Label with the options that actually vary across the grid
+    varying = [k for k in table.columns if table[k].astype(str).nunique() > 1] or list(table.columns)
+    table.insert(0, 'Pacchetto', [" · ".join(f"{k}={choices[k]}" for k in varying) for choices, _ in packages])
+    table['Eventi'] = [len(keys) for _, keys in packages]
+    table['Click'] = totals
+    table['Click Incrementali'] = totals - reference
+    table['Incremento %'] = table['Click Incrementali'] / reference * 100 if reference else np.nan
+    table = table.sort_values('Click Incrementali', ascending=False, ignore_index=True)
+
+    return {
+        "table": table,
+        "reference": reference,
+        "n_variants": len(variants),
+        "n_packages": len(packages),
+        "timing": {"generate_s": round(t_generate, 4), "evaluate_s": round(t_evaluate, 4)}
+    }
@@ -1,10 +1,18 @@
 import os
 import json
+import sqlite3
 import pandas as pd
+import numpy as np
 import shutil
+import threading
 
 PROJECTS_DIR = "user_projects"
 
+# Scenario files: one structured NumPy array per scenario, read memory-mapped
+SCENARIO_EXT = ".npy"
+SCENARIO_VALUE_COLUMNS = ['yhat', 'yhat_lower', 'yhat_upper']
+SCENARIO_DTYPE = np.dtype([('ds', np.int32)] + [(c, np.float32) for c in SCENARIO_VALUE_COLUMNS])
+
 def ensure_projects_dir():
     if not os.path.exists(PROJECTS_DIR):
         os.makedirs(PROJECTS_DIR)
@@ -25,6 +33,91 @@ def create_new_project(name):
     os.makedirs(path)
     return True, safe_name
 
+# --- SCENARIO CATALOG ---
+# One SQLite file per project (WAL mode: readers never block the single writer).
+# Replaces index.json, which is imported once and renamed to index.json.migrated.
+CATALOG_FILE = "catalog.sqlite"
+SCENARIO_SORT_COLUMNS = ['created_at', 'name', 'total_clicks', 'events_count']
+
+_CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    file TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    total_clicks REAL NOT NULL DEFAULT 0,
+    events_count INTEGER NOT NULL DEFAULT 0,
+    events_summary TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS idx_scenarios_created_at ON scenarios (created_at);
+CREATE INDEX IF NOT EXISTS idx_scenarios_name ON scenarios (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_scenarios_total_clicks ON scenarios (total_clicks);
+CREATE INDEX IF NOT EXISTS idx_scenarios_events_count ON scenarios (events_count);
+"""
+
+class _Catalog:
+    """Context manager: one connection per call, committed on success, always closed."""
+    def __init__(self, project_name):
+        self.path = os.path.join(PROJECTS_DIR, project_name, CATALOG_FILE)
+        self.project_name = project_name
+
+    def __enter__(self):
+        is_new = not os.path.exists(self.path)
+        self.conn = sqlite3.connect(self.path, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        if is_new:
+            self.conn.executescript(_CATALOG_SCHEMA)
+            _migrate_index_json(self.conn, self.project_name)
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.conn.close()
+        return False
+
+def _catalog(project_name):
+    return _Catalog(project_name)
+
+def _migrate_index_json(conn, project_name):
+    """Imports a legacy index.json into a freshly created catalog."""
+    index_path = os.path.join(PROJECTS_DIR, project_name, "index.json")
+    if not os.path.exists(index_path):
+        return
+    try:
+        with open(index_path, 'r') as f:
+            entries = json.load(f)
+    except Exception:
+        return
+    conn.executemany(
+        "INSERT OR IGNORE INTO scenarios (id, name, file, created_at, total_clicks, events_count, events_summary) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(e['id'], e.get('name', e['id']), e['file'], e.get('created_at', ''),
+          float(e.get('total_clicks', 0) or 0), int(e.get('events_count', 0) or 0),
+          json.dumps(e.get('events_summary', []))) for e in entries if 'id' in e and 'file' in e]
+    )
+    conn.commit()
+    try:
+        os.replace(index_path, index_path + ".migrated")
+    except OSError:
+        pass  # Another session migrated it first
+
+def _row_to_scenario(row):
+    return {
+        "id": row[0],
+        "name": row[1],
+        "file": row[2],
+        "created_at": row[3],
+        "total_clicks": row[4],
+        "events_count": row[5],
+        "events_summary": json.loads(row[6])
+    }
+
 def save_scenario(project_name, scenario_name, forecast_df, events, metrics_dict):
     """Saves a scenario to the project folder."""
     project_path = os.path.join(PROJECTS_DIR, project_name)
@@ -36,27 +129,6 @@ def save_scenario(project_name, scenario_name, forecast_df, events, metrics_dict
     safe_scen_name = "".join([c for c in scenario_name if c.isalnum() or c in (' ', '_', '-')]).strip()
     if not safe_scen_name: safe_scen_name = "scenario"
     
-    file_id = f"{ts}_{safe_scen_name}"
-    csv_filename = f"{file_id}.csv"
-    
-    # Save Forecast Data (Lite version)
-    # We save ds, yhat, and maybe yhat_lower/upper
-    save_cols = ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
-    # Ensure they exist
-    valid_cols = [c for c in save_cols if c in forecast_df.columns]
-    
-    csv_path = os.path.join(project_path, csv_filename)
-    forecast_df[valid_cols].to_csv(csv_path, index=False)
-    
-    # Load/Update Index
-    index_path = os.path.join(project_path, "index.json")
-    scenarios = []
-    if os.path.exists(index_path):
-        try:
-            with open(index_path, 'r') as f:
-                scenarios = json.load(f)
-        except: pass
-        
     # Extract total clicks from metrics or dataframe future sum
     total_clicks = 0
     if metrics_dict and 'forecast_total' in metrics_dict:
@@ -66,63 +138,301 @@ def save_scenario(project_name, scenario_name, forecast_df, events, metrics_dict
         future_mask = forecast_df['ds'] > pd.Timestamp.now()
         total_clicks = forecast_df.loc[future_mask, 'yhat'].sum()
 
+    base_id = f"{ts}_{safe_scen_name}"
     new_entry = {
-        "id": file_id,
         "name": scenario_name,
-        "file": csv_filename,
         "created_at": ts,
         "total_clicks": float(total_clicks),
         "events_count": len(events),
-        "events_summary": [e['name'] for e in events]
+        "events_summary": json.dumps([e['name'] for e in events])
     }
-    
-    scenarios.append(new_entry)
-    
-    with open(index_path, 'w') as f:
-        json.dump(scenarios, f, indent=2)
+
+    # The INSERT reserves the id (same name saved twice within a second gets a suffix);
+    # the file is written inside the same transaction, so a failed write leaves no entry.
+    with _catalog(project_name) as conn:
+        for n in range(1, 1000):
+            file_id = base_id if n == 1 else f"{base_id}_{n}"
+            scen_filename = f"{file_id}{SCENARIO_EXT}"
+            try:
+                conn.execute(
+                    "INSERT INTO scenarios (id, name, file, created_at, total_clicks, events_count, events_summary) "
+                    "VALUES (:id, :name, :file, :created_at, :total_clicks, :events_count, :events_summary)",
+                    {**new_entry, "id": file_id, "file": scen_filename}
+                )
+                break
+            except sqlite3.IntegrityError:
+                continue
+
+        # Save Forecast Data (Lite version: ds, yhat, yhat_lower/upper)
+        _write_scenario_array(os.path.join(project_path, scen_filename), forecast_df)
         
     return True, "Scenario salvato correttamente"
 
-def load_scenarios(project_name):
-    project_path = os.path.join(PROJECTS_DIR, project_name)
-    index_path = os.path.join(project_path, "index.json")
-    if not os.path.exists(index_path):
+def load_scenarios(project_name, order_by="created_at", descending=True, name_contains=None,
+                   created_from=None, created_to=None, min_clicks=None, max_clicks=None,
+                   min_events=None, max_events=None, limit=None, offset=0):
+    """
+    Lists scenarios from the project catalog (newest first by default).
+
+    Filters run in SQLite on indexed columns, so large projects never load the full list:
+        name_contains: case-insensitive substring of the scenario name
+        created_from / created_to: 'YYYYMMDD_HHMMSS' (or any prefix, e.g. '202501')
+        min_clicks / max_clicks, min_events / max_events: inclusive bounds
+        order_by: one of SCENARIO_SORT_COLUMNS; limit / offset for paging
+    """
+    if not os.path.exists(os.path.join(PROJECTS_DIR, project_name)):
         return []
+    if order_by not in SCENARIO_SORT_COLUMNS:
+        raise ValueError(f"order_by non valido: {order_by}")
+
+    where, params = [], {}
+    if name_contains:
+        where.append("name LIKE :name ESCAPE '\\'")
+        params['name'] = "%" + name_contains.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + "%"
+    if created_from:
+        where.append("created_at >= :created_from")
+        params['created_from'] = created_from
+    if created_to:
+        where.append("created_at <= :created_to")
+        params['created_to'] = created_to + "\uffff"  # Prefix match is inclusive
+    for col, op, value in [("total_clicks", ">=", min_clicks), ("total_clicks", "<=", max_clicks),
+                           ("events_count", ">=", min_events), ("events_count", "<=", max_events)]:
+        if value is not None:
+            key = f"{col}_{'min' if op == '>=' else 'max'}"
+            where.append(f"{col} {op} :{key}")
+            params[key] = value
+
+    sql = "SELECT id, name, file, created_at, total_clicks, events_count, events_summary FROM scenarios"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {order_by} {'DESC' if descending else 'ASC'}, id {'DESC' if descending else 'ASC'}"
+    if limit is not None:
+        sql += " LIMIT :limit OFFSET :offset"
+        params.update(limit=int(limit), offset=int(offset))
+
     try:
-        with open(index_path, 'r') as f:
-            data = json.load(f)
-            # Sort by date desc
-            return sorted(data, key=lambda x: x['created_at'], reverse=True)
-    except:
+        with _catalog(project_name) as conn:
+            rows = conn.execute(sql, params).fetchall()
+    except sqlite3.Error:
         return []
+    return [_row_to_scenario(r) for r in rows]
 
-def load_scenario_df(project_name, filename):
+def count_scenarios(project_name):
+    if not os.path.exists(os.path.join(PROJECTS_DIR, project_name)):
+        return 0
+    with _catalog(project_name) as conn:
+        return conn.execute("SELECT COUNT(*) FROM scenarios").fetchone()[0]
+
+def _write_scenario_array(path, forecast_df):
+    """Scenario as one structured .npy: int32 day numbers + float32 values (missing columns = NaN)."""
+    arr = np.empty(len(forecast_df), dtype=SCENARIO_DTYPE)
+    arr['ds'] = pd.to_datetime(forecast_df['ds']).values.astype('datetime64[D]').astype(np.int32)
+    for col in SCENARIO_VALUE_COLUMNS:
+        arr[col] = forecast_df[col].to_numpy(dtype=np.float32) if col in forecast_df.columns else np.nan
+    # Per process/thread temp name: concurrent writers (e.g. two sessions migrating
+    # the same legacy CSV) never replace or remove each other's temp file
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npy"
+    try:
+        np.save(tmp_path, arr)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _resolve_scenario_path(project_name, filename):
+    """
+    Path of the stored scenario. Legacy CSV scenarios are converted to .npy on first
+    access (the index keeps its original file name; the .npy sibling is used from then on).
+    """
     path = os.path.join(PROJECTS_DIR, project_name, filename)
-    if os.path.exists(path):
+    stem, ext = os.path.splitext(path)
+    if ext != '.csv':
+        return path
+
+    npy_path = stem + SCENARIO_EXT
+    if not os.path.exists(npy_path) and os.path.exists(path):
+        try:
+            legacy = pd.read_csv(path)
+            _write_scenario_array(npy_path, legacy)
+            os.remove(path)
+        except Exception:
+            # Another caller may have converted (and removed) the CSV meanwhile
+            if os.path.exists(npy_path) or not os.path.exists(path):
+                return npy_path
+            return path  # Unreadable/locked: keep serving the CSV
+    return npy_path
+
+def load_scenario_array(project_name, filename):
+    """
+    Memory-mapped structured array (fields: ds as days since epoch, yhat, yhat_lower, yhat_upper),
+    or None. A legacy CSV that could not be converted is read into an in-memory array instead.
+    """
+    path = _resolve_scenario_path(project_name, filename)
+    if not os.path.exists(path):
+        return None
+    if path.endswith('.csv'):
+        return _scenario_array(pd.read_csv(path))
+    return np.load(path, mmap_mode='r')
+
+def load_scenario_df(project_name, filename):
+    path = _resolve_scenario_path(project_name, filename)
+    if not os.path.exists(path):
+        return None
+    if path.endswith('.csv'):
         df = pd.read_csv(path)
         if 'ds' in df.columns:
             df['ds'] = pd.to_datetime(df['ds'])
         return df
-    return None
+
+    arr = np.load(path)  # Copied into the DataFrame anyway: plain read beats mmap here
+    data = {'ds': arr['ds'].astype('datetime64[D]').astype('datetime64[ns]')}
+    for col in SCENARIO_VALUE_COLUMNS:
+        if not np.isnan(arr[col]).all():  # Column absent at save time
+            data[col] = arr[col]
+    return pd.DataFrame(data)
+
+def get_scenario_mtime(project_name, filename):
+    """Last modification time of a scenario file (None if missing). Used as cache version."""
+    path = _resolve_scenario_path(project_name, filename)
+    return os.path.getmtime(path) if os.path.exists(path) else None
 
 def delete_scenario(project_name, scenario_id):
     project_path = os.path.join(PROJECTS_DIR, project_name)
-    index_path = os.path.join(project_path, "index.json")
-    
-    scenarios = load_scenarios(project_name)
-    target = next((s for s in scenarios if s['id'] == scenario_id), None)
-    
-    if target:
-        # Remove file
-        csv_path = os.path.join(project_path, target['file'])
-        if os.path.exists(csv_path):
+    if not os.path.exists(project_path):
+        return False
+
+    with _catalog(project_name) as conn:
+        row = conn.execute("SELECT file FROM scenarios WHERE id = ?", (scenario_id,)).fetchone()
+        if row is None:
+            return False
+        conn.execute("DELETE FROM scenarios WHERE id = ?", (scenario_id,))
+
+    # Remove file (legacy CSV and/or its converted .npy)
+    legacy_path = os.path.join(project_path, row[0])
+    for path in {legacy_path, os.path.splitext(legacy_path)[0] + SCENARIO_EXT}:
+        if os.path.exists(path):
             try:
-                os.remove(csv_path)
+                os.remove(path)
             except: pass
-            
-        # Update Index
-        new_list = [s for s in scenarios if s['id'] != scenario_id]
-        with open(index_path, 'w') as f:
-            json.dump(new_list, f, indent=2)
-        return True
-    return False
+    return True
+
+def save_fit_params(project_name, warm_start):
+    """Stores the last fitted Prophet parameters (execute_forecast 'warm_start' payload)."""
+    project_path = os.path.join(PROJECTS_DIR, project_name)
+    if not os.path.exists(project_path):
+        return False
+    path = os.path.join(project_path, "fit_params.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(warm_start, f)
+    os.replace(tmp_path, path)
+    return True
+
+def load_fit_params(project_name):
+    """Last fitted parameters for the project, or None (cold fit)."""
+    path = os.path.join(PROJECTS_DIR, project_name, "fit_params.json")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except:
+        return None
+
+# --- HISTORY STORE ---
+# Canonical daily GSC history per project, kept as NumPy columns in history.npz:
+# 'date' as int32 days since 1970-01-01, counts as int64 (as load_gsc_csv yields them,
+# so digests and cache keys match a fresh upload), other metrics as float64. GSC exports
+# cap at 16 months, so successive uploads are merged here into a multi-year series.
+HISTORY_FILE = "history.npz"
+HISTORY_COLUMNS = ['clicks', 'impressions', 'ctr', 'position']
+HISTORY_COUNT_COLUMNS = ['clicks', 'impressions']
+# Unit of dates parsed from an upload (ns on pandas 2, us on pandas 3); stored days are restored with it
+_PARSED_DATE_DTYPE = pd.to_datetime(pd.Series(['1970-01-01'])).dtype
+HISTORY_REFRESH_DAYS = 3  # GSC keeps revising the most recent days
+
+def _history_path(project_name):
+    return os.path.join(PROJECTS_DIR, project_name, HISTORY_FILE)
+
+def _history_values(values, col):
+    """float64 column, or int64 for whole-number counts (float stores written before are cast back too)."""
+    values = np.asarray(values, dtype=np.float64)
+    if col in HISTORY_COUNT_COLUMNS and np.isfinite(values).all() and (values % 1 == 0).all():
+        return values.astype(np.int64)
+    return values
+
+def _history_to_arrays(df):
+    days = df['date'].values.astype('datetime64[D]').astype(np.int32)
+    arrays = {'date': days}
+    for col in HISTORY_COLUMNS:
+        if col in df.columns:
+            arrays[col] = _history_values(pd.to_numeric(df[col], errors='coerce'), col)
+    return arrays
+
+def load_history(project_name):
+    """Stored daily history as a DataFrame (date, clicks, ...), or None if the project has none."""
+    path = _history_path(project_name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            df = pd.DataFrame({col: _history_values(data[col], col) for col in data.files if col != 'date'})
+            df.insert(0, 'date', pd.to_datetime(data['date'].astype('datetime64[D]')).astype(_PARSED_DATE_DTYPE))
+        return df
+    except Exception:
+        return None
+
+def get_history_mtime(project_name):
+    """Modification time of the history store (None if missing). Used as cache version."""
+    path = _history_path(project_name)
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+def merge_history(project_name, new_df, refresh_days=HISTORY_REFRESH_DAYS):
+    """
+    Merges a validated GSC export (date, clicks, ...) into the project's history.
+
+    Stored days are kept as they are, except the last `refresh_days`, which the
+    new export overwrites (GSC data for the latest days is still incomplete).
+    Days after the stored max, and days before the stored min (older exports), are added.
+
+    Returns:
+        (merged DataFrame, stats dict: added, updated, total, start, end)
+    """
+    project_path = os.path.join(PROJECTS_DIR, project_name)
+    if not os.path.exists(project_path):
+        raise ValueError("Progetto non trovato")
+
+    new_df = new_df.sort_values('date')
+    stored = load_history(project_name)
+
+    if stored is None or stored.empty:
+        merged = new_df[['date'] + [c for c in HISTORY_COLUMNS if c in new_df.columns]].reset_index(drop=True)
+        added, updated = len(merged), 0
+    else:
+        stored_min = stored['date'].min()
+        refresh_from = stored['date'].max() - pd.Timedelta(days=refresh_days - 1)
+        take = new_df[(new_df['date'] >= refresh_from) | (new_df['date'] < stored_min)]
+        keep = stored[~stored['date'].isin(take['date'])]
+        updated = len(stored) - len(keep)
+        added = len(take) - updated
+
+        merged = pd.concat([keep, take[[c for c in ['date'] + HISTORY_COLUMNS if c in take.columns]]],
+                           ignore_index=True).sort_values('date').reset_index(drop=True)
+        merged = merged[['date'] + [c for c in HISTORY_COLUMNS if c in merged.columns]]
+
+    arrays = _history_to_arrays(merged)
+    path = _history_path(project_name)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+    # Same dtypes as load_history returns
+    merged = merged.assign(**{col: arrays[col] for col in arrays if col != 'date'})
+
+    stats = {
+        "added": int(added),
+        "updated": int(updated),
+        "total": int(len(merged)),
+        "start": merged['date'].min().date().isoformat() if not merged.empty else None,
+        "end": merged['date'].max().date().isoformat() if not merged.empty else None
+    }
+    return merged, stats
@@ -1,78 +1,141 @@
 import numpy as np
 import pandas as pd
 
-def apply_regressors(df, events):
+REGRESSOR_TYPES = ['window', 'decay', 'step', 'ramp']
+
+def regressor_column_name(i, event):
+    """Sanitized column name for the i-th event (e.g. 'reg_0_core_update')."""
+    col_name = f"reg_{i}_{event['name'].lower().replace(' ', '_')}"
+    return "".join(c for c in col_name if c.isalnum() or c == '_') # Sanitize
+
+def build_regressor_matrix(ds, events):
     """
-    Applies regressor logic to the DataFrame.
-    Adds columns for each valid event.
-    Returns: DataFrame with added columns, List of column names added
+    Builds the full (rows x events) regressor matrix with NumPy broadcasting.
+    Dates are converted once to int64 day numbers; each regressor type is then
+    computed for all of its events in a single vectorized pass.
+    
+    Formulas (t = days since event start):
+        window: impact for t in [0, duration]
+        decay:  impact * exp(-t / (duration / 3)) for t in [0, duration]
+        step:   impact for t >= 0 (permanent)
+        ramp:   (t / duration) * impact for t in [0, duration), then impact
+    
+    Returns: (np.ndarray float64 [rows, events], list of column names)
     """
-    df = df.copy()
-    added_columns = []
+    days = pd.to_datetime(pd.Series(ds)).values.astype('datetime64[D]').astype(np.int64)
+    matrix = np.zeros((len(days), len(events)), dtype=np.float64)
+    col_names = [regressor_column_name(i, e) for i, e in enumerate(events)]
     
-    # Ensure dates are datetime
-    df['ds'] = pd.to_datetime(df['ds'])
+    if not events:
+        return matrix, col_names
     
-    for i, event in enumerate(events):
-        col_name = f"reg_{i}_{event['name'].lower().replace(' ', '_')}"
-        col_name = "".join(c for c in col_name if c.isalnum() or c == '_') # Sanitize
-        
-        # Initialize zero column
-        df[col_name] = 0.0
-        
-        event_start = event['date']
-        duration = event['duration']
-        impact = event['impact']
-        reg_type = event['type']
-        
-        # Mask for the relevant period
-        # Note: We need to handle the logic row by row or vectorized.
-        # Vectorized is faster.
+    starts = pd.to_datetime([e['date'] for e in events]).values.astype('datetime64[D]').astype(np.int64)
+    durations = np.array([e['duration'] for e in events], dtype=np.float64)
+    impacts = np.array([e['impact'] for e in events], dtype=np.float64)
+    types = np.array([e['type'] for e in events])
+    
+    for reg_type in REGRESSOR_TYPES:
+        idx = np.flatnonzero(types == reg_type)
+        if idx.size == 0:
+            continue
         
-        # Calculate days since event start
-        # (This will be negative for dates before event)
-        days_since = (df['ds'] - event_start).dt.days
+        # (rows x events_of_this_type); negative before the event start
+        t = (days[:, None] - starts[None, idx]).astype(np.float64)
+        dur = durations[idx]
+        imp = impacts[idx]
+        started = t >= 0
         
         if reg_type == 'window':
-            # Impact is constant [0, duration]
-            mask = (days_since >= 0) & (days_since <= duration)
-            df.loc[mask, col_name] = impact
+            block = np.where(started & (t <= dur), imp, 0.0)
             
         elif reg_type == 'decay':
-            # Formula: impact * exp(-t / (duration / 3))
-            # Only valid for t in [0, duration]
-            mask = (days_since >= 0) & (days_since <= duration)
-            
             # Avoid division by zero if duration is 0 (though unlikely)
-            tau = duration / 3.0 if duration > 0 else 1.0
+            tau = np.where(dur > 0, dur / 3.0, 1.0)
+            active = started & (t <= dur)
+            block = np.where(active, imp * np.exp(-np.where(active, t, 0.0) / tau), 0.0)
             
-            decay_values = impact * np.exp(-days_since[mask] / tau)
-            df.loc[mask, col_name] = decay_values
-
         elif reg_type == 'step':
-            # Impact is constant from Start DATE until FOREVER (or end of dataframe)
-            # Useful for site migrations, permanent penalties, or structural changes.
-            mask = (days_since >= 0)
-            df.loc[mask, col_name] = impact
-
-        elif reg_type == 'ramp':
-            # Linear growth from 0 to Impact over 'Duration' days.
-            # Then stays at Impact level? Or drops?
-            # Usually "Ramp up to effect". Let's assume it stays at impact after duration (like a slow Step).
+            # Impact from start date until the end of the frame
+            block = np.where(started, imp, 0.0)
             
-            # Period 1: Growth [0, duration]
-            mask_ramp = (days_since >= 0) & (days_since < duration)
-            if duration > 0:
-                # Linear: (t / duration) * impact
-                df.loc[mask_ramp, col_name] = (days_since[mask_ramp] / duration) * impact
-            
-            # Period 2: Plateau [duration, infinity]
-            mask_plateau = (days_since >= duration)
-            df.loc[mask_plateau, col_name] = impact
-            
-        added_columns.append(col_name)
+        else: # ramp
+            # Linear growth over [0, duration), then plateau at impact
+            safe_dur = np.where(dur > 0, dur, 1.0)
+            ramp_vals = np.where(t < dur, (t / safe_dur) * imp, imp)
+            block = np.where(started, ramp_vals, 0.0)
+        
+        matrix[:, idx] = block
         
-    return df, added_columns
+    return matrix, col_names
+
+def _attach_columns(df, ds, matrix, col_names):
+    """Attaches the regressor matrix to df in one concat (replacing stale columns)."""
+    base = df.drop(columns=[c for c in col_names if c in df.columns])
+    base['ds'] = ds
+    
+    reg_df = pd.DataFrame(matrix, columns=col_names, index=df.index)
+    return pd.concat([base, reg_df], axis=1)
+
+def apply_regressors(df, events):
+    """
+    Applies regressor logic to the DataFrame.
+    Adds columns for each valid event (built by build_regressor_matrix, attached in one concat).
+    Returns: DataFrame with added columns, List of column names added
+    """
+    # Ensure dates are datetime
+    ds = pd.to_datetime(df['ds'])
+    matrix, added_columns = build_regressor_matrix(ds, events)
+    return _attach_columns(df, ds, matrix, added_columns), added_columns
+
+GROUPING_MODES = ['none', 'event_type', 'custom']
+
+def event_group_keys(events, grouping='none', custom_groups=None):
+    """
+    Returns the regressor group of each event, or None when grouping is disabled.
+    
+    - 'event_type': content, technical, offpage, marketing, local, ... ('manual' if missing)
+    - 'custom': custom_groups[name] (or the event's own 'group' field), falling back to event_type
+    """
+    if grouping not in ('event_type', 'custom'):
+        return None
+    
+    custom_groups = custom_groups or {}
+    keys = []
+    for evt in events:
+        key = None
+        if grouping == 'custom':
+            key = custom_groups.get(evt.get('name')) or evt.get('group')
+        if not key or pd.isna(key):
+            key = evt.get('event_type')
+        if not key or pd.isna(key):
+            key = 'manual'
+        keys.append(str(key))
+    return keys
+
+def group_column_name(group):
+    col_name = f"grp_{str(group).lower().replace(' ', '_')}"
+    return "".join(c for c in col_name if c.isalnum() or c == '_') # Sanitize
+
+def group_membership(group_keys):
+    """Returns (ordered unique groups, events x groups 0/1 matrix)."""
+    groups = list(dict.fromkeys(group_keys))
+    membership = np.zeros((len(group_keys), len(groups)), dtype=np.float64)
+    if group_keys:
+        membership[np.arange(len(group_keys)), [groups.index(g) for g in group_keys]] = 1.0
+    return groups, membership
+
+def apply_grouped_regressors(df, events, group_keys):
+    """
+    Like apply_regressors, but sums the shaped vectors of events sharing a group
+    into a single 'grp_<group>' column (one Prophet coefficient per group).
+    Returns: DataFrame with added columns, List of column names added
+    """
+    ds = pd.to_datetime(df['ds'])
+    matrix, _ = build_regressor_matrix(ds, events)
+    groups, membership = group_membership(group_keys)
+    
+    added_columns = [group_column_name(g) for g in groups]
+    return _attach_columns(df, ds, matrix @ membership, added_columns), added_columns
 
 def parse_regressors(file_obj):
     """
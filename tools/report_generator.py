@@ -1,5 +1,4 @@
 import os
-from openai import OpenAI
 
 
 def get_openai_client(api_key=None):
@@ -11,14 +10,16 @@ def get_openai_client(api_key=None):
         return None, "OpenAI API Key mancante. Inseriscila nelle impostazioni."
         
     try:
+        from openai import OpenAI # Lazy: loaded only when an AI feature is used
         client = OpenAI(api_key=api_key)
         return client, None
     except Exception as e:
         return None, str(e)
 
-def generate_marketing_report(metrics, events, horizon, forecast_df=None, api_key=None, model="gpt-5.1", system_instruction=None):
+def generate_marketing_report(metrics, events, horizon, forecast_df=None, api_key=None, model="gpt-5.1", system_instruction=None, yoy_tables=None):
     """
     Generates a marketing report using the specified model and system instruction.
+    yoy_tables: optional scenario_analysis.calculate_yoy_tables result (quarterly YoY added to the context).
     """
     client, error = get_openai_client(api_key)
     if not client:
@@ -39,6 +40,16 @@ def generate_marketing_report(metrics, events, horizon, forecast_df=None, api_ke
          else:
              trend_txt = "Dati insufficienti per trend."
 
+    yoy_txt = ""
+    if yoy_tables is not None:
+        lines = []
+        for row in yoy_tables['quarterly'].to_dict('records'):
+            line = f"    - {row['Periodo']}{' (parziale)' if row['Parziale'] else ''}: {row['Forecast']:.0f} click"
+            if row['Anno Prec'] == row['Anno Prec']:  # not NaN: previous year available
+                line += f", YoY {row['Δ %']:+.1%} (anno prec. {row['Anno Prec']:.0f})"
+            lines.append(line)
+        yoy_txt = "VARIAZIONE YOY TRIMESTRALE:\n" + "\n".join(lines)
+
     # Data Context Block
     data_context = f"""
     DATI FORECAST (Orizzonte {horizon} giorni):
@@ -50,6 +61,8 @@ def generate_marketing_report(metrics, events, horizon, forecast_df=None, api_ke
     
     {trend_txt}
     
+    {yoy_txt}
+    
     EVENTI/SCENARI INCLUSI NEL CALCOLO:
     {events_summary}
     """
@@ -1,12 +1,17 @@
+import copy
+import time
+from statistics import NormalDist
 import pandas as pd
 import numpy as np
-from prophet import Prophet
-from tools.regressor_logic import apply_regressors
-
-from prophet.utilities import regressor_coefficients
+from tools.regressor_logic import apply_regressors, apply_grouped_regressors, build_regressor_matrix, event_group_keys, group_membership, group_column_name
+from tools import forecast_cache
 
 def calculate_metrics(y_true, y_pred):
-    """Calculates MAPE, RMSE, MAE using numpy."""
+    """
+    Calculates MAPE, RMSE, MAE using numpy.
+    Called by execute_forecast on the training window (in-sample fit);
+    out-of-sample accuracy comes from tools.backtest.
+    """
     # Remove NaNs
     mask = ~np.isnan(y_true) & ~np.isnan(y_pred)
     y_true = y_true[mask]
@@ -29,6 +34,512 @@ def calculate_metrics(y_true, y_pred):
     
     return {"mape": mape, "rmse": rmse, "mae": mae}
 
+def add_fit_regressors(df, events_to_fit, group_keys=None):
+    """One column per event, or one per group when group_keys is given."""
+    if group_keys is None:
+        return apply_regressors(df, events_to_fit)
+    return apply_grouped_regressors(df, events_to_fit, group_keys)
+
+def structure_signature(prophet_kwargs, reg_columns):
+    """Model layout that fixes the shape/meaning of beta: seasonality settings + regressor set."""
+    return {
+        "seasonality_mode": prophet_kwargs.get('seasonality_mode'),
+        "yearly_seasonality": str(prophet_kwargs.get('yearly_seasonality')),
+        "weekly_seasonality": str(prophet_kwargs.get('weekly_seasonality')),
+        "daily_seasonality": str(prophet_kwargs.get('daily_seasonality')),
+        "regressors": list(reg_columns)
+    }
+
+def extract_fit_params(m):
+    """Optimized Stan parameters (MAP fit) as plain lists, reusable as init for the next fit."""
+    params = {}
+    for name in ['k', 'm', 'sigma_obs']:
+        params[name] = float(m.params[name][0][0])
+    for name in ['delta', 'beta']:
+        params[name] = [float(v) for v in m.params[name][0]]
+    return params
+
+def _optimizer_iterations(m):
+    """Best-effort: reads the last iteration number from the CmdStan optimizer log."""
+    try:
+        runset = m.stan_backend.stan_fit.runset
+        with open(runset.stdout_files[0], 'r') as f:
+            log = f.read()
+        iters = [int(line.split()[0]) for line in log.splitlines()
+                 if line.strip() and line.split()[0].isdigit() and len(line.split()) >= 7]
+        return iters[-1] if iters else None
+    except Exception:
+        return None
+
+def _warm_init(warm_start, signature):
+    """Returns (init dict or None, status) for a stored warm-start payload."""
+    if not warm_start or not warm_start.get('params'):
+        return None, 'cold'
+    if warm_start.get('signature') != signature:
+        return None, 'incompatible'
+    return {k: (np.array(v) if isinstance(v, list) else v) for k, v in warm_start['params'].items()}, 'warm'
+
+# Prophet's default number of simulated paths behind yhat_lower / yhat_upper
+DEFAULT_UNCERTAINTY_SAMPLES = 1000
+INTERVAL_COLUMNS = ['yhat_lower', 'yhat_upper', 'trend_lower', 'trend_upper']
+
+def predict_intervals(model, future_with_reg, uncertainty_samples=DEFAULT_UNCERTAINTY_SAMPLES):
+    """
+    Uncertainty intervals only (the expensive part of Prophet.predict: simulated trend paths).
+    Works on a shallow copy, so a model shared with the fit cache is never mutated; safe to
+    run in a background thread.
+
+    Returns: DataFrame (ds + every *_lower / *_upper column, components included)
+    """
+    m = copy.copy(model)
+    m.uncertainty_samples = int(uncertainty_samples)
+    pred = m.predict(future_with_reg)
+    return pred[['ds'] + [c for c in pred.columns if c.endswith(('_lower', '_upper'))]]
+
+def _with_intervals(forecast, intervals):
+    """forecast with its interval columns replaced by `intervals` (aligned on ds)."""
+    bands = [c for c in intervals.columns if c != 'ds']
+    out = forecast.drop(columns=[c for c in set(bands) | set(INTERVAL_COLUMNS) if c in forecast.columns])
+    return out.merge(intervals, on='ds', how='left')
+
+def _placeholder_intervals(forecast):
+    """NaN interval columns, so point-only forecasts keep the usual layout."""
+    forecast = forecast.copy()
+    for col in INTERVAL_COLUMNS:
+        if col not in forecast.columns:
+            forecast[col] = np.nan
+    return forecast
+
+def fit_baseline(df_with_reg, reg_columns, events_to_fit, prophet_kwargs, horizon, use_cache=True, group_keys=None,
+                 warm_start=None, uncertainty_samples=DEFAULT_UNCERTAINTY_SAMPLES, defer_intervals=False):
+    """
+    Stage 1 of the engine: fits Prophet on history + fit events and predicts the baseline.
+    Results are retained per (history, fit-events, config) key, in memory and on disk,
+    so edits that only touch future events never trigger a new m.fit.
+
+    warm_start: payload from a previous fit ({"params", "signature"}, see execute_forecast).
+    When the structure matches, its parameters seed the Stan optimizer instead of the
+    default init. The init only changes the starting point, so it is not part of the cache key.
+
+    uncertainty_samples: simulated paths for yhat_lower/yhat_upper (0 = no intervals).
+    defer_intervals: predict the point forecast only; intervals are left pending
+    (NaN columns) for predict_intervals / complete_intervals. A cached point-only
+    baseline is completed inline when intervals are not deferred.
+    
+    Returns:
+        Dict: {"model", "forecast", "future", "cache_key", "source": 'memory'|'disk'|'fit',
+               "fit_stats": {"status", "iterations", "fit_s"}, "predict_s": float,
+               "intervals": 'ready'|'pending'|'disabled'}
+    """
+    df = df_with_reg[['ds', 'y']]
+    extra = {"groups": group_keys}
+    if uncertainty_samples != DEFAULT_UNCERTAINTY_SAMPLES:
+        extra["uncertainty_samples"] = int(uncertainty_samples)
+    cache_key = forecast_cache.make_cache_key(df, events_to_fit, prophet_kwargs, horizon, extra=extra)
+    cached = forecast_cache.load_fit(cache_key) if use_cache else None
+    predict_s = 0.0
+    
+    if cached is not None:
+        m = cached['model']
+        forecast = cached['forecast']
+        future_with_reg, _ = add_fit_regressors(forecast[['ds']], events_to_fit, group_keys)
+        source = cached['source']
+        fit_stats = {"status": "cached", "iterations": 0, "fit_s": 0.0}
+    else:
+        from prophet import Prophet # Lazy: ~1s import, only paid when a fit is needed
+        m = Prophet(**prophet_kwargs)
+        
+        # Register columns with Prophet
+        for col in reg_columns:
+            m.add_regressor(col)
+            
+        init, status = _warm_init(warm_start, structure_signature(prophet_kwargs, reg_columns))
+        t0 = time.perf_counter()
+        if init is not None:
+            try:
+                m.fit(df_with_reg, init=init)
+            except Exception:
+                # e.g. optimizer failure from a bad starting point: retry from scratch
+                m = Prophet(**prophet_kwargs)
+                for col in reg_columns:
+                    m.add_regressor(col)
+                m.fit(df_with_reg)
+                status = 'fallback'
+            else:
+                # Prophet silently replaces inits whose shape no longer matches
+                # (e.g. fewer changepoints or yearly seasonality switched on by 'auto')
+                if len(init['delta']) != len(m.params['delta'][0]) or len(init['beta']) != len(m.params['beta'][0]):
+                    status = 'incompatible'
+        else:
+            m.fit(df_with_reg)
+        fit_stats = {"status": status, "iterations": _optimizer_iterations(m),
+                     "fit_s": round(time.perf_counter() - t0, 4)}
+        
+        # 6. Future
+        future = m.make_future_dataframe(periods=horizon)
+        
+        # 7. Add Regressors to Future (Only Fit events)
+        future_with_reg, _ = add_fit_regressors(future, events_to_fit, group_keys)
+        
+        # 8. Predict (the fit does not depend on uncertainty_samples, only predict does)
+        t0 = time.perf_counter()
+        m.uncertainty_samples = 0 if defer_intervals else int(uncertainty_samples)
+        forecast = m.predict(future_with_reg)
+        m.uncertainty_samples = int(uncertainty_samples)
+        predict_s = time.perf_counter() - t0
+        source = 'fit'
+        
+        if use_cache:
+            try:
+                forecast_cache.store_fit(cache_key, m, forecast)
+            except Exception:
+                pass # Cache is best-effort, never block a forecast
+
+    if not uncertainty_samples:
+        intervals = 'disabled'
+    elif 'yhat_lower' in forecast.columns:
+        intervals = 'ready'
+    elif defer_intervals:
+        intervals = 'pending'
+    else:
+        # Point-only baseline cached by a progressive run: complete it now
+        t0 = time.perf_counter()
+        forecast = _with_intervals(forecast, predict_intervals(m, future_with_reg, uncertainty_samples))
+        predict_s += time.perf_counter() - t0
+        intervals = 'ready'
+        if use_cache:
+            try:
+                forecast_cache.store_fit(cache_key, m, forecast)
+            except Exception:
+                pass
+    
+    return {
+        "model": m,
+        "forecast": forecast if intervals == 'ready' else _placeholder_intervals(forecast),
+        "future": future_with_reg,
+        "cache_key": cache_key,
+        "source": source,
+        "fit_stats": fit_stats,
+        "predict_s": round(predict_s, 4),
+        "intervals": intervals
+    }
+
+def complete_intervals(pending):
+    """
+    Second phase of a progressive forecast (see execute_forecast config['progressive']):
+    computes the deferred intervals, applies the same future overrides as the point
+    forecast and stores the completed baseline in the fit cache.
+    Pure computation (no Streamlit calls): meant for a background worker.
+
+    Args:
+        pending: results['intervals'] of a progressive execute_forecast
+
+    Returns:
+        Dict: {"status": "ready", "bands": df (ds + interval columns, overrides applied),
+               "impact_bands": dict | None (deferred simulate_override_bands),
+               "forecast_id": str (id of the point-only forecast), "full_forecast_id": str (id of the
+               completed forecast, as a synchronous run would return), "timing": {"intervals_s": float,
+               "impact_mc_s"?: float}}
+    """
+    t0 = time.perf_counter()
+    intervals = predict_intervals(pending['model'], pending['future'], pending['uncertainty_samples'])
+    baseline = _with_intervals(pending['baseline_forecast'], intervals)
+
+    if pending.get('use_cache', True):
+        try:
+            forecast_cache.store_fit(pending['cache_key'], pending['model'], baseline)
+        except Exception:
+            pass
+
+    final, _ = apply_future_overrides(baseline, pending['events_to_override'])
+    timing = {"intervals_s": round(time.perf_counter() - t0, 4)}
+
+    impact_bands = None
+    if pending.get('impact_args'):
+        impact_bands = simulate_override_bands(baseline, pending['events_to_override'], **pending['impact_args'])
+        timing['impact_mc_s'] = impact_bands['timing']['simulate_s'] + impact_bands['timing']['quantile_s']
+
+    return {
+        "status": "ready",
+        "bands": final[['ds'] + [c for c in intervals.columns if c != 'ds']],
+        "impact_bands": impact_bands,
+        "forecast_id": pending['forecast_id'],
+        "full_forecast_id": pending['full_forecast_id'],
+        "timing": timing
+    }
+
+def merge_intervals(forecast, completed):
+    """Swaps the NaN placeholders of a point-only forecast with complete_intervals bands."""
+    return _with_intervals(forecast, completed['bands'])
+
+def apply_future_overrides(baseline_forecast, events_to_override):
+    """
+    Stage 2 of the engine: applies future-only events as multipliers on the baseline.
+    
+    User impact is ALWAYS treated as % change regardless of seasonality mode
+    (e.g. -0.2 = -20%, so yhat * 0.8). Overlapping events compound:
+    multiplier(t) = prod_i (1 + impact_i(t)), applied to yhat, yhat_lower, yhat_upper in one pass.
+    
+    Returns: (new forecast DataFrame, list of applied event names)
+    """
+    forecast = baseline_forecast.copy()
+    if not events_to_override:
+        return forecast, []
+    
+    # One regressor matrix for all future events (rows x events)
+    impact_matrix, _ = build_regressor_matrix(forecast['ds'], events_to_override)
+    multiplier = np.prod(1.0 + impact_matrix, axis=1)
+    
+    band_cols = [c for c in ['yhat', 'yhat_lower', 'yhat_upper'] if c in forecast.columns]
+    forecast[band_cols] = forecast[band_cols].to_numpy() * multiplier[:, None]
+    
+    return forecast, [evt['name'] for evt in events_to_override]
+
+# Monte Carlo bands for future-only events (optional per-event impact uncertainty)
+IMPACT_QUANTILES = (0.1, 0.5, 0.9)
+IMPACT_CHUNK_BYTES = 64 * 1024 * 1024  # working set per chunk of samples
+
+def _event_number(evt, key):
+    value = evt.get(key)
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if np.isnan(value) else value
+
+def impact_distribution(evt):
+    """
+    Optional uncertainty of an event's impact:
+        impact_sd                -> ('normal', sd) around 'impact'
+        impact_min / impact_max  -> ('triangular', (low, high)) with mode 'impact'
+    Returns None for deterministic events (missing/NaN/zero-width fields).
+    """
+    sd = _event_number(evt, 'impact_sd')
+    if sd is not None and sd > 0:
+        return ('normal', sd)
+    low, high = _event_number(evt, 'impact_min'), _event_number(evt, 'impact_max')
+    if low is not None and high is not None and high > low:
+        return ('triangular', (low, high))
+    return None
+
+def _draw_impacts(events, n, rng):
+    """(n x events) joint impact draws; events are sampled independently, clipped at -100%."""
+    draws = np.empty((n, len(events)), dtype=np.float64)
+    for j, evt in enumerate(events):
+        impact = float(evt.get('impact', 0.0))
+        dist = impact_distribution(evt)
+        if dist is None:
+            draws[:, j] = impact
+        elif dist[0] == 'normal':
+            draws[:, j] = rng.normal(impact, dist[1], n)
+        else:
+            low, high = dist[1]
+            draws[:, j] = rng.triangular(low, min(max(impact, low), high), high, n)
+    return np.maximum(draws, -1.0)
+
+def simulate_override_bands(baseline_forecast, events_to_override, n_samples=10000, start=None,
+                            quantiles=IMPACT_QUANTILES, interval_width=0.8, seed=None,
+                            chunk_bytes=IMPACT_CHUNK_BYTES):
+    """
+    Monte Carlo version of apply_future_overrides: P10/P50/P90 bands of the final forecast.
+
+    Each sample draws every event's impact from its distribution (see impact_distribution)
+    and multiplies the baseline by prod_i (1 + impact_i * shape_i(t)); regressor shapes are
+    linear in impact, so one unit-impact matrix serves all samples. Baseline uncertainty
+    comes from Prophet's interval (normal, sd = interval half-width / z).
+
+    The baseline draw is perfectly correlated across days: each sample path takes one
+    standard normal z and uses yhat + z * sd on every day. Prophet's interval widens over
+    the horizon because of trend uncertainty, which shifts a whole path rather than single
+    days, so independent daily draws would shrink monthly bands by ~sqrt(days) and overstate
+    confidence. Daily bands do not depend on this choice; monthly bands are the
+    conservative (widest) case.
+
+    All per-sample draws (impacts and z) are made up front, then days are processed in
+    blocks holding every sample (samples x block working set <= chunk_bytes): daily
+    quantiles are exact per block and monthly totals are accumulated block by block, so
+    neither the (samples x days) paths nor the (samples x days x events) product is
+    ever materialized.
+
+    Args:
+        baseline_forecast: stage-1 forecast (ds, yhat, yhat_lower, yhat_upper)
+        events_to_override: future-only event dicts
+        n_samples: Monte Carlo samples
+        start: only days after this date are simulated (default: all rows)
+        quantiles: reported quantiles (labelled p10, p50, ...)
+        interval_width: Prophet interval_width of yhat_lower/yhat_upper
+        seed: RNG seed for reproducible bands
+
+    Returns:
+        Dict: {
+            "daily": df (ds, p10, p50, p90),
+            "monthly": df (month, p10, p50, p90) of monthly totals,
+            "n_samples": int, "chunk_size": int (days per block),
+            "timing": dict (simulate_s, quantile_s)
+        }
+    """
+    t0 = time.perf_counter()
+    fc = baseline_forecast if start is None else baseline_forecast[baseline_forecast['ds'] > start]
+    fc = fc.reset_index(drop=True)
+    n_days = len(fc)
+    rng = np.random.default_rng(seed)
+
+    yhat = fc['yhat'].to_numpy(dtype=np.float64)
+    if {'yhat_lower', 'yhat_upper'} <= set(fc.columns):
+        z = NormalDist().inv_cdf(0.5 + interval_width / 2)
+        # NaN while the intervals of a progressive forecast are still pending
+        base_sd = np.nan_to_num((fc['yhat_upper'].to_numpy() - fc['yhat_lower'].to_numpy()) / (2 * z))
+    else:
+        base_sd = np.zeros(n_days)
+
+    # Unit-impact shapes (days x events) and the day span each event touches
+    unit, _ = build_regressor_matrix(fc['ds'], [dict(e, impact=1.0) for e in events_to_override])
+    spans = []
+    for j in range(unit.shape[1]):
+        nz = np.flatnonzero(unit[:, j])
+        if nz.size:
+            spans.append((j, nz[0], nz[-1] + 1))
+
+    months = fc['ds'].dt.to_period('M')
+    month_labels, month_idx = np.unique(months.astype(str).to_numpy(), return_inverse=True)
+    month_onehot = np.zeros((n_days, len(month_labels)))
+    month_onehot[np.arange(n_days), month_idx] = 1.0
+
+    draws = _draw_impacts(events_to_override, n_samples, rng)
+    z_base = rng.standard_normal((n_samples, 1))
+
+    chunk = int(max(1, min(n_days, chunk_bytes // max(1, n_samples * 8 * 3))))
+    q_daily = np.empty((len(quantiles), n_days))
+    monthly = np.zeros((n_samples, len(month_labels)))
+    t_quant = 0.0
+
+    for lo in range(0, n_days, chunk):
+        hi = min(lo + chunk, n_days)
+        mult = np.ones((n_samples, hi - lo))
+        for j, a, b in spans:
+            a, b = max(a, lo), min(b, hi)
+            if a < b:
+                mult[:, a - lo:b - lo] *= 1.0 + draws[:, j, None] * unit[None, a:b, j]
+
+        paths = np.maximum(yhat[lo:hi] + base_sd[lo:hi] * z_base, 0.0) * mult
+        monthly += paths @ month_onehot[lo:hi]
+        tq = time.perf_counter()
+        q_daily[:, lo:hi] = np.quantile(paths, quantiles, axis=0)
+        t_quant += time.perf_counter() - tq
+    t_sim = time.perf_counter() - t0 - t_quant
+
+    t0 = time.perf_counter()
+    labels = [f"p{int(round(q * 100))}" for q in quantiles]
+    q_monthly = np.quantile(monthly, quantiles, axis=0)
+    t_quant += time.perf_counter() - t0
+
+    return {
+        "daily": pd.DataFrame({'ds': fc['ds'], **dict(zip(labels, q_daily))}),
+        "monthly": pd.DataFrame({'month': month_labels, **dict(zip(labels, q_monthly))}),
+        "n_samples": int(n_samples),
+        "chunk_size": chunk,
+        "timing": {"simulate_s": round(t_sim, 4), "quantile_s": round(t_quant, 4)}
+    }
+
+# Sensitivity sweep: (impact x duration) grid for future-only events on one baseline
+SWEEP_COLUMNS = ['Impatto', 'Durata', 'Click', 'Delta (Click)', 'Delta %']
+
+def sweep_override_grid(baseline_forecast, events_to_override, swept, impacts, durations, start=None):
+    """
+    What-if grid for future-only events without refitting: every (impact, duration)
+    variant is applied to the swept events on the same baseline, as one
+    (impacts x durations x days) multiplier tensor. Regressor shapes are linear in
+    the impact, so one unit-impact matrix per duration covers the whole impact axis.
+
+    Args:
+        baseline_forecast: stage-1 forecast (ds, yhat) before overrides
+        events_to_override: future-only events (as in execute_forecast)
+        swept: indices into events_to_override; each variant sets the same
+               impact / duration on all of them, the other events keep their values
+        impacts: impact values (fractions, e.g. 0.15 = +15%)
+        durations: duration values in days
+        start: only days after `start` are totalled (e.g. last history date)
+
+    Returns:
+        Dict: {"table": df (SWEEP_COLUMNS, one row per variant), "reference": float
+               (total with the current event values), "n_variants": int, "timing": {"sweep_s"}}
+    """
+    t0 = time.perf_counter()
+    fc = baseline_forecast if start is None else baseline_forecast[baseline_forecast['ds'] > start]
+    yhat = fc['yhat'].to_numpy(dtype=np.float64)
+    impacts = np.asarray(impacts, dtype=np.float64)
+    durations = np.asarray(durations, dtype=np.float64)
+    swept = sorted(set(swept))
+
+    # Fixed part: events outside the sweep, applied once
+    fixed = [e for i, e in enumerate(events_to_override) if i not in swept]
+    fixed_matrix, _ = build_regressor_matrix(fc['ds'], fixed)
+    weighted = yhat * np.prod(1.0 + fixed_matrix, axis=1)
+
+    current, _ = build_regressor_matrix(fc['ds'], events_to_override)
+    reference = float(yhat @ np.prod(1.0 + current, axis=1))
+
+    # Unit shapes of every swept event at every duration, in one matrix call: (days, durations, events)
+    variants = [dict(events_to_override[i], impact=1.0, duration=d) for d in durations for i in swept]
+    unit, _ = build_regressor_matrix(fc['ds'], variants)
+    unit = unit.reshape(len(fc), len(durations), len(swept))
+
+    mult = np.ones((len(impacts), len(durations), len(fc)))
+    for j in range(len(swept)):
+        mult *= 1.0 + impacts[:, None, None] * unit[:, :, j].T[None, :, :]
+    totals = mult @ weighted  # (impacts, durations)
+
+    table = pd.DataFrame({
+        'Impatto': np.repeat(impacts, len(durations)),
+        'Durata': np.tile(durations, len(impacts)).astype(int),
+        'Click': totals.ravel()
+    })
+    table['Delta (Click)'] = table['Click'] - reference
+    table['Delta %'] = table['Delta (Click)'] / reference * 100 if reference else np.nan
+
+    return {
+        "table": table[SWEEP_COLUMNS],
+        "reference": reference,
+        "n_variants": len(table),
+        "timing": {"sweep_s": round(time.perf_counter() - t0, 4)}
+    }
+
+def attribute_group_contributions(forecast, events_to_fit, group_keys, multiplicative=True):
+    """
+    Splits each group's fitted component back onto its events, pro rata to the
+    event's share of the group regressor on each day:
+        contribution_i(t) = component_g(t) * x_i(t) / sum_{j in g} x_j(t)
+    Component units follow Prophet (fraction of trend if multiplicative, clicks if additive);
+    'clicks_impact' converts multiplicative terms back to clicks via the trend.
+    """
+    if not events_to_fit:
+        return []
+    
+    matrix, _ = build_regressor_matrix(forecast['ds'], events_to_fit)
+    groups, membership = group_membership(group_keys)
+    group_totals = matrix @ membership                     # rows x groups
+    event_totals = group_totals[:, [groups.index(g) for g in group_keys]]  # rows x events
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shares = np.where(event_totals != 0, matrix / event_totals, 0.0)
+    
+    cols = [group_column_name(g) for g in group_keys]
+    components = np.column_stack([
+        forecast[c].to_numpy() if c in forecast.columns else np.zeros(len(forecast)) for c in cols
+    ])
+    contributions = components * shares
+    
+    # Multiplicative terms are relative to trend
+    clicks = contributions * forecast['trend'].to_numpy()[:, None] if multiplicative else contributions
+    
+    return [{
+        "name": evt['name'],
+        "group": group_keys[i],
+        "total_impact": float(contributions[:, i].sum()),
+        "total_abs_impact": float(np.abs(contributions[:, i]).sum()),
+        "clicks_impact": float(clicks[:, i].sum())
+    } for i, evt in enumerate(events_to_fit)]
+
 def execute_forecast(history_df, events, config):
     """
     Runs Prophet forecast.
@@ -42,9 +553,21 @@ def execute_forecast(history_df, events, config):
     Returns:
         Dict: {
             "forecast": df,
+            "baseline_forecast": df (before future-only overrides),
             "model": object,
-            "metrics": dict
+            "metrics": dict,
+            "forecast_id": str (hash of fit key + overrides, for memoizing derived views),
+            "warm_start": dict (fitted params + structure signature, pass back as config['warm_start']),
+            "impact_bands": dict | None (simulate_override_bands result; needs config['impact_samples']
+                            and at least one future event with impact_sd or impact_min/impact_max),
+            "intervals": dict ({"status": 'ready'|'pending'|'disabled'}; when pending, the payload
+                         for complete_intervals),
+            "override_events": list (future-only events applied on the baseline, see sweep_override_grid)
         }
+
+    Progressive mode (config['progressive']=True): returns the point forecast right away
+    with NaN interval columns; complete_intervals(results['intervals']) computes them later.
+    config['uncertainty_samples'] sets the simulated paths (Prophet default 1000).
     """
     # 1. Prepare Data for Prophet
     df = history_df.rename(columns={'date': 'ds', 'clicks': 'y'})
@@ -61,16 +584,16 @@ def execute_forecast(history_df, events, config):
     # 4. Add regressors to future
     # 5. Predict
     
-    # 3. Initialize Model
-    m = Prophet(
-        seasonality_mode=config.get('seasonality_mode', 'multiplicative'),
-        yearly_seasonality=config.get('yearly_seasonality', 'auto'),
-        weekly_seasonality=config.get('weekly_seasonality', True),
-        daily_seasonality=config.get('daily_seasonality', False),
-        changepoint_prior_scale=config.get('changepoint_prior_scale', 0.05),
-        seasonality_prior_scale=config.get('seasonality_prior_scale', 10.0),
-        changepoint_range=config.get('changepoint_range', 0.8)
-    )
+    # 3. Model Settings (also part of the fit cache key)
+    prophet_kwargs = {
+        "seasonality_mode": config.get('seasonality_mode', 'multiplicative'),
+        "yearly_seasonality": config.get('yearly_seasonality', 'auto'),
+        "weekly_seasonality": config.get('weekly_seasonality', True),
+        "daily_seasonality": config.get('daily_seasonality', False),
+        "changepoint_prior_scale": config.get('changepoint_prior_scale', 0.05),
+        "seasonality_prior_scale": config.get('seasonality_prior_scale', 10.0),
+        "changepoint_range": config.get('changepoint_range', 0.8)
+    }
     
     # 3. Separate Events: Fit (Past) vs Override (Future Only)
     events_to_fit = []
@@ -93,86 +616,86 @@ def execute_forecast(history_df, events, config):
              events_to_fit.append(evt)
 
     # 4. Add Regressors to History (Only Fit events)
-    df_with_reg, reg_columns = apply_regressors(df, events_to_fit)
-    
-    # Register columns with Prophet
-    for col in reg_columns:
-        m.add_regressor(col)
-        
-    # 5. Fit
-    m.fit(df_with_reg)
-    
-    # 6. Future
-    future = m.make_future_dataframe(periods=horizon)
+    # Optional grouped mode: one regressor per event_type / custom group instead of per event
+    group_keys = event_group_keys(events_to_fit,
+                                  config.get('regressor_grouping', 'none'),
+                                  config.get('regressor_groups'))
+    df_with_reg, reg_columns = add_fit_regressors(df, events_to_fit, group_keys)
     
-    # 7. Add Regressors to Future (Only Fit events)
-    future_with_reg, _ = apply_regressors(future, events_to_fit)
+    # 5-8. Stage 1: Fit + baseline prediction (cached per history/fit-events/config)
+    t0 = time.perf_counter()
+    warm_start = config.get('warm_start')
+    uncertainty_samples = int(config.get('uncertainty_samples', DEFAULT_UNCERTAINTY_SAMPLES))
+    progressive = bool(config.get('progressive', False))
+    stage = fit_baseline(df_with_reg, reg_columns, events_to_fit, prophet_kwargs, horizon,
+                         use_cache=config.get('use_cache', True), group_keys=group_keys,
+                         warm_start=warm_start, uncertainty_samples=uncertainty_samples,
+                         defer_intervals=progressive)
+    t_fit = time.perf_counter() - t0
     
-    # 8. Predict
-    forecast = m.predict(future_with_reg)
+    m = stage['model']
+    baseline_forecast = stage['forecast']
+    future_with_reg = stage['future']
     
     # --- MANUAL OVERRIDE LOGIC ---
-    # Apply impact of future-only events manually to yhat
-    active_overrides = []
-    
-    # We iterate over future-only events and calculate their theoretical impact curve
-    # Then simply ADD it to yhat, yhat_lower, yhat_upper
-    
-    for evt in events_to_override:
-         # Calculate the regressor vector for the whole future timeline
-         # We can reuse apply_regressors but passing just this single event
-         temp_df, new_cols = apply_regressors(future_with_reg[['ds']].copy(), [evt])
-         col_name = new_cols[0]
-         
-         # The vector contains 0s and values (e.g. 0.5 for impact)
-         # We assume the impact is additive to the Baseline (yhat)
-         # If the model is multiplicative, this changes things:
-         # Multiplicative: y = trend * seasonality * (1 + regressors)
-         # Additive: y = trend + seasonality + regressors
-         
-         impact_vector = temp_df[col_name].values
-         
-         if config.get('seasonality_mode') == 'multiplicative':
-             # Here impact is a % change? 
-             # Prophet regressors in multiplicative mode are percentages?
-             # Actually Prophet: y(t) * (1 + beta * regressor(t))
-             # If we want to force impact, we assume 'custom_impact' from Excel IS the beta * regressor.
-             # E.g. Impact 0.2 means +20%.
-             # So we multiply yhat by (1 + impact_vector)
-             
-             # But wait, user input 0.5 or -1.0. 
-             # If impact is -0.5 (-50%), we want yhat * (1 - 0.5) = yhat * 0.5
-             
-             multiplier = 1.0 + impact_vector
-             forecast['yhat'] *= multiplier
-             forecast['yhat_lower'] *= multiplier
-             forecast['yhat_upper'] *= multiplier
-             
-         else:
-             # Additive mode.
-             # Impact 1000 means +1000 clicks.
-             # But user input is likely small float like 0.5?
-             # User said range [-1, 1]. In additive mode, 1 click is nothing.
-             # So likely the user THINKS in percentage even if mode is additive?
-             # Or maybe they want to shift the baseline?
-             
-             # SAFE BET: Treat User Impact as PERCENTAGE CHANGE regardless of mode?
-             # Or treat as absolute?
-             # Given "Migrazione sito" (Site Migration), impact is % drop usually.
-             
-             # Let's assume User Impact is ALWAYS % change (e.g. -0.2 = -20%).
-             multiplier = 1.0 + impact_vector
-             forecast['yhat'] *= multiplier
-             forecast['yhat_lower'] *= multiplier
-             forecast['yhat_upper'] *= multiplier
-         
-         active_overrides.append(evt['name'])
+    # Stage 2: Apply impact of future-only events manually to yhat (no refit)
+    t0 = time.perf_counter()
+    forecast, active_overrides = apply_future_overrides(baseline_forecast, events_to_override)
+    t_override = time.perf_counter() - t0
+
+    # Optional risk bands when some future event carries an impact range / sd
+    # (with pending intervals they are computed by complete_intervals, which has the baseline sd)
+    impact_bands = None
+    impact_samples = int(config.get('impact_samples') or 0)
+    impact_args = None
+    if impact_samples > 0 and any(impact_distribution(e) for e in events_to_override):
+        impact_args = {"n_samples": impact_samples, "start": history_max,
+                       "interval_width": getattr(m, 'interval_width', 0.8), "seed": config.get('impact_seed')}
+        if stage['intervals'] != 'pending':
+            impact_bands = simulate_override_bands(baseline_forecast, events_to_override, **impact_args)
+
+    # Parameters to seed the next fit. 'reference' carries the stats of the last cold
+    # fit forward so warm fits can report iteration / wall-time savings against it.
+    fit_stats = stage['fit_stats']
+    if fit_stats['status'] == 'cached' and warm_start:
+        reference = warm_start.get('reference')
+    elif fit_stats['status'] == 'warm':
+        reference = (warm_start or {}).get('reference')
+    else:
+        reference = {"iterations": fit_stats['iterations'], "fit_s": fit_stats['fit_s']}
+    next_warm_start = {
+        "params": extract_fit_params(m),
+        "signature": structure_signature(prophet_kwargs, reg_columns),
+        "reference": reference
+    }
+
+    warm_stats = dict(fit_stats)
+    if fit_stats['status'] == 'warm' and reference:
+        if fit_stats['iterations'] is not None and reference.get('iterations') is not None:
+            warm_stats["iterations_saved"] = reference['iterations'] - fit_stats['iterations']
+        warm_stats["fit_s_saved"] = round(reference['fit_s'] - fit_stats['fit_s'], 4)
+        warm_stats["reference"] = reference
 
     # 9. Diagnostics & Debug Info
     debug_info = {
         "regressor_diagnostics": [],
         "data_check": {},
-        "overrides": active_overrides
+        "overrides": active_overrides,
+        "cache": {
+            "key": stage['cache_key'][:16],
+            "hit": stage['source'] != 'fit',
+            "source": stage['source'],
+            **forecast_cache.get_cache_stats()
+        },
+        "timing": {
+            "fit_s": round(t_fit, 4),
+            "predict_s": stage['predict_s'],
+            "override_s": round(t_override, 4),
+            "intervals": stage['intervals'],
+            **({"impact_mc_s": impact_bands['timing']['simulate_s'] + impact_bands['timing']['quantile_s']}
+               if impact_bands else {})
+        },
+        "warm_start": warm_stats
     }
     
     # A. Check Input Data (Are regressors actually non-zero?)
@@ -194,6 +717,7 @@ def execute_forecast(history_df, events, config):
 
     # B. Extract Coefficients
     try:
+        from prophet.utilities import regressor_coefficients
         coefs = regressor_coefficients(m)
         debug_info["coefficients"] = coefs
     except Exception as e:
@@ -213,6 +737,12 @@ def execute_forecast(history_df, events, config):
                 "max_impact": float(impact_max)
             })
 
+    # D. Per-event attribution when regressors are grouped
+    if group_keys is not None:
+        debug_info["event_attribution"] = attribute_group_contributions(
+            forecast, events_to_fit, group_keys,
+            multiplicative=prophet_kwargs['seasonality_mode'] == 'multiplicative')
+
     # 10. Metrics
     # Calculate historical fit metrics (Performance on training data)
     historical_forecast = forecast[forecast['ds'].isin(df['ds'])]
@@ -240,8 +770,28 @@ def execute_forecast(history_df, events, config):
         m_grouped['sum'] = m_grouped['sum'].round(1)
         monthly_data = m_grouped.to_dict('records')
     
+    forecast_id = forecast_cache.make_forecast_id(stage['cache_key'], events_to_override)
+    intervals = {"status": stage['intervals']}
+    if stage['intervals'] == 'pending':
+        # The point-only frame differs from the completed one: its own id, so views
+        # memoized on forecast_id never mix the two. The completed forecast gets the full id.
+        full_forecast_id, forecast_id = forecast_id, f"{forecast_id}:point"
+        intervals.update({
+            "model": m,
+            "future": future_with_reg,
+            "baseline_forecast": baseline_forecast,
+            "events_to_override": events_to_override,
+            "uncertainty_samples": uncertainty_samples,
+            "impact_args": impact_args,
+            "cache_key": stage['cache_key'],
+            "use_cache": config.get('use_cache', True),
+            "forecast_id": forecast_id,
+            "full_forecast_id": full_forecast_id
+        })
+
     return {
         "forecast": forecast,
+        "baseline_forecast": baseline_forecast,
         "model": m,
         "metrics": {
             "historical_mean": hist_mean,
@@ -253,5 +803,10 @@ def execute_forecast(history_df, events, config):
             "mae": perf_metrics['mae'],
             "monthly_data": monthly_data
         },
-        "debug_info": debug_info
+        "debug_info": debug_info,
+        "forecast_id": forecast_id,
+        "warm_start": next_warm_start,
+        "impact_bands": impact_bands,
+        "intervals": intervals,
+        "override_events": events_to_override
     }
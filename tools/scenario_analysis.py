@@ -1,10 +1,113 @@
+import time
 import pandas as pd
 import numpy as np
 
+from tools.regressor_logic import build_regressor_matrix
+
+# Period aggregations of the comparison engine: freq code -> label used in tables
+COMPARISON_FREQS = {'M': 'Mese', 'Q': 'Trimestre'}
+
+def align_scenarios(scenarios, value_col='yhat', future_only=True):
+    """
+    Aligns any number of forecasts into one date x scenario matrix.
+
+    Args:
+        scenarios (dict): label -> DataFrame with 'ds' and value_col
+        value_col (str): column to align (default 'yhat')
+        future_only (bool): keep only dates after today
+
+    Returns:
+        pd.DataFrame: index 'ds' (sorted), one column per scenario, NaN where a scenario has no date.
+    """
+    series = {
+        label: df.set_index('ds')[value_col]
+        for label, df in scenarios.items()
+        if df is not None and not df.empty
+    }
+    if not series:
+        return pd.DataFrame()
+
+    matrix = pd.DataFrame(series).sort_index()
+    matrix.index = pd.to_datetime(matrix.index)
+    matrix.index.name = 'ds'
+    if future_only:
+        matrix = matrix[matrix.index > pd.to_datetime('today')]
+    return matrix
+
+def align_scenario_arrays(arrays, value_col='yhat', future_only=True):
+    """
+    align_scenarios for stored scenario arrays (project_manager.load_scenario_array):
+    the matrix is filled straight from the memory-mapped day numbers and values,
+    without building one DataFrame per scenario.
+
+    Args:
+        arrays (dict): label -> structured array with 'ds' (days since epoch) and value_col, or None
+        value_col (str): field to align (default 'yhat')
+        future_only (bool): keep only dates after today
+
+    Returns:
+        pd.DataFrame: same layout as align_scenarios.
+    """
+    arrays = {label: arr for label, arr in arrays.items() if arr is not None and len(arr)}
+    if not arrays:
+        return pd.DataFrame()
+
+    days = np.unique(np.concatenate([arr['ds'] for arr in arrays.values()]))
+    values = np.full((len(days), len(arrays)), np.nan)
+    for j, arr in enumerate(arrays.values()):
+        values[np.searchsorted(days, arr['ds']), j] = arr[value_col]
+
+    index = pd.DatetimeIndex(days.astype('datetime64[D]').astype('datetime64[ns]'), name='ds')
+    matrix = pd.DataFrame(values, index=index, columns=list(arrays))
+    if future_only:
+        matrix = matrix[matrix.index > pd.to_datetime('today')]
+    return matrix
+
+def compare_scenarios(matrix, reference, freqs=('M', 'Q')):
+    """
+    Period sums of every scenario and their deltas against a reference scenario.
+    Fully vectorized: one groupby per frequency over the whole matrix.
+
+    Args:
+        matrix (pd.DataFrame): date x scenario matrix (see align_scenarios)
+        reference (str): column used as baseline for the deltas
+        freqs (tuple): period codes from COMPARISON_FREQS
+
+    Returns:
+        pd.DataFrame: tidy table (Frequenza, Periodo, Scenario, Click, Riferimento, Delta (Click), Delta %).
+        Delta % is 0 where the reference sum is not positive.
+    """
+    columns = ['Frequenza', 'Periodo', 'Scenario', 'Click', 'Riferimento', 'Delta (Click)', 'Delta %']
+    if matrix is None or matrix.empty or reference not in matrix.columns:
+        return pd.DataFrame(columns=columns)
+
+    tables = []
+    for freq in freqs:
+        sums = matrix.groupby(matrix.index.to_period(freq)).sum(min_count=1).fillna(0)
+        ref = sums[reference].to_numpy()
+
+        values = sums.to_numpy()
+        delta = values - ref[:, None]
+        safe_ref = np.where(ref > 0, ref, 1.0)
+        pct = np.where(ref[:, None] > 0, delta / safe_ref[:, None], 0.0)
+
+        n_periods, n_scen = values.shape
+        tables.append(pd.DataFrame({
+            'Frequenza': COMPARISON_FREQS[freq],
+            'Periodo': np.repeat(sums.index.astype(str).to_numpy(), n_scen),
+            'Scenario': np.tile(sums.columns.to_numpy(dtype=object), n_periods),
+            'Click': values.ravel(),
+            'Riferimento': np.repeat(ref, n_scen),
+            'Delta (Click)': delta.ravel(),
+            'Delta %': pct.ravel()
+        }))
+
+    return pd.concat(tables, ignore_index=True)[columns]
+
 def calculate_scenario_comparison(forecast_df, baseline_df=None):
     """
     Compares the current forecast (Scenario) with a Baseline forecast.
-    Aggregates data by Month and Quarter for reporting.
+    Aggregates data by Month and Quarter for reporting (two-way view of compare_scenarios).
     
     Returns:
         dict: {
@@ -12,74 +115,24 @@ def calculate_scenario_comparison(forecast_df, baseline_df=None):
             'quarterly': DataFrame (Quarter, Scenario, Baseline, Delta, Delta%)
         }
     """
-    # 1. Prepare Data
     if forecast_df is None or forecast_df.empty:
         return None
-    
-    # Filter Future Only
-    today = pd.to_datetime('today')
-    scen = forecast_df[forecast_df['ds'] > today].copy()
-    
-    # Periods
-    scen['month'] = scen['ds'].dt.to_period('M')
-    scen['quarter'] = scen['ds'].dt.to_period('Q')
-    
-    # Aggregation
-    s_m = scen.groupby('month')['yhat'].sum().rename('Scenario')
-    s_q = scen.groupby('quarter')['yhat'].sum().rename('Scenario')
-    
-    # Baseline Processing
-    b_m = None
-    b_q = None
-    
-    if baseline_df is not None and not baseline_df.empty:
-        base = baseline_df[baseline_df['ds'] > today].copy()
-        base['month'] = base['ds'].dt.to_period('M')
-        base['quarter'] = base['ds'].dt.to_period('Q')
-        
-        b_m = base.groupby('month')['yhat'].sum().rename('Baseline')
-        b_q = base.groupby('quarter')['yhat'].sum().rename('Baseline')
-    else:
-        # Create Dummy Baseline (0) or matching Scenario (0 delta) if none exists?
-        # User wants comparison. If no baseline, we can't compare.
-        # But we can still return Scenario stats.
-        pass
 
-    # 2. Build Comparisons
-    
-    # --- MONTHLY ---
-    if b_m is not None:
-        df_m = pd.concat([s_m, b_m], axis=1).sort_index()
-    else:
-        df_m = pd.DataFrame(s_m).sort_index()
-        df_m['Baseline'] = np.nan
+    matrix = align_scenarios({'Scenario': forecast_df, 'Baseline': baseline_df})
+    if matrix.empty:
+        matrix = pd.DataFrame(columns=['Scenario'], index=pd.DatetimeIndex([], name='ds'), dtype=float)
+    if 'Baseline' not in matrix.columns:
+        # No baseline: scenario stats only, deltas against 0
+        matrix['Baseline'] = np.nan
 
-    df_m = df_m.fillna(0)
-    df_m['Delta (Click)'] = df_m['Scenario'] - df_m['Baseline']
-    # Handle division by zero
-    df_m['Delta %'] = df_m.apply(lambda row: (row['Scenario'] - row['Baseline']) / row['Baseline'] if row['Baseline'] > 0 else 0, axis=1)
-    
-    # Formatting
-    df_m_reset = df_m.reset_index()
-    df_m_reset['Periodo'] = df_m_reset['month'].astype(str)
-    
-    # --- QUARTERLY ---
-    if b_q is not None:
-        df_q = pd.concat([s_q, b_q], axis=1).sort_index()
-    else:
-        df_q = pd.DataFrame(s_q).sort_index()
-        df_q['Baseline'] = np.nan
-        
-    df_q = df_q.fillna(0)
-    df_q['Delta (Click)'] = df_q['Scenario'] - df_q['Baseline']
-    df_q['Delta %'] = df_q.apply(lambda row: (row['Scenario'] - row['Baseline']) / row['Baseline'] if row['Baseline'] > 0 else 0, axis=1)
-    
-    df_q_reset = df_q.reset_index()
-    df_q_reset['Periodo'] = df_q_reset['quarter'].astype(str)
+    tidy = compare_scenarios(matrix, 'Baseline')
+    tidy = tidy[tidy['Scenario'] == 'Scenario'].drop(columns='Scenario')
+    tidy = tidy.rename(columns={'Click': 'Scenario', 'Riferimento': 'Baseline'})
+    out_cols = ['Periodo', 'Scenario', 'Baseline', 'Delta (Click)', 'Delta %']
 
     return {
-        'monthly': df_m_reset[['Periodo', 'Scenario', 'Baseline', 'Delta (Click)', 'Delta %']],
-        'quarterly': df_q_reset[['Periodo', 'Scenario', 'Baseline', 'Delta (Click)', 'Delta %']]
+        'monthly': tidy.loc[tidy['Frequenza'] == COMPARISON_FREQS['M'], out_cols].reset_index(drop=True),
+        'quarterly': tidy.loc[tidy['Frequenza'] == COMPARISON_FREQS['Q'], out_cols].reset_index(drop=True)
     }
 
 def analyze_regressor_impacts(forecast_df, events, target_period_str=None):
@@ -154,6 +207,84 @@ def analyze_regressor_impacts(forecast_df, events, target_period_str=None):
             
     return pd.DataFrame(results)
 
+# YoY granularities: freq code -> (result key, periods per year)
+YOY_FREQS = {'M': ('monthly', 12), 'Q': ('quarterly', 4), 'Y': ('yearly', 1)}
+
+def _history_series(history_df):
+    """Daily clicks Series indexed by date, from GSC ('date', 'clicks') or Prophet ('ds', 'y') frames."""
+    if history_df is None or history_df.empty:
+        return pd.Series(dtype='float64', index=pd.DatetimeIndex([]))
+    d_col = 'date' if 'date' in history_df.columns else 'ds'
+    c_col = 'clicks' if 'clicks' in history_df.columns else 'y'
+    return pd.Series(history_df[c_col].to_numpy(dtype='float64'), index=pd.to_datetime(history_df[d_col]))
+
+def calculate_yoy_tables(forecast_df, history_df, start=None):
+    """
+    Month, quarter and year YoY tables for the future part of the forecast.
+    Each history period is shifted forward by one year and joined once on the
+    forecast periods, so there is no per-row lookup.
+
+    Args:
+        forecast_df (pd.DataFrame): forecast with 'ds' and 'yhat'
+        history_df (pd.DataFrame): GSC history ('date'/'clicks' or 'ds'/'y')
+        start (Timestamp, optional): forecast days after this date are scored
+            (default: last history date, or today without history)
+
+    Returns:
+        dict | None: {'monthly', 'quarterly', 'yearly'} DataFrames with
+        (Periodo, Forecast, Giorni, Anno Prec, Δ Assoluto, Δ %, Parziale, Storico Parziale, Note)
+        plus 'start' (the resolved cutoff); None if there is no future forecast.
+    """
+    if forecast_df is None or forecast_df.empty:
+        return None
+
+    hist = _history_series(history_df)
+    if start is None:
+        start = hist.index.max() if not hist.empty else pd.to_datetime('today')
+    future = forecast_df.loc[forecast_df['ds'] > start, ['ds', 'yhat']]
+    if future.empty:
+        return None
+
+    tables = {'start': start}
+    for freq, (key, lag) in YOY_FREQS.items():
+        agg = future.groupby(future['ds'].dt.to_period(freq))['yhat'].agg(['sum', 'count'])
+        periods = agg.index
+        days_in_period = (periods.end_time.normalize() - periods.start_time).days.to_numpy() + 1
+
+        # Shifted-period join: history period P is the comparison for forecast period P + 1 year
+        h_agg = hist.groupby(hist.index.to_period(freq)).agg(['sum', 'count'])
+        h_agg.index = h_agg.index + lag
+        prev = h_agg.reindex(periods)
+
+        forecast_sum = agg['sum'].to_numpy()
+        prev_sum = prev['sum'].to_numpy()
+        matched = ~np.isnan(prev_sum)
+        delta_abs = np.where(matched, forecast_sum - np.nan_to_num(prev_sum), 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta_pct = np.where(matched & (prev_sum > 0), delta_abs / prev_sum, 0.0)
+
+        partial = agg['count'].to_numpy() < days_in_period
+        # Judge history coverage against its own calendar (Feb 2024 has 29 days, Feb 2025 has 28)
+        prev_periods = periods - lag
+        prev_days = (prev_periods.end_time.normalize() - prev_periods.start_time).days.to_numpy() + 1
+        hist_partial = matched & (prev['count'].to_numpy() < prev_days)
+        note = (pd.Series(np.where(partial, "⚠️ Parziale", ""))
+                .str.cat(pd.Series(np.where(hist_partial, "Storico parziale", "")), sep=" · ")
+                .str.strip(" ·"))
+
+        tables[key] = pd.DataFrame({
+            'Periodo': periods.astype(str),
+            'Forecast': forecast_sum,
+            'Giorni': agg['count'].to_numpy(),
+            'Anno Prec': np.where(matched & (prev_sum > 0), prev_sum, np.nan),
+            'Δ Assoluto': delta_abs,
+            'Δ %': delta_pct,
+            'Parziale': partial,
+            'Storico Parziale': hist_partial,
+            'Note': note.to_numpy()
+        })
+    return tables
+
 def calculate_total_yoy_metrics(forecast_df, history_df):
     """
     Calculates the Year-Over-Year variation between the full forecast period and the corresponding historical period.
@@ -188,40 +319,30 @@ def calculate_total_yoy_metrics(forecast_df, history_df):
     end_h = end_f - pd.DateOffset(years=1)
     
     # Check history coverage
-    h_df = history_df.copy()
-    d_col = 'date' if 'date' in h_df.columns else 'ds'
-    c_col = 'clicks' if 'clicks' in h_df.columns else 'y'
-    
-    # Convert dates if needed
-    if not pd.api.types.is_datetime64_any_dtype(h_df[d_col]):
-        h_df[d_col] = pd.to_datetime(h_df[d_col])
+    hist = _history_series(history_df)
 
-    hist_min = h_df[d_col].min()
-    hist_max = h_df[d_col].max()
-    
     # Coverage check: History must start BEFORE start_h and end AFTER end_h (ideally)
-    if hist_min > start_h:
+    if hist.index.min() > start_h:
         return {
             "status": "insufficient_history",
             "msg": "Mancano dati storici iniziali"
         }
     
-    if hist_max < end_h:
+    if hist.index.max() < end_h:
         return {
              "status": "insufficient_history",
              "msg": "Mancano dati storici finali"
         }
 
     # Filter ranges
-    mask_h = (h_df[d_col] >= start_h) & (h_df[d_col] <= end_h)
-    matched_hist = h_df[mask_h]
+    matched_hist = hist[(hist.index >= start_h) & (hist.index <= end_h)]
     
     if matched_hist.empty:
          return {"status": "insufficient_history", "msg": "Nessun dato storico nel periodo"}
 
     # Calculate Means
     mean_f = future['yhat'].mean()
-    mean_h = matched_hist[c_col].mean()
+    mean_h = matched_hist.mean()
     
     if mean_h == 0 or pd.isna(mean_h):
         return {"status": "error", "msg": "Media storica zero"}
@@ -237,3 +358,201 @@ def calculate_total_yoy_metrics(forecast_df, history_df):
         "history_mean": mean_h,
         "period_label": f"{start_f.date()} - {end_f.date()}"
     }
+
+
+# --- GOAL SEEK ---
+# Searchable plan dimensions and their default bounds:
+#   impact: same impact on every varied event (fraction, 0.15 = +15%)
+#   start: whole-month shift of the varied events (latest start that still meets the target)
+#   duration: duration in days of the varied events
+GOAL_SEEK_BOUNDS = {'impact': (0.0, 5.0), 'start': (-12, 12), 'duration': (7, 730)}
+GOAL_SEEK_GRID = 33  # candidates per refinement round (start / duration)
+
+def resolve_targets(targets, ds, history_df=None):
+    """
+    Turns target specs into (label, day mask over ds, clicks still needed from ds) rows.
+
+    A spec is {'period': '2026' | '2026Q3' | '2026-07' | None (whole window), and either
+    'clicks': total goal or 'yoy_pct': growth % over the same period one year earlier,
+    up to the last forecast day}. Clicks already in the history for the period count
+    towards the goal.
+    """
+    hist = _history_series(history_df)
+    ds = pd.DatetimeIndex(ds)
+    rows = []
+    for spec in ([targets] if isinstance(targets, dict) else targets):
+        period = spec.get('period')
+        if period:
+            p = pd.Period(period)
+            lo, hi = p.start_time, p.end_time.normalize()
+        else:
+            lo, hi = ds.min(), ds.max()
+        mask = (ds >= lo) & (ds <= hi)
+        if not mask.any():
+            raise ValueError(f"Periodo {period} fuori dall'orizzonte del forecast")
+
+        banked = float(hist[(hist.index >= lo) & (hist.index <= hi) & (hist.index < ds.min())].sum())
+        if 'yoy_pct' in spec:
+            # Same days one year earlier, limited to the days the forecast reaches
+            covered = min(hi, ds.max())
+            prev = hist[(hist.index >= lo - pd.DateOffset(years=1)) & (hist.index <= covered - pd.DateOffset(years=1))]
+            if prev.empty:
+                raise ValueError(f"Storico dell'anno precedente mancante per {period or 'il periodo'}")
+            goal = float(prev.sum()) * (1 + spec['yoy_pct'] / 100)
+        else:
+            goal = float(spec['clicks'])
+        rows.append({'label': str(period or 'Totale'), 'mask': mask, 'goal': goal, 'banked': banked})
+    return rows
+
+def _variant_events(events, vary, mode, values):
+    """Event lists of every candidate value, flattened candidate-major (len(values) * len(vary))."""
+    out = []
+    for v in values:
+        for i in vary:
+            e = events[i]
+            if mode == 'impact':
+                out.append(dict(e, impact=float(v)))
+            elif mode == 'start':
+                out.append(dict(e, date=pd.Timestamp(e['date']) + pd.DateOffset(months=int(v))))
+            else:
+                out.append(dict(e, duration=float(v)))
+    return out
+
+def goal_seek(baseline_forecast, events, vary, targets, mode='impact', history_df=None, start=None,
+              bounds=None, tol=1e-4, max_iter=60):
+    """
+    Minimal plan for the varied future events that meets every target, on the cached
+    baseline (no refit). Candidates are evaluated in batches as (candidates x days)
+    multipliers: vectorized bisection for the impact (totals grow monotonically with it,
+    one bracket per target), grid refinement for the duration, a full month grid for the start.
+    Every mode returns 'already_met' when the targets are met without the varied events.
+
+    Args:
+        baseline_forecast: stage-1 forecast (ds, yhat) before overrides
+        events: future-only events; those not in `vary` keep their values
+        vary: indices into events searched together
+        targets: target spec or list of specs (see resolve_targets); all must be met
+        mode: 'impact' (smallest impact), 'start' (latest start, months) or 'duration'
+              (shortest duration, 1-day resolution)
+        history_df: GSC history, for YoY targets and clicks already banked in the period
+        start: only days after `start` are forecast (default: last history date)
+        bounds: search range (default GOAL_SEEK_BOUNDS[mode])
+        tol: impact tolerance of the bisection
+
+    Returns:
+        dict: {"status": 'solved' | 'already_met' | 'infeasible', "mode", "value",
+               "plan": list of varied events with the solution applied,
+               "targets": DataFrame (Periodo, Obiettivo, Storico, Forecast, Totale, Scarto),
+               "diagnostics": {"iterations", "evaluations", "converged", "residual", "bracket", "seconds"}}
+    """
+    t0 = time.perf_counter()
+    if start is None:
+        hist = _history_series(history_df)
+        start = hist.index.max() if not hist.empty else None
+    fc = baseline_forecast if start is None else baseline_forecast[baseline_forecast['ds'] > start]
+    ds = fc['ds']
+    vary = sorted(set(vary))
+    lo, hi = bounds or GOAL_SEEK_BOUNDS[mode]
+
+    rows = resolve_targets(targets, ds, history_df)
+    masks = np.array([r['mask'] for r in rows], dtype=np.float64)  # (targets, days)
+    needed = np.array([r['goal'] - r['banked'] for r in rows])
+
+    fixed, _ = build_regressor_matrix(ds, [e for i, e in enumerate(events) if i not in vary])
+    weighted = fc['yhat'].to_numpy(dtype=np.float64) * np.prod(1.0 + fixed, axis=1)
+    n_eval = 0
+
+    def totals(values):
+        """Forecast clicks per (candidate, target)."""
+        nonlocal n_eval
+        n_eval += len(values)
+        unit, _ = build_regressor_matrix(ds, _variant_events(events, vary, mode, values))
+        unit = unit.reshape(len(ds), len(values), len(vary))
+        mult = np.prod(1.0 + unit, axis=2).T  # (candidates, days)
+        return (mult * weighted) @ masks.T
+
+    iterations = 0
+    bracket = None
+    if mode == 'impact':
+        # One bracket per target, all bisected together; the plan needs the largest root
+        edge = totals(np.array([lo, hi]))
+        if (edge[0] >= needed).all():
+            value, status = lo, 'already_met'
+        elif (edge[1] < needed).any():
+            value, status = hi, 'infeasible'
+        else:
+            a = np.full(len(rows), float(lo))
+            b = np.full(len(rows), float(hi))
+            met_at_lo = edge[0] >= needed
+            b[met_at_lo] = lo
+            while iterations < max_iter and (b - a).max() > tol:
+                mid = (a + b) / 2
+                ok = np.diagonal(totals(mid)) >= needed
+                b = np.where(ok, mid, b)
+                a = np.where(ok, a, mid)
+                iterations += 1
+            value, status = float(b.max()), 'solved'
+            bracket = [float(a.max()), float(b.max())]
+    else:
+        if mode == 'start':
+            # Shifted events must stay after the history
+            first = min(pd.Timestamp(events[i]['date']) for i in vary)
+            grid = np.array([m for m in range(int(lo), int(hi) + 1)
+                             if start is None or first + pd.DateOffset(months=m) > start])
+        else:
+            grid = np.unique(np.linspace(lo, hi, GOAL_SEEK_GRID).round())
+
+        # Baseline + fixed events alone already meet every target: the varied events
+        # are not needed, so the minimal plan is the least demanding bound
+        least = (grid[-1] if grid.size else 0) if mode == 'start' else lo
+        if ((weighted @ masks.T) >= needed).all():
+            value, status = least, 'already_met'
+        elif grid.size == 0:
+            value, status = least, 'infeasible'
+        else:
+            feasible = np.flatnonzero((totals(grid) >= needed).all(axis=1))
+            iterations = 1
+            if feasible.size == 0:
+                value, status = (least if mode == 'start' else hi), 'infeasible'
+            elif mode == 'start':
+                value, status = grid[feasible[-1]], 'solved'  # latest start
+            else:
+                # Smallest feasible duration: refine between it and the infeasible grid
+                # point before it, down to 1-day resolution
+                k = feasible[0]
+                value, status = grid[k], 'solved'
+                a = grid[k - 1] if k > 0 else value
+                while value - a > 1 and iterations < max_iter:
+                    fine = np.unique(np.linspace(a, value, GOAL_SEEK_GRID).round())
+                    ok = (totals(fine) >= needed).all(axis=1)
+                    iterations += 1
+                    k = np.flatnonzero(ok)[0]  # `value` itself is always feasible
+                    a, value = (fine[k - 1] if k > 0 else fine[k]), fine[k]
+                bracket = [float(a), float(value)]
+        value = int(value)
+
+    achieved = totals(np.array([value]))[0]
+    table = pd.DataFrame({
+        'Periodo': [r['label'] for r in rows],
+        'Obiettivo': [r['goal'] for r in rows],
+        'Storico': [r['banked'] for r in rows],
+        'Forecast': achieved,
+    })
+    table['Totale'] = table['Storico'] + table['Forecast']
+    table['Scarto'] = table['Totale'] - table['Obiettivo']
+
+    return {
+        "status": status,
+        "mode": mode,
+        "value": value,
+        "plan": _variant_events(events, vary, mode, [value]),
+        "targets": table,
+        "diagnostics": {
+            "iterations": iterations,
+            "evaluations": n_eval,
+            "converged": status != 'infeasible',
+            "residual": float(table['Scarto'].min()),
+            "bracket": bracket,
+            "seconds": round(time.perf_counter() - t0, 4)
+        }
+    }